@@ -0,0 +1,210 @@
+# --- Local Asset Mirror ---
+# The logo, intro image, background, intro video and intro audio used to be
+# loaded by every browser from third-party hosts, some of them twice under
+# different URLs. Each is now downloaded once (through http_client), stored
+# content-addressed under static/assets/ and served from the app's own static
+# path. Markup refers to them as "asset:<name>"; resolve() swaps in the local URL,
+# or the original one until the asset has been mirrored or when static serving
+# is off.
+#
+# Outfit images go through the same directory: proxy_image() runs in the worker
+# pool, fetches a remote image once and stores it cropped to the 300x400 card size.
+
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+import workers
+
+ASSET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "assets")
+ASSET_URL = "app/static/assets"
+
+REMOTE_ASSETS = {
+    "logo": "https://i.ibb.co/3YMDZQVn/logo.png",
+    "intro": "https://i.ibb.co/B5qxJWW8/intro.png",
+    "background": "https://i.ibb.co/gMDjN4Mt/background.jpg",
+    "intro_video": "https://static.videezy.com/system/resources/previews/000/054/104/original/10_Second_Countdown.mp4",
+    "intro_audio": "https://cdn.pixabay.com/download/audio/2021/08/04/audio_7e5b3f7c0c.mp3?filename=relaxing-piano-11248.mp3",
+}
+
+CARD_SIZE = (300, 400)
+JPEG_QUALITY = 85
+
+_ASSET_TOKEN = re.compile(r"asset:([a-z_]+)")
+_EXTENSIONS = {"image/png": ".png", "image/jpeg": ".jpg", "video/mp4": ".mp4", "audio/mpeg": ".mp3"}
+
+
+def resolve(text, urls=None):
+    """Replaces every "asset:<name>" in ``text`` with its URL in ``urls`` (default: the remote ones)."""
+    urls = REMOTE_ASSETS if urls is None else urls
+    return _ASSET_TOKEN.sub(lambda m: urls.get(m.group(1), m.group(0)), text)
+
+
+def asset_path(filename, asset_dir=ASSET_DIR):
+    return os.path.join(asset_dir, filename)
+
+
+def load_manifest(asset_dir=ASSET_DIR):
+    """Returns {asset name: stored filename} for the assets mirrored so far."""
+    try:
+        with open(os.path.join(asset_dir, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {name: filename for name, filename in manifest.items() if os.path.exists(asset_path(filename, asset_dir))}
+
+
+def mirror_asset(name, asset_dir=ASSET_DIR):
+    """Downloads one of REMOTE_ASSETS and stores it; returns the stored filename."""
+    import http_client
+
+    url = REMOTE_ASSETS[name]
+    response = http_client.get(url)
+    response.raise_for_status()
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    extension = _EXTENSIONS.get(content_type) or posixpath.splitext(urlsplit(url).path)[1]
+    filename = hashlib.sha256(response.content).hexdigest()[:32] + extension
+    if not os.path.exists(asset_path(filename, asset_dir)):
+        os.makedirs(asset_dir, exist_ok=True)
+        write_atomic(asset_path(filename, asset_dir), response.content)
+    return filename
+
+
+def card_filename(url):
+    """Stored name of a proxied outfit image; keyed by its source URL so a lookup needs no fetch."""
+    return f"card_{hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]}.jpg"
+
+
+def proxy_image(url, asset_dir=ASSET_DIR):
+    """[worker] Fetches a remote outfit image, crops it to CARD_SIZE and stores it as JPEG."""
+    import io
+
+    from PIL import Image, ImageOps
+
+    import http_client
+
+    filename = card_filename(url)
+    if os.path.exists(asset_path(filename, asset_dir)):
+        return filename
+    response = http_client.get(_raster_url(url))
+    response.raise_for_status()
+    with Image.open(io.BytesIO(response.content)) as img:
+        img.draft("RGB", CARD_SIZE)
+        card = ImageOps.fit(img.convert("RGB"), CARD_SIZE, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    card.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    os.makedirs(asset_dir, exist_ok=True)
+    write_atomic(asset_path(filename, asset_dir), buffer.getvalue())
+    return filename
+
+
+def _raster_url(url):
+    # placehold.co answers with SVG unless a raster format is asked for.
+    parts = urlsplit(url)
+    if parts.netloc == "placehold.co" and not parts.path.rstrip("/").endswith(("/png", "/jpg", "/jpeg")):
+        return urlunsplit(parts._replace(path=parts.path.rstrip("/") + "/png"))
+    return url
+
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class AssetMirror:
+    """Process-wide view of the mirrored assets and proxied outfit images."""
+
+    def __init__(self, enabled=True, asset_dir=ASSET_DIR, pool=None):
+        # Without static serving nothing under static/ is reachable, so keep remote URLs.
+        self.enabled = enabled
+        self.asset_dir = asset_dir
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._files = load_manifest(asset_dir) if enabled else {}
+        self._cards = {}
+        self._pending_cards = set()
+        # Bumped whenever an asset is mirrored, so dependents (the theme bundle) can rebuild.
+        self.version = len(self._files)
+
+    def start(self):
+        """Mirrors missing assets on a background thread; pages use remote URLs until then."""
+        missing = [name for name in REMOTE_ASSETS if name not in self._files]
+        if self.enabled and missing:
+            threading.Thread(target=self._sync, args=(missing,), daemon=True).start()
+        return self
+
+    def urls(self, base=ASSET_URL):
+        """Returns {asset name: URL}, local (under ``base``) where mirrored."""
+        with self._lock:
+            files = dict(self._files)
+        return {name: f"{base}/{files[name]}" if name in files else url for name, url in REMOTE_ASSETS.items()}
+
+    def url(self, name):
+        return self.urls()[name]
+
+    def resolve(self, text, base=ASSET_URL):
+        return resolve(text, self.urls(base))
+
+    def card_image(self, url):
+        """Local URL of an outfit image if it has been proxied; otherwise queues it and returns ``url``."""
+        if not self.enabled or not url.startswith(("http://", "https://")):
+            return url
+        filename = card_filename(url)
+        with self._lock:
+            if url in self._cards:
+                return f"{ASSET_URL}/{filename}"
+            if os.path.exists(asset_path(filename, self.asset_dir)):
+                self._cards[url] = filename
+                return f"{ASSET_URL}/{filename}"
+            queue = self._pool is not None and url not in self._pending_cards
+            if queue:
+                self._pending_cards.add(url)
+        if queue:
+            try:
+                self._pool.submit("assets:proxy_image", url, self.asset_dir, on_done=lambda name: self._card_done(url, name))
+            except workers.QueueFull:
+                with self._lock:
+                    self._pending_cards.discard(url)
+        return url
+
+    # A failed proxy job leaves its URL pending, so a broken image is not refetched
+    # on every render; the card keeps its remote URL until the next restart.
+    def _card_done(self, url, filename):
+        with self._lock:
+            self._cards[url] = filename
+            self._pending_cards.discard(url)
+
+    def _sync(self, names):
+        for name in names:
+            try:
+                filename = mirror_asset(name, self.asset_dir)
+            except Exception as e:
+                print(f"Error mirroring asset {name}: {e}")
+                continue
+            with self._lock:
+                self._files[name] = filename
+                self.version += 1
+                manifest = json.dumps(self._files, indent=2, sort_keys=True).encode("utf-8")
+            write_atomic(os.path.join(self.asset_dir, "manifest.json"), manifest)
+
+
+def main():
+    """Mirrors every remote asset now, e.g. while building a deployment image."""
+    mirrored = load_manifest()
+    for name in REMOTE_ASSETS:
+        if name in mirrored:
+            print(f"{name}: {mirrored[name]} (already mirrored)")
+            continue
+        mirrored[name] = mirror_asset(name)
+        print(f"{name}: {mirrored[name]}")
+    write_atomic(os.path.join(ASSET_DIR, "manifest.json"), json.dumps(mirrored, indent=2, sort_keys=True).encode("utf-8"))
+
+
+if __name__ == "__main__":
+    main()
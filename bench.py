@@ -0,0 +1,1002 @@
+"""Benchmarks for Style Teller.
+
+Run one with ``python bench.py <name>``; ``python bench.py --help`` lists them.
+Benchmarks that drive the app use Streamlit's headless AppTest and run in a
+scratch directory, with uploads stored under it too, so they never touch the
+real user database or media.
+"""
+
+import argparse
+import concurrent.futures
+import gzip
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# The app-driving helpers patch or read AppTest and script-runner internals that
+# change between Streamlit releases; they are written against this one, which
+# requirements.txt pins, and check_streamlit() runs before any benchmark using them.
+STREAMLIT_VERSION = "1.65.0"
+APP_BENCHMARKS = ("fragments", "instrumentation", "journey", "sessions", "startup", "theme", "wardrobe")
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "styleteller.py")
+sys.path.insert(0, APP_DIR)
+
+
+# --- Helpers ---
+
+def percentiles(samples):
+    """Returns (p50, p95, p99) of a list of numbers."""
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def report(name, samples, unit="ms", scale=1000.0):
+    p50, p95, p99 = (value * scale for value in percentiles(samples))
+    print(f"{name:<32} n={len(samples):<6} p50={p50:9.3f}{unit}  p95={p95:9.3f}{unit}  p99={p99:9.3f}{unit}")
+
+
+def check_streamlit():
+    """Exits with a clear message if Streamlit lacks an internal the helpers below rely on."""
+    import streamlit
+
+    unsupported = f"bench.py supports Streamlit {STREAMLIT_VERSION} (see requirements.txt); {streamlit.__version__} is installed"
+    try:
+        from streamlit import config, logger
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner import script_runner
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+        from streamlit.testing.v1 import AppTest, local_script_runner
+        from streamlit.testing.v1 import app_test as app_test_module
+    except ImportError as e:
+        sys.exit(f"{unsupported}, which has no {e.name}.")
+
+    logger.set_log_level("error")
+    at = AppTest.from_string("")
+    try:
+        config.get_option("global.appTest")
+        app_test_option = True
+    except RuntimeError:
+        app_test_option = False
+    checks = {
+        "script_runner.exec_func_with_error_handling": hasattr(script_runner, "exec_func_with_error_handling"),
+        "app_test.Runtime": getattr(app_test_module, "Runtime", None) is Runtime,
+        "app_test.ScriptCache": hasattr(app_test_module, "ScriptCache"),
+        "local_script_runner.ScriptCache": hasattr(local_script_runner, "ScriptCache"),
+        "Runtime._instance": hasattr(Runtime, "_instance"),
+        "ScriptCache.get_bytecode": hasattr(ScriptCache, "get_bytecode"),
+        "AppTest._tree": hasattr(at, "_tree"),
+        "AppTest._session_state._state": hasattr(getattr(at, "_session_state", None), "_state"),
+        "the global.appTest option": app_test_option,
+    }
+    missing = [name for name, present in checks.items() if not present]
+    if missing:
+        sys.exit(f"{unsupported}, which has no {', '.join(missing)}.")
+
+
+def app_test(timeout=30, skip_intro=True):
+    """Returns an AppTest for the app, by default with the intro switched off."""
+    from streamlit import logger
+    from streamlit.testing.v1 import AppTest
+
+    # Session state set before a run logs "missing ScriptRunContext" warnings.
+    logger.set_log_level("error")
+    if skip_intro:
+        os.environ["STYLETELLER_SKIP_INTRO"] = "1"
+    else:
+        os.environ.pop("STYLETELLER_SKIP_INTRO", None)
+    return AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+
+def logged_in_app_test(page, user="demo@example.com", timeout=30):
+    """Returns an AppTest whose session is already logged in on ``page``."""
+    import session
+
+    at = app_test(timeout)
+    at.session_state["view"] = session.ViewState(page=page, user_id=user, video_played=True)
+    return at
+
+
+def element_protos(at):
+    """Yields the proto of every element the last script run produced."""
+    stack = [at._tree]
+    while stack:
+        node = stack.pop()
+        children = getattr(node, "children", None)
+        if children:
+            stack.extend(children.values())
+        elif getattr(node, "proto", None) is not None:
+            yield node.proto
+
+
+def theme_bytes(at):
+    """Bytes of theme CSS/JS the last script run sent to the browser."""
+    markers = ("<style", "styleteller-theme")
+    total = 0
+    for proto in element_protos(at):
+        text = str(proto)
+        if any(marker in text for marker in markers):
+            total += proto.ByteSize()
+    return total
+
+
+class script_timer:
+    """Records how long each script run spends executing the app itself.
+
+    AppTest's own round trip is dominated by polling sleeps, so timing at.run()
+    hides the cost of the script; this wraps the call that executes its code.
+    """
+
+    def __enter__(self):
+        from streamlit.runtime.scriptrunner import script_runner
+
+        self.samples = []
+        self._by_session = defaultdict(list)
+        self._module = script_runner
+        self._original = script_runner.exec_func_with_error_handling
+
+        def timed(func, ctx):
+            started = time.perf_counter()
+            try:
+                return self._original(func, ctx)
+            finally:
+                seconds = time.perf_counter() - started
+                self.samples.append(seconds)
+                self._by_session[id(ctx.session_state._state)].append(seconds)
+
+        script_runner.exec_func_with_error_handling = timed
+        return self
+
+    def __exit__(self, *exc):
+        self._module.exec_func_with_error_handling = self._original
+
+    def take(self):
+        """Returns and clears the samples recorded so far."""
+        samples, self.samples = self.samples, []
+        return samples
+
+    def take_session(self, at):
+        """Returns and clears the samples of one AppTest's session (one per script execution)."""
+        return self._by_session.pop(id(at._session_state._state), [])
+
+
+def rss_bytes():
+    """Resident set size of this process right now."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class concurrent_app_tests:
+    """Lets AppTests run at the same time in several threads.
+
+    AppTest installs a mock Runtime singleton for each run and clears it when
+    the run ends, and switches the "global.appTest" option on and back off, so
+    one session's run ending breaks the others still running; each AppTest also
+    compiles the script itself, and compiling in several threads at once can fail
+    on Python 3.11. Inside this block AppTest sets the singleton on a subclass
+    instead, so the first mock is kept on Runtime itself for every session, the
+    option stays on, and all sessions share one ScriptCache, as on a real server,
+    with the app already compiled.
+    """
+
+    def __enter__(self):
+        from streamlit import config
+        from streamlit.runtime import Runtime
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+        from streamlit.testing.v1 import app_test as app_test_module
+        from streamlit.testing.v1 import local_script_runner
+
+        class PinnedMeta(type(Runtime)):
+            def __setattr__(cls, name, value):
+                if name != "_instance":
+                    super().__setattr__(name, value)
+                elif value is not None and Runtime._instance is None:
+                    Runtime._instance = value
+
+        self._modules = (app_test_module, local_script_runner)
+        self._runtime = Runtime
+        self._option = config.get_option("global.appTest")
+        config.set_option("global.appTest", True)
+        app_test_module.Runtime = PinnedMeta("PinnedRuntime", (Runtime,), {})
+        script_cache = ScriptCache()
+        script_cache.get_bytecode(APP_PATH)
+        for module in self._modules:
+            module.ScriptCache = lambda: script_cache
+        return self
+
+    def __exit__(self, *exc):
+        from streamlit import config
+        from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+        self._modules[0].Runtime = self._runtime
+        for module in self._modules:
+            module.ScriptCache = ScriptCache
+        self._runtime._instance = None
+        config.set_option("global.appTest", self._option)
+
+
+class scratch_dir:
+    """Runs a block inside a temporary working directory that also holds the media.
+
+    imaging.MEDIA_DIR is redirected for this process, and STYLETELLER_MEDIA_DIR for
+    worker processes started inside the block.
+    """
+
+    def __enter__(self):
+        import imaging
+
+        self._old = os.getcwd(), imaging.MEDIA_DIR, os.environ.get("STYLETELLER_MEDIA_DIR")
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+        imaging.MEDIA_DIR = os.environ["STYLETELLER_MEDIA_DIR"] = os.path.join(self._tmp.name, "media")
+        return self._tmp.name
+
+    def __exit__(self, *exc):
+        import imaging
+
+        cwd, imaging.MEDIA_DIR, media_env = self._old
+        if media_env is None:
+            os.environ.pop("STYLETELLER_MEDIA_DIR", None)
+        else:
+            os.environ["STYLETELLER_MEDIA_DIR"] = media_env
+        os.chdir(cwd)
+        self._tmp.cleanup()
+
+
+# --- Benchmarks ---
+
+def bench_theme(args):
+    """Theme bundle build time, bundle size and theme bytes sent per script run."""
+    import theme
+
+    builds = [theme.build_bundle(static_dir=None).build_seconds for _ in range(args.repeat)]
+    bundle = theme.build_bundle(static_dir=None)
+    report("bundle build", builds)
+    print(f"{'source CSS':<32} {bundle.source_bytes:>8} bytes")
+    print(f"{'minified bundle':<32} {len(bundle.css):>8} bytes")
+    print(f"{'minified + gzip':<32} {len(gzip.compress(bundle.css.encode())):>8} bytes")
+
+    with scratch_dir():
+        at = app_test()
+        at.run()
+        print(f"{'theme bytes, first run':<32} {theme_bytes(at):>8} bytes")
+        at.run()
+        print(f"{'theme bytes, rerun':<32} {theme_bytes(at):>8} bytes")
+
+
+def bench_startup(args):
+    """Script time of a new session's first run and of reruns, logged out and in."""
+    with scratch_dir(), script_timer() as timer:
+        for _ in range(args.sessions):
+            app_test().run()
+        first_runs = timer.take()
+        at = app_test()
+        for _ in range(args.repeat):
+            at.run()
+        login_reruns = timer.take()[1:]
+
+        at = logged_in_app_test("home")
+        for _ in range(args.repeat):
+            at.run()
+        home_reruns = timer.take()[1:]
+
+    report("first run (new session)", first_runs)
+    report("rerun, login page", login_reruns)
+    report("rerun, home page", home_reruns)
+
+
+def bench_intro(args):
+    """Intro video bytes a first visit downloads, per viewport, with and without the built renditions."""
+    import assets
+    import media
+
+    source = assets.load_manifest().get("intro_video")
+    if source is not None:
+        print(f"{'source video (before)':<32} {os.path.getsize(assets.asset_path(source)):>10,} bytes")
+    intro = media.load_manifest()
+    if intro is None:
+        print("No intro renditions yet; run `python media.py build` (needs ffmpeg).")
+        return
+    poster = os.path.getsize(assets.asset_path(intro.poster))
+    print(f"{'poster':<32} {poster:>10,} bytes")
+    for viewport in (390, 1024, 1440, 2560):
+        # The first rendition whose max_viewport fits, as the browser picks among the <source>s.
+        chosen = next(r for r in intro.renditions if r.max_viewport is None or viewport <= r.max_viewport)
+        print(f"{f'{viewport}px viewport: {chosen.name}':<32} {poster + chosen.bytes:>10,} bytes")
+
+
+def bench_outfits(args):
+    """Time to first outfit card vs. the whole style page, against the streaming stub."""
+    import recommender
+    import stubs
+    from records import UserDetails
+
+    server = stubs.start_stub("openai", latency=args.latency, chunk_delay=args.chunk_delay)
+    os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+    first_cards, pages = [], []
+    for i in range(args.sessions):
+        # A fresh service per session, so every page load is a cache miss.
+        service = recommender.RecommendationService(recommender.make_client())
+        started = time.perf_counter()
+        for n, _ in enumerate(service.stream(UserDetails(age=20 + i), "Casual")):
+            if n == 0:
+                first_cards.append(time.perf_counter() - started)
+        pages.append(time.perf_counter() - started)
+    server.shutdown()
+
+    report("time to first card", first_cards)
+    report("time to all cards", pages)
+
+
+def bench_http(args):
+    """Fetch latency through the pooled session vs. a new connection per request."""
+    import requests
+
+    import http_client
+    import stubs
+
+    server = stubs.start_stub("http", latency=args.latency)
+    url = f"{server.url}/asset?size=32768"
+    fresh = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        requests.get(url, timeout=10).content
+        fresh.append(time.perf_counter() - started)
+    session = http_client.PooledSession()
+    pooled = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        session.get(url).content
+        pooled.append(time.perf_counter() - started)
+    server.shutdown()
+
+    report("new connection per request", fresh)
+    report("pooled session", pooled)
+    print(f"{'connections opened, pooled':<32} {session.connections_opened():>8}")
+
+
+def bench_catalog(args):
+    """Ranking latency of the catalog scoring engine for catalogs of 1k to 1M items."""
+    import numpy as np
+
+    import catalog
+
+    profile = catalog.profile_vector("Casual", ("Streetwear", "Sporty"), season="autumn")
+    profiles = np.stack([catalog.profile_vector(style, season="autumn") for style in catalog.STYLES] * 8)
+    for size in (1_000, 10_000, 100_000, 1_000_000):
+        items = catalog.random_catalog(size)
+        repeat = max(5, min(args.repeat, 10_000_000 // size))
+        scores, ranks, batches = [], [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            items.score(profile)
+            scores.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            items.rank(profile, 10)
+            ranks.append(time.perf_counter() - started)
+        for _ in range(max(3, repeat // 10)):
+            started = time.perf_counter()
+            items.rank_many(profiles, 10)
+            batches.append(time.perf_counter() - started)
+        report(f"{size:>9,} items, score", scores)
+        report(f"{size:>9,} items, top-10", ranks)
+        report(f"{size:>9,} items, top-10 x{len(profiles)}", batches)
+
+
+def bench_index(args):
+    """Recommendation index: build, lookup vs. ranking, and incremental add/remove."""
+    import catalog
+    import rec_index
+
+    items = catalog.random_catalog(args.items)
+    items.items = [None] * len(items)
+    started = time.perf_counter()
+    index = rec_index.RecIndex.build(items)
+    print(f"{'build':<32} {time.perf_counter() - started:9.3f}s  ({len(index.keys)} segments, {len(items):,} items)")
+
+    key = ("Casual", ("Formal", "Minimalist"), "winter", "25-34")
+    profile = catalog.segment_profile("Casual", ("Formal", "Minimalist"), "winter", "25-34")
+    lookups, ranks = [], []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        index.lookup(*key, 10)
+        lookups.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        items.rank(profile, 10)
+        ranks.append(time.perf_counter() - started)
+    report("lookup, top-10", lookups)
+    report("rank catalog, top-10", ranks)
+
+    adds, removes = [], []
+    next_id = int(items.ids.max()) + 1
+    for i in range(min(args.repeat, 50)):
+        item = catalog.CatalogItem(next_id + i, "", "", "", (catalog.STYLES[i % 7],), ("black",), 0.5, catalog.SEASONS)
+        items.add(item)
+        started = time.perf_counter()
+        index.add_item(items, item.item_id)
+        adds.append(time.perf_counter() - started)
+        victim = int(index.lookup(*key, 1)[0])
+        items.remove(victim)
+        started = time.perf_counter()
+        index.remove_item(items, victim)
+        removes.append(time.perf_counter() - started)
+    report("incremental add", adds)
+    report("incremental remove", removes)
+
+
+def bench_palette(args):
+    """Palette extraction per image size, cold and cached, in ms per image and images per second."""
+    import io
+
+    import numpy as np
+    from PIL import Image
+
+    import palette
+
+    rng = np.random.default_rng(0)
+    for width, height in ((96, 128), (480, 640), (1200, 1600), (3000, 4000)):
+        # Blocks of a few random colors with noise, roughly like a garment against a backdrop.
+        blocks = rng.integers(0, 256, size=(5, 3))[rng.integers(0, 5, size=(16, 12))]
+        pixels = np.kron(blocks, np.ones((height // 16, width // 12, 1))) + rng.normal(0, 12, size=(height, width, 3))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=85)
+        data = buffer.getvalue()
+
+        cold = []
+        for _ in range(min(args.repeat, 100)):
+            started = time.perf_counter()
+            with Image.open(io.BytesIO(data)) as img:
+                palette.extract(img)
+            cold.append(time.perf_counter() - started)
+        cache = palette.PaletteCache(media_dir=os.devnull)
+        palette.palette_of_bytes(data, cache)
+        cached = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            palette.palette_of_bytes(data, cache)
+            cached.append(time.perf_counter() - started)
+        label = f"{width}x{height}"
+        report(f"{label}, extract", cold)
+        report(f"{label}, cached", cached)
+        print(f"{label + ', images/s':<32} {1 / statistics.median(cold):>8.0f}")
+
+
+def bench_phash(args):
+    """Near-duplicate lookups among --items stored hashes, and ingesting a re-saved copy vs. a new photo."""
+    import io
+
+    import numpy as np
+    from PIL import Image
+
+    import imaging
+    import phash
+
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(0, 1 << 63, size=args.items, dtype=np.uint64) << np.uint64(1)
+    index = phash.HashIndex()
+    started = time.perf_counter()
+    index.add_many(hashes, rng.integers(0, 256, size=(args.items, 32), dtype=np.uint8))
+    print(f"{'build':<32} {time.perf_counter() - started:9.3f}s  ({args.items:,} hashes)")
+
+    hits, misses = [], []
+    for i in range(args.repeat):
+        near = int(hashes[i]) ^ sum(1 << int(bit) for bit in rng.choice(64, phash.MAX_DISTANCE, replace=False))
+        started = time.perf_counter()
+        assert index.nearest(near) is not None
+        hits.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        index.nearest(int(rng.integers(0, 1 << 63)))
+        misses.append(time.perf_counter() - started)
+    report(f"lookup, copy {phash.MAX_DISTANCE} bits away", hits)
+    report("lookup, new photo", misses)
+
+    def photo(seed, size=(1200, 1600), quality=90):
+        blocks = np.random.default_rng(seed).integers(0, 256, size=(16, 12, 3))
+        img = Image.fromarray(np.kron(blocks, np.ones((100, 100, 1))).astype(np.uint8)).resize(size)
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=quality)
+        return buffer.getvalue()
+
+    with scratch_dir() as media_dir:
+        fresh, copies = [], []
+        for i in range(min(args.repeat, 30)):
+            data, copy = photo(i), photo(i, size=(900, 1200), quality=70)
+            started = time.perf_counter()
+            imaging.ingest_image(data, media_dir, "bench@example.com")
+            fresh.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            imaging.ingest_image(copy, media_dir, "bench@example.com")
+            copies.append(time.perf_counter() - started)
+    report("ingest, new photo", fresh)
+    report("ingest, re-saved copy", copies)
+
+
+def bench_login(args):
+    """Password checks alone and in a burst, rehash-on-login, and email lookups in a large store."""
+    import json
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import passwords
+    import user_store
+
+    hasher = passwords.PasswordHasher()
+    stored = passwords.hash_password("hunter2")
+    single = []
+    for _ in range(min(args.repeat, 20)):
+        started = time.perf_counter()
+        hasher.verify("hunter2", stored)
+        single.append(time.perf_counter() - started)
+    report("login check", single)
+
+    # A burst of logins while another session renders: render time shows whether
+    # the burst stalls other script runners.
+    def render():
+        started = time.perf_counter()
+        sum(i * i for i in range(20_000))
+        return time.perf_counter() - started
+
+    idle = [render() for _ in range(50)]
+    burst, busy, rejected = [], [], 0
+    done = threading.Event()
+
+    def login(_):
+        started = time.perf_counter()
+        try:
+            hasher.verify("hunter2", stored)
+        except passwords.HasherBusy:
+            return None
+        return time.perf_counter() - started
+
+    def rendering():
+        while not done.is_set():
+            busy.append(render())
+
+    renderer = threading.Thread(target=rendering)
+    renderer.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.sessions) as executor:
+        for seconds in executor.map(login, range(args.sessions)):
+            if seconds is None:
+                rejected += 1
+            else:
+                burst.append(seconds)
+    elapsed = time.perf_counter() - started
+    done.set()
+    renderer.join()
+    report(f"login in burst of {args.sessions}", burst)
+    print(f"{'burst throughput':<32} {len(burst) / elapsed:8.1f} logins/s ({rejected} turned away as busy)")
+    report("page render, idle", idle)
+    report("page render, during burst", busy)
+
+    cheap = passwords.hash_password("hunter2", iterations=max(1, hasher.iterations // 10))
+    started = time.perf_counter()
+    verified = hasher.verify("hunter2", cheap)
+    report("login with rehash", [time.perf_counter() - started])
+    started = time.perf_counter()
+    hasher.verify("hunter2", verified.new_hash)
+    report("next login", [time.perf_counter() - started])
+
+    with tempfile.TemporaryDirectory() as scratch:
+        store = user_store.UserStore(os.path.join(scratch, "users.sqlite3"))
+        record = json.dumps({"password": stored, "details": None, "styles_chosen": False})
+        store.import_records((f"user{i}@example.com", record) for i in range(args.items))
+        lookups = []
+        for i in range(args.repeat):
+            email = f"  User{(i * 7919) % args.items}@Example.COM "
+            started = time.perf_counter()
+            store.get(email)
+            lookups.append(time.perf_counter() - started)
+        store.close()
+    report(f"lookup, {args.items:,} users", lookups)
+    hasher.shutdown()
+
+
+def bench_otp(args):
+    """OTP send latency with a slow provider, and what gets through resend and brute-force storms."""
+    import random
+
+    import otp
+
+    service = otp.OTPService(otp.FakeProvider(latency=args.latency))
+    sends = []
+    for i in range(min(args.repeat, 100)):
+        started = time.perf_counter()
+        service.send(f"+1555{i:07d}", client=f"10.0.{i}.1")
+        sends.append(time.perf_counter() - started)
+    report("send (provider still pending)", sends)
+
+    def storm(label, attempts):
+        allowed = 0
+        for attempt in attempts:
+            try:
+                attempt()
+                allowed += 1
+            except otp.RateLimited:
+                pass
+        print(f"{label:<32} {allowed:>8} of {len(attempts)} past the limits")
+
+    service = otp.OTPService(otp.FakeProvider())
+    storm("resends, one phone", [lambda: service.send("+15550000000", "10.0.0.1")] * 1000)
+    rng = random.Random(0)
+    storm(
+        "sends, 100k phones / 1k clients",
+        [lambda i=i: service.send(f"+1556{i:07d}", f"10.1.{i % 1000 // 256}.{i % 256}") for i in range(100_000)],
+    )
+    victim = "+15570000000"
+    service.send(victim, "10.2.0.1")
+    service.deliveries.join()
+    code = service.provider.latest(victim).split("code is ")[1][:otp.CODE_DIGITS]
+    guesses = [f"{rng.randrange(10 ** 6):06d}" for _ in range(100_000)]
+    guesses = [guess for guess in guesses if guess != code]
+    storm("guesses, one client", [lambda g=g: service.verify(victim, g, "10.3.0.1") for g in guesses])
+    storm(
+        "guesses, 100k clients",
+        [lambda i=i, g=g: service.verify(victim, g, f"10.4.{i // 256 % 256}.{i % 256}") for i, g in enumerate(guesses)],
+    )
+    print(f"{'real code works after storm':<32} {service.verify(victim, code, '10.5.0.1')!s:>8}")
+    print(f"{'codes held':<32} {len(service.tokens):>8}")
+    print(f"{'delivery queue, pending':<32} {service.deliveries.pending():>8}")
+
+
+def bench_wardrobe(args):
+    """Wardrobe page queries (first, deep and filtered) and script time, for a user with 2,000 items."""
+    import garments
+    import wardrobe_store
+
+    user = "demo@example.com"
+    with scratch_dir(), script_timer() as timer:
+        store = wardrobe_store.WardrobeStore()
+        for i in range(2000):
+            colors = (garments.color_name((i * 37 % 256, i * 91 % 256, i * 53 % 256)),)
+            garment = garments.Garment(f"{i:064x}", 600, 800, colors, (("Formal", "Casual"), ("Sporty",))[i % 2])
+            store.add(user, garments.CATEGORIES[i % len(garments.CATEGORIES)], garment)
+
+        def timed(**kwargs):
+            samples = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                store.page(user, **kwargs)
+                samples.append(time.perf_counter() - started)
+            return samples
+
+        report("first page", timed())
+        report("page 80 (keyset)", timed(cursor=store.page(user, limit=24 * 79).next_cursor))
+        report("filtered: category + 2 tags", timed(category="Top", tags=("style:Formal", "color:navy")))
+        store.close()
+
+        at = logged_in_app_test("wardrobe", user=user)
+        for _ in range(min(args.repeat, 50)):
+            at.run()
+        report("wardrobe page script", timer.take()[1:])
+
+
+def bench_fragments(args):
+    """Script time per navigation or style click, which reruns only the page region, vs. a full rerun of the same page."""
+    import resources
+
+    # (button label, page it leads to); sidebar navigation, the style buttons and "Back to Home".
+    clicks = [("Help", "help"), ("Home", "home"), ("Formal", "style_outfits"), ("Back to Home", "home")]
+    with scratch_dir(), script_timer() as timer:
+        at = logged_in_app_test("home")
+        at.run()
+        full = {page: [] for _, page in clicks}
+        partial = {label: [] for label, _ in clicks}
+        for _ in range(min(args.repeat, 100)):
+            for label, page in clicks:
+                # AppTest keeps only the rerun fragment's elements, so a full run
+                # brings back the sidebar (and is the baseline) before each click.
+                at.run()
+                timer.take()
+                at.button[[b.label for b in at.button].index(label)].click().run()
+                # The click's callback and the region rerun.
+                partial[label].append(sum(timer.take()))
+                at.run()
+                full[page].append(sum(timer.take()))
+        for label, page in clicks:
+            report(f"click {label!r} (region)", partial[label])
+            report(f"full rerun, {page}", full[page])
+        stats = resources.get_session_tracker().stats()
+        print(f"{'runs: full / partial':<32} {stats.full_runs} / {stats.partial_runs}")
+
+
+def bench_instrumentation(args):
+    """Cost of each instrumentation hook when off and on, and home page script time with it off and on."""
+    import instrumentation
+
+    def noop():
+        pass
+
+    def timed_block():
+        with instrumentation.page_timer("bench"):
+            pass
+
+    timed_noop = instrumentation.timed("bench_seconds")(noop)
+    hooks = [
+        ("bare call", noop),
+        ("timed() function", timed_noop),
+        ("count()", lambda: instrumentation.count("bench_total")),
+        ("page_timer() block", timed_block),
+    ]
+    loops = 100_000
+    for enabled in (False, True):
+        instrumentation.enable(enabled)
+        for name, hook in hooks:
+            samples = []
+            for _ in range(5):
+                started = time.perf_counter()
+                for _ in range(loops):
+                    hook()
+                samples.append((time.perf_counter() - started) / loops)
+            report(f"{name}, {'on' if enabled else 'off'}", samples, unit="ns", scale=1e9)
+
+    with scratch_dir(), script_timer() as timer:
+        at = logged_in_app_test("home")
+        at.run()
+        for enabled in (False, True):
+            instrumentation.enable(enabled)
+            timer.take()
+            for _ in range(args.repeat):
+                at.run()
+            report(f"home page script, metrics {'on' if enabled else 'off'}", timer.take())
+    instrumentation.enable(False)
+    text = instrumentation.prometheus_text()
+    print(f"{'/metrics body':<32} {len(text):>8,} bytes, {text.count(chr(10)):,} lines")
+
+
+JOURNEY_STEPS = ("login_page", "signup", "user_details", "choose_style", "upload_image", "home", "style_outfits", "edit_profile")
+
+
+def journey_photo(i):
+    """A distinct but reproducible JPEG for journey ``i``, so reruns store no new images."""
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.random.default_rng(i).integers(0, 256, (60, 45, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).resize((480, 640)).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def run_journey(i, timer, timeout):
+    """Drives one new session from the login page through editing its profile.
+
+    The intro is switched off: AppTest's st.context.cookies mock reports every
+    cookie as set, so the intro would never be shown anyway.
+
+    Returns [(step, wall seconds, script seconds, reruns)]; raises RuntimeError
+    naming the step where the app errored or did not reach the expected page.
+    """
+    at = app_test(timeout)
+    email, password = f"journey{i}@example.com", "journey-password"
+    results = []
+
+    def button(label):
+        return at.button[[b.label for b in at.button].index(label)]
+
+    def text_input(label):
+        return at.text_input[[t.label for t in at.text_input].index(label)]
+
+    def problem(fallback):
+        if at.exception:
+            return at.exception[0].message
+        shown = [e.value for e in (*at.error, *at.warning)]
+        return shown[0] if shown else fallback
+
+    def step(name, expected_page, *actions):
+        timer.take_session(at)
+        started = time.perf_counter()
+        try:
+            for action in actions:
+                action()
+                at.run()
+        except (KeyError, ValueError, IndexError) as e:
+            # A widget the next action needs is missing: the app showed something else.
+            raise RuntimeError(f"{name}: {problem(f'no widget {e}')}") from None
+        wall = time.perf_counter() - started
+        executions = timer.take_session(at)
+        page = at.session_state["view"].page if "view" in at.session_state else None
+        if at.exception or at.error or page != expected_page:
+            raise RuntimeError(f"{name}: {problem(f'on {page!r}')}")
+        # Executions beyond one per interaction are st.rerun()s.
+        results.append((name, wall, sum(executions), len(executions) - len(actions)))
+
+    step("login_page", "login", lambda: None)
+    step(
+        "signup", "user_details",
+        lambda: at.button(key="email_signup_btn").click(),
+        lambda: (
+            at.text_input(key="signup_email").input(email),
+            at.text_input(key="signup_password").input(password),
+            at.text_input(key="confirm_password").input(password),
+            button("Create Account").click(),
+        ),
+        lambda: (
+            at.text_input(key="login_email").input(email),
+            at.text_input(key="login_password").input(password),
+            at.button(key="email_login_btn").click(),
+        ),
+    )
+    step(
+        "user_details", "choose_style",
+        lambda: (text_input("Name").input(f"Journey {i}"), at.number_input[0].set_value(20 + i % 40), button("Continue").click()),
+    )
+    step(
+        "choose_style", "upload_image",
+        lambda: (at.multiselect(key="style_multiselect").select("Formal").select("Casual").select("Sporty"), button("Save & Continue").click()),
+    )
+    step("upload_image", "all_set", lambda: at.get("file_uploader")[0].upload(f"me{i}.jpg", journey_photo(i), "image/jpeg"))
+    step("home", "home", lambda: button("Start Exploring").click())
+    step("style_outfits", "style_outfits", lambda: at.button(key="style_btn_0").click())
+    # AppTest keeps only the rerun region's elements after a partial run; a plain
+    # rerun (not measured) brings the sidebar back.
+    at.run()
+    step(
+        "edit_profile", "profile",
+        lambda: button("Account").click(),
+        lambda: button("Edit Profile").click(),
+        lambda: (text_input("Name").input(f"Journey {i} edited"), button("Save Changes").click()),
+    )
+    return results
+
+
+def bench_journey(args):
+    """The full user journey in --sessions concurrent sessions against local stubs.
+
+    Per step: wall time (the AppTest round trip, including waiting on shared
+    pools) and script time percentiles, and reruns; per journey: user-record
+    bytes written to the user database. Passwords are hashed at
+    --password-iterations rather than the production cost, whose time per hash
+    is reported separately; the new user database (whose default users are
+    hashed at that cost) is created before the journeys start.
+    """
+    import instrumentation
+    import passwords
+    import stubs
+    from resources import get_password_hasher, get_user_store
+
+    hashes = []
+    for _ in range(3):
+        started = time.perf_counter()
+        passwords.hash_password("journey-password")
+        hashes.append(time.perf_counter() - started)
+    report(f"password hash, {passwords.ITERATIONS:,} iterations", hashes)
+    get_password_hasher().iterations = args.password_iterations
+
+    server = stubs.start_stub("openai", latency=args.latency, chunk_delay=args.chunk_delay)
+    os.environ["OPENAI_BASE_URL"] = f"{server.url}/v1"
+    instrumentation.enable()
+    instrumentation.REGISTRY.reset()
+    with scratch_dir(), script_timer() as timer, concurrent_app_tests():
+        get_user_store()
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.sessions) as pool:
+            futures = [pool.submit(run_journey, i, timer, 120) for i in range(args.sessions)]
+            outcomes = []
+            for future in futures:
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    outcomes.append(e)
+        elapsed = time.perf_counter() - started
+    server.shutdown()
+    counters = {entry["name"]: entry["value"] for entry in instrumentation.REGISTRY.snapshot()["counters"]}
+    instrumentation.enable(False)
+
+    journeys = [outcome for outcome in outcomes if isinstance(outcome, list)]
+    failures = [outcome for outcome in outcomes if not isinstance(outcome, list)]
+    steps = defaultdict(list)
+    for journey in journeys:
+        for name, wall, script, reruns in journey:
+            steps[name].append((wall, script, reruns))
+    for name in JOURNEY_STEPS:
+        if steps[name]:
+            report(f"{name}, wall", [wall for wall, _, _ in steps[name]])
+            report(f"{name}, script", [script for _, script, _ in steps[name]])
+            print(f"{name + ', reruns':<32} mean={statistics.mean(r for _, _, r in steps[name]):.2f}")
+    written = counters.get("styleteller_user_store_bytes_written_total", 0)
+    print(f"{'user DB bytes per journey':<32} {written / max(len(journeys), 1):,.0f}")
+    print(f"{'journeys completed':<32} {len(journeys)} of {len(outcomes)} in {elapsed:.1f}s")
+    for failure in failures:
+        print(f"  failed at {failure}")
+
+
+def bench_sessions(args):
+    """Per-session state size, and RSS while thousands of sessions are opened and abandoned, with and without cleanup."""
+    import copy
+
+    import session
+
+    with scratch_dir():
+        tracker = session.SessionTracker()
+        at = logged_in_app_test("home")
+        at.run()
+        state = {key: at.session_state[key] for key in at.session_state}
+        tracker.touch("real", state)
+        print(f"{'session_state keys, home page':<32} {len(state):>10}")
+        print(f"{'session_state bytes, home page':<32} {tracker.stats().total_bytes:>10,}")
+
+    # One session opens per simulated second and is abandoned at once. With cleanup,
+    # Streamlit closes each server.disconnectedSessionTTL seconds later, as it does
+    # once a browser has gone, and the tracker sweeps every SWEEP_INTERVAL seconds.
+    from streamlit import config
+
+    ttl = config.get_option("server.disconnectedSessionTTL")
+    total = args.sessions * 250
+    for cleaning in (False, True):
+        now = [0.0]
+        held = {}
+        tracker = session.SessionTracker(idle_timeout=session.IDLE_TIMEOUT, clock=lambda: now[0])
+        baseline = rss_bytes()
+        peak = baseline
+        for i in range(total):
+            now[0] += 1
+            held[i] = copy.deepcopy(state)
+            tracker.touch(i, held[i])
+            if cleaning:
+                held.pop(i - ttl, None)
+                if i % session.SWEEP_INTERVAL == 0:
+                    tracker.sweep()
+            if i % 500 == 0:
+                peak = max(peak, rss_bytes())
+        peak = max(peak, rss_bytes())
+        label = "with cleanup" if cleaning else "without cleanup"
+        print(f"{label:<32} opened={total:<6} held={len(held):<6} tracked={tracker.stats().sessions:<6} "
+              f"rss growth={(peak - baseline) / 2**20:7.1f} MiB")
+
+    # A tab left open past IDLE_TIMEOUT keeps its ViewState; the rest goes on its next run.
+    returning = dict(state, login_email="demo@example.com")
+    returning["view"] = copy.deepcopy(state["view"])
+    now = [0.0]
+    tracker = session.SessionTracker(clock=lambda: now[0])
+    tracker.resume(returning)
+    now[0] += session.IDLE_TIMEOUT
+    tracker.resume(returning)
+    print(f"{'idle tab, keys kept':<32} {', '.join(returning):>10}")
+
+
+BENCHMARKS = {
+    "index": bench_index,
+    "instrumentation": bench_instrumentation,
+    "intro": bench_intro,
+    "journey": bench_journey,
+    "login": bench_login,
+    "otp": bench_otp,
+    "palette": bench_palette,
+    "phash": bench_phash,
+    "catalog": bench_catalog,
+    "fragments": bench_fragments,
+    "http": bench_http,
+    "outfits": bench_outfits,
+    "sessions": bench_sessions,
+    "startup": bench_startup,
+    "theme": bench_theme,
+    "wardrobe": bench_wardrobe,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("name", choices=sorted(BENCHMARKS), help="benchmark to run")
+    parser.add_argument("--repeat", type=int, default=200, help="iterations for timed loops")
+    parser.add_argument("--sessions", type=int, default=20, help="simulated browser sessions (x250 for the sessions soak)")
+    parser.add_argument("--items", type=int, default=100_000, help="catalog size, user count or stored hashes for index, login and phash benchmarks")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub response latency in seconds")
+    parser.add_argument("--password-iterations", type=int, default=10_000, help="PBKDF2 cost of passwords hashed in the journey benchmark")
+    parser.add_argument("--chunk-delay", type=float, default=0.2, help="stub delay between streamed chunks")
+    args = parser.parse_args(argv)
+    if args.name in APP_BENCHMARKS:
+        check_streamlit()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# --- Outfit Catalog ---
+# Every outfit the app can show on its own, each with a feature vector: style
+# tags, dominant colors, formality and seasons. A user's profile (the style they
+# picked, their other styles, the colors of their photo, the season) becomes a weight vector over the same
+# features, so ranking the whole catalog is one matrix-vector product and top-k
+# is an argpartition, not a sort. Many profiles can be ranked at once with
+# score_many().
+#
+# The built-in catalog covers every style offered on the "Choose Your Style" page;
+# random_catalog() builds synthetic ones of any size for benchmarks. Items have
+# stable integer IDs, so they can be added and removed without invalidating
+# references held elsewhere; listeners such as the served rec_index.RecIndex are
+# told of each change.
+
+import datetime
+import hashlib
+from collections import namedtuple
+from urllib.parse import quote_plus
+
+import numpy as np
+
+STYLES = ("Formal", "Casual", "Streetwear", "Sporty", "Old money", "Minimalist", "Hip Hop")
+COLORS = ("black", "white", "grey", "navy", "beige", "brown", "olive", "red", "pastel", "bright")
+SEASONS = ("winter", "spring", "summer", "autumn")
+
+# Age brackets of the user segments.
+AGE_BRACKETS = ((17, "under 18"), (24, "18-24"), (34, "25-34"), (44, "35-44"), (54, "45-54"))
+BRACKETS = tuple(label for _, label in AGE_BRACKETS) + ("55+", "unknown")
+# Older brackets lean slightly more formal within a style.
+BRACKET_FORMALITY_SHIFT = {"under 18": -0.1, "18-24": -0.05, "35-44": 0.05, "45-54": 0.1, "55+": 0.1}
+
+# Typical formality (0 = gym, 1 = black tie) of each style; the target for its profile.
+STYLE_FORMALITY = {
+    "Formal": 0.9, "Old money": 0.8, "Minimalist": 0.55, "Casual": 0.35,
+    "Hip Hop": 0.25, "Streetwear": 0.25, "Sporty": 0.1,
+}
+
+# Profile weights: the selected style dominates, the user's other styles break ties.
+SELECTED_STYLE_WEIGHT = 1.0
+OTHER_STYLE_WEIGHT = 0.35
+COLOR_WEIGHT = 0.2
+FORMALITY_WEIGHT = 0.5
+SEASON_WEIGHT = 0.15
+
+# Feature layout: [styles | colors | formality, 1 - formality | seasons]
+_STYLE_COLUMNS = {style.lower(): i for i, style in enumerate(STYLES)}
+_COLOR_COLUMNS = {color: len(STYLES) + i for i, color in enumerate(COLORS)}
+_FORMALITY_COLUMN = len(STYLES) + len(COLORS)
+_SEASON_COLUMNS = {season: _FORMALITY_COLUMN + 2 + i for i, season in enumerate(SEASONS)}
+FEATURES = _FORMALITY_COLUMN + 2 + len(SEASONS)
+
+CatalogItem = namedtuple("CatalogItem", "item_id title description image_url styles colors formality seasons")
+
+_BUILTIN = (
+    # title, description, styles, colors, formality, seasons, card color
+    ("Charcoal Two-Piece Suit", "Slim charcoal suit, white shirt and black oxfords.", ("Formal",), ("grey", "white", "black"), 0.95, SEASONS, "36454F"),
+    ("Navy Blazer Set", "Navy blazer over a light shirt with grey wool trousers.", ("Formal", "Old money"), ("navy", "grey"), 0.85, SEASONS, "1e3b68"),
+    ("Black Tie Evening", "Midnight tuxedo or floor-length gown with minimal jewellery.", ("Formal",), ("black",), 1.0, ("winter", "autumn"), "111111"),
+    ("Tailored Shirt Dress", "Belted shirt dress in cobalt with pointed flats.", ("Formal", "Minimalist"), ("navy",), 0.75, ("spring", "summer"), "007bff"),
+    ("Cable Knit and Chinos", "Cream cable-knit sweater, tan chinos and suede loafers.", ("Old money", "Casual"), ("beige", "white", "brown"), 0.6, ("autumn", "winter"), "c0c0c0"),
+    ("Riviera Linen", "Open-collar linen shirt, pleated trousers and espadrilles.", ("Old money",), ("white", "beige"), 0.55, ("summer",), "e8dcc2"),
+    ("Tweed Country Jacket", "Brown tweed jacket, turtleneck and leather boots.", ("Old money",), ("brown", "olive"), 0.7, ("autumn", "winter"), "8B4513"),
+    ("Tennis Club Whites", "Pleated skirt or shorts, white polo and a knit vest.", ("Old money", "Sporty"), ("white", "navy"), 0.45, ("spring", "summer"), "556B2F"),
+    ("Weekend Denim", "Straight-leg jeans, striped tee and white sneakers.", ("Casual",), ("navy", "white"), 0.3, ("spring", "summer", "autumn"), "87CEEB"),
+    ("Flannel Layers", "Plaid flannel over a henley with dark jeans and boots.", ("Casual",), ("red", "navy", "brown"), 0.3, ("autumn", "winter"), "FF5733"),
+    ("Sunny Day Shorts", "Chino shorts, camp-collar shirt and canvas shoes.", ("Casual",), ("bright", "beige"), 0.2, ("summer",), "32CD32"),
+    ("Cozy Knit Lounge", "Oversized knit, relaxed trousers and slip-on sneakers.", ("Casual", "Minimalist"), ("grey", "beige"), 0.25, ("winter", "autumn"), "a9a9a9"),
+    ("Oversized Hoodie Fit", "Heavyweight hoodie, cargo pants and chunky sneakers.", ("Streetwear",), ("black", "grey"), 0.15, ("autumn", "winter", "spring"), "1e1e1e"),
+    ("Graphic Tee Layers", "Boxy graphic tee over a long sleeve with wide jeans.", ("Streetwear", "Hip Hop"), ("bright", "white"), 0.15, ("spring", "summer"), "4B0082"),
+    ("Utility Vest Look", "Nylon utility vest, track pants and trail runners.", ("Streetwear", "Sporty"), ("olive", "black"), 0.2, ("spring", "autumn"), "FFD700"),
+    ("Varsity Jacket Set", "Wool varsity jacket, hoodie and high-top sneakers.", ("Streetwear", "Hip Hop"), ("red", "white"), 0.25, ("autumn", "winter"), "B22222"),
+    ("Running Essentials", "Breathable tee, split shorts and cushioned runners.", ("Sporty",), ("bright", "black"), 0.05, ("spring", "summer"), "FF8C00"),
+    ("Track Suit Classic", "Matching zip track jacket and pants with retro trainers.", ("Sporty", "Hip Hop"), ("navy", "white"), 0.15, SEASONS, "191970"),
+    ("Athleisure Commute", "Technical joggers, quarter-zip and clean white sneakers.", ("Sporty", "Minimalist"), ("grey", "black"), 0.3, SEASONS, "708090"),
+    ("Winter Trail Layers", "Fleece mid-layer, shell jacket and insulated leggings.", ("Sporty",), ("olive", "bright"), 0.1, ("winter", "autumn"), "2E8B57"),
+    ("Monochrome Black", "Black merino crew, tapered trousers and leather sneakers.", ("Minimalist",), ("black",), 0.55, SEASONS, "000000"),
+    ("Neutral Layers", "Camel coat over an ecru knit with straight beige trousers.", ("Minimalist", "Old money"), ("beige", "white"), 0.65, ("autumn", "winter"), "D2B48C"),
+    ("Clean White Tee", "Heavy white tee, raw denim and minimal white sneakers.", ("Minimalist", "Casual"), ("white", "navy"), 0.3, ("spring", "summer"), "f5f5f5"),
+    ("Slip Dress and Knit", "Silk slip dress under a fine-gauge cardigan.", ("Minimalist",), ("pastel", "beige"), 0.5, ("spring",), "E6C9C9"),
+    ("Baggy Denim and Chains", "Baggy jeans, oversized jersey and statement chain.", ("Hip Hop",), ("navy", "bright"), 0.15, ("spring", "summer"), "1E90FF"),
+    ("Puffer and Timbs", "Glossy puffer jacket, hoodie and wheat work boots.", ("Hip Hop", "Streetwear"), ("black", "brown"), 0.2, ("winter",), "4a3728"),
+    ("Retro Jersey Fit", "Vintage basketball jersey, tee and wide cargo shorts.", ("Hip Hop", "Sporty"), ("red", "bright"), 0.1, ("summer",), "DC143C"),
+    ("Tailored Hip Hop", "Relaxed blazer over a hoodie with pleated trousers.", ("Hip Hop", "Formal"), ("grey", "black"), 0.5, ("autumn", "spring"), "555555"),
+)
+
+
+def placeholder_image(title, color):
+    """Card image for an outfit: its color with the title on it."""
+    color = (color or "#36454F").lstrip("#")[:6] or "36454F"
+    return f"https://placehold.co/300x400/{color}/ffffff?text={quote_plus(title)}"
+
+
+def age_bracket(age):
+    if not isinstance(age, (int, float)):
+        return "unknown"
+    for upper, label in AGE_BRACKETS:
+        if age <= upper:
+            return label
+    return "55+"
+
+
+def current_season(today=None):
+    """Northern-hemisphere season of ``today``."""
+    month = (today or datetime.date.today()).month
+    return SEASONS[(month % 12) // 3]
+
+
+def item_vector(item):
+    """Feature vector of one CatalogItem."""
+    vector = np.zeros(FEATURES, dtype=np.float32)
+    for style in item.styles:
+        vector[_STYLE_COLUMNS[style.lower()]] = 1.0
+    for color in item.colors:
+        vector[_COLOR_COLUMNS[color]] = 1.0 / len(item.colors)
+    vector[_FORMALITY_COLUMN] = item.formality
+    vector[_FORMALITY_COLUMN + 1] = 1.0 - item.formality
+    for season in item.seasons:
+        vector[_SEASON_COLUMNS[season]] = 1.0
+    return vector
+
+
+def color_weights(colors):
+    """The color part of a profile vector: COLOR_WEIGHT on each of ``colors`` (names in COLORS).
+
+    An item's color features sum to 1, so these add at most COLOR_WEIGHT to its score.
+    """
+    weights = np.zeros(FEATURES, dtype=np.float32)
+    for color in colors:
+        if color in _COLOR_COLUMNS:
+            weights[_COLOR_COLUMNS[color]] = COLOR_WEIGHT
+    return weights
+
+
+def profile_vector(selected_style, styles=(), colors=(), season=None, formality_shift=0.0):
+    """Weight vector ranking items for a user who picked ``selected_style``.
+
+    ``styles`` are the user's other preferred styles, ``colors`` preferred color
+    names, ``season`` one of SEASONS (None for no seasonal preference).
+    """
+    weights = np.zeros(FEATURES, dtype=np.float32)
+    for style in styles:
+        column = _STYLE_COLUMNS.get(style.strip().lower())
+        if column is not None:
+            weights[column] = OTHER_STYLE_WEIGHT
+    selected = _STYLE_COLUMNS.get(selected_style.strip().lower())
+    if selected is not None:
+        weights[selected] = SELECTED_STYLE_WEIGHT
+    weights += color_weights(colors)
+    # target*f + (1-target)*(1-f): rewards items on the style's side of the formality scale.
+    target = STYLE_FORMALITY.get(STYLES[selected] if selected is not None else "", 0.5) + formality_shift
+    target = min(max(target, 0.0), 1.0)
+    weights[_FORMALITY_COLUMN] = FORMALITY_WEIGHT * target
+    weights[_FORMALITY_COLUMN + 1] = FORMALITY_WEIGHT * (1.0 - target)
+    if season is not None:
+        weights[_SEASON_COLUMNS[season]] = SEASON_WEIGHT
+    return weights
+
+
+def segment_profile(style, styles, season, bracket):
+    """Profile vector of a (style, other styles, season, age bracket) segment.
+
+    The built-in items are unisex, so gender is not part of a segment.
+    """
+    return profile_vector(style, styles, season=season, formality_shift=BRACKET_FORMALITY_SHIFT.get(bracket, 0.0))
+
+
+def top_k(scores, k):
+    """Indices of the ``k`` highest scores, best first; O(n) selection plus a sort of k."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        candidates = np.argpartition(scores, len(scores) - k)[-k:]
+        # argpartition splits ties at the k-th score arbitrarily; take all of them.
+        candidates = np.nonzero(scores >= scores[candidates].min())[0]
+    else:
+        candidates = np.arange(len(scores))
+    # Ties go to the lower index, so results are deterministic.
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order[:k]]
+
+
+class Catalog:
+    """Catalog items plus their (n, FEATURES) float32 feature matrix and item IDs.
+
+    ``listeners`` get add_item(catalog, item_id) after an item is added and
+    remove_item(catalog, item_id) after one is removed.
+    """
+
+    def __init__(self, items, features=None, ids=None):
+        self.items = items
+        self.features = np.ascontiguousarray(
+            features if features is not None else np.stack([item_vector(item) for item in items]),
+            dtype=np.float32,
+        )
+        if ids is None:
+            ids = [item.item_id for item in items] if items is not None else np.arange(len(self.features))
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.listeners = []
+        self._rows = None
+
+    def __len__(self):
+        return len(self.features)
+
+    def row(self, item_id):
+        """Row of an item in ``features``, or None."""
+        if self._rows is None:
+            self._rows = {int(item_id): row for row, item_id in enumerate(self.ids)}
+        return self._rows.get(int(item_id))
+
+    def get(self, item_id):
+        row = self.row(item_id)
+        return self.items[row] if row is not None else None
+
+    def vector(self, item_id):
+        return self.features[self.row(item_id)]
+
+    def add(self, item):
+        """Appends a CatalogItem; its item_id must be new."""
+        if self.row(item.item_id) is not None:
+            raise ValueError(f"Catalog item {item.item_id} already exists.")
+        self.items.append(item)
+        self.features = np.vstack([self.features, item_vector(item)])
+        self.ids = np.append(self.ids, np.int32(item.item_id))
+        self._rows[int(item.item_id)] = len(self.ids) - 1
+        for listener in self.listeners:
+            listener.add_item(self, item.item_id)
+
+    def remove(self, item_id):
+        """Removes an item by ID; returns the removed CatalogItem."""
+        row = self.row(item_id)
+        if row is None:
+            raise KeyError(item_id)
+        item = self.items.pop(row)
+        self.features = np.delete(self.features, row, axis=0)
+        self.ids = np.delete(self.ids, row)
+        self._rows = None
+        for listener in self.listeners:
+            listener.remove_item(self, item_id)
+        return item
+
+    def digest(self):
+        """Content hash of the IDs and features, for spotting a stale index."""
+        return hashlib.sha256(self.ids.tobytes() + self.features.tobytes()).hexdigest()[:16]
+
+    def score(self, profile):
+        """Scores every item against one profile vector."""
+        return self.features @ profile
+
+    def score_many(self, profiles):
+        """Scores every item against each row of ``profiles``; returns (n profiles, n items)."""
+        return np.asarray(profiles, dtype=np.float32) @ self.features.T
+
+    def rank(self, profile, k):
+        """Indices of the ``k`` best items for ``profile``, best first."""
+        return top_k(self.score(profile), k)
+
+    def rank_many(self, profiles, k):
+        """Top-``k`` item indices for each row of ``profiles``, best first; returns (n profiles, k)."""
+        scores = self.score_many(profiles)
+        k = min(k, scores.shape[1])
+        # Each profile's scores are one contiguous row, so partitioning runs along memory.
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        # Ties go to the lower index, as in top_k().
+        order = np.lexsort((candidates, -np.take_along_axis(scores, candidates, axis=1)), axis=1)
+        return np.take_along_axis(candidates, order, axis=1)
+
+    def recommend(self, details, selected_style, k, season=None, colors=()):
+        """The ``k`` best CatalogItems for a user's records.UserDetails, chosen style and preferred colors."""
+        profile = profile_vector(selected_style, details.styles, colors, season=season or current_season())
+        return [self.items[i] for i in self.rank(profile, k)]
+
+
+def builtin_items():
+    return [
+        CatalogItem(item_id, title, description, placeholder_image(title, color), styles, colors, formality, seasons)
+        for item_id, (title, description, styles, colors, formality, seasons, color) in enumerate(_BUILTIN, start=1)
+    ]
+
+
+_default = None
+
+
+def default_catalog():
+    """The built-in catalog, built on first use."""
+    global _default
+    if _default is None:
+        _default = Catalog(builtin_items())
+    return _default
+
+
+def random_catalog(n, seed=0):
+    """A synthetic catalog of ``n`` items with random features, for benchmarks (items are not built)."""
+    rng = np.random.default_rng(seed)
+    features = np.zeros((n, FEATURES), dtype=np.float32)
+    rows = np.arange(n)
+    # One or two style tags, one to three colors, a formality and one or more seasons.
+    features[rows, rng.integers(0, len(STYLES), n)] = 1.0
+    second = rng.random(n) < 0.4
+    features[rows[second], rng.integers(0, len(STYLES), int(second.sum()))] = 1.0
+    color_columns = len(STYLES) + rng.integers(0, len(COLORS), (n, 3))
+    color_counts = rng.integers(1, 4, n)
+    for j in range(3):
+        used = color_counts > j
+        features[rows[used], color_columns[used, j]] = 1.0 / color_counts[used]
+    formality = rng.random(n, dtype=np.float32)
+    features[:, _FORMALITY_COLUMN] = formality
+    features[:, _FORMALITY_COLUMN + 1] = 1.0 - formality
+    features[:, _FORMALITY_COLUMN + 2:] = rng.random((n, len(SEASONS))) < 0.5
+    return Catalog(None, features)
@@ -0,0 +1,96 @@
+# --- Garment Analysis ---
+# Worker-side processing of wardrobe photos. Each photo goes through
+# imaging.ingest_image (working copy and thumbnails, content-addressed), and
+# is then described by the attributes the wardrobe is indexed by:
+#
+# - colors: the dominant colors of the photo's palette (palette.py), named with
+#   catalog.COLORS;
+# - styles: the styles of the built-in catalog outfits closest to those colors and
+#   to the formality typical of the garment's category.
+#
+# The category itself is chosen by the user when uploading; nothing in the app
+# can recognize garments from pixels.
+
+import colorsys
+from collections import namedtuple
+
+import imaging
+import palette
+
+CATEGORIES = ("Top", "Bottom", "Dress", "Outerwear", "Shoes", "Accessory")
+# Typical formality (see catalog.STYLE_FORMALITY) of a garment in each category.
+CATEGORY_FORMALITY = {"Top": 0.4, "Bottom": 0.45, "Dress": 0.6, "Outerwear": 0.6, "Shoes": 0.45, "Accessory": 0.5}
+
+# Dominant colors kept per garment, and the smallest share of the palette one must cover.
+MAX_COLORS = 3
+MIN_COLOR_SHARE = 0.12
+STYLE_TAGS = 2
+
+Garment = namedtuple("Garment", "image_id width height colors styles")
+
+
+def color_name(rgb):
+    """Nearest of catalog.COLORS for an (r, g, b) color."""
+    hue, saturation, value = colorsys.rgb_to_hsv(*(channel / 255 for channel in rgb))
+    hue *= 360
+    if value < 0.2:
+        return "black"
+    if saturation < 0.12:
+        return "white" if value > 0.85 else "grey"
+    if saturation < 0.3 and value > 0.8:
+        return "pastel"
+    if hue < 15 or hue >= 340:
+        return "red" if value > 0.35 else "brown"
+    if hue < 50:
+        return "beige" if value > 0.7 and saturation < 0.5 else "brown"
+    if hue < 75:
+        return "olive" if value < 0.6 else "bright"
+    if 190 <= hue < 260 and value < 0.55:
+        return "navy"
+    return "bright"
+
+
+def dominant_colors(image_palette):
+    """Color names covering at least MIN_COLOR_SHARE of a palette.Palette, most dominant first."""
+    shares = {}
+    for rgb, share in zip(image_palette.colors, image_palette.shares):
+        name = color_name(rgb)
+        shares[name] = shares.get(name, 0.0) + share
+    ranked = sorted(shares.items(), key=lambda item: -item[1])
+    return tuple(name for name, share in ranked[:MAX_COLORS] if share >= MIN_COLOR_SHARE) or (ranked[0][0],)
+
+
+def style_tags(colors, category):
+    """Styles of the built-in outfits most similar to a garment's colors and formality, best first."""
+    import numpy as np
+
+    import catalog
+
+    formality = CATEGORY_FORMALITY.get(category, 0.5)
+    garment = catalog.item_vector(catalog.CatalogItem(0, "", "", "", (), colors, formality, ()))
+    items = catalog.default_catalog()
+    # Color and formality columns only: the garment has no styles or seasons yet.
+    columns = slice(len(catalog.STYLES), len(catalog.STYLES) + len(catalog.COLORS) + 2)
+    similarity = items.features[:, columns] @ garment[columns]
+    memberships = items.features[:, :len(catalog.STYLES)]
+    # Mean similarity of each style's outfits, so styles with more outfits are not favored.
+    scores = (memberships.T @ similarity) / np.maximum(memberships.sum(axis=0), 1)
+    return tuple(catalog.STYLES[i] for i in catalog.top_k(scores, STYLE_TAGS))
+
+
+def analyze_garment(data, category, owner=None, media_dir=None):
+    """[worker] Stores ``owner``'s wardrobe photo with thumbnails and returns its Garment."""
+    image = imaging.ingest_image(data, media_dir, owner)
+    colors = dominant_colors(palette.palette_of(image, media_dir))
+    return Garment(image.digest, image.width, image.height, colors, style_tags(colors, category))
+
+
+def analyze_garments(photos, category, owner=None, media_dir=None):
+    """[worker] analyze_garment() for a batch of (name, bytes); returns (name, Garment or error message) pairs."""
+    results = []
+    for name, data in photos:
+        try:
+            results.append((name, analyze_garment(data, category, owner, media_dir)))
+        except imaging.ImageRejected as e:
+            results.append((name, str(e)))
+    return results
@@ -0,0 +1,183 @@
+# --- Outbound HTTP ---
+# One pooled HTTP client per process for every server-side fetch. Connections
+# are kept alive and reused per host (bounded by POOL_SIZE), every request gets
+# a connect/read timeout, idempotent requests are retried on connection errors
+# and 429/5xx with jittered exponential backoff, and each request is counted in
+# METRICS.
+#
+# The OpenAI SDK brings its own HTTP stack, so openai_http_client() builds a
+# client for it with the same pool size, timeouts and metrics; the SDK does its
+# own jittered retries.
+
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import instrumentation
+
+# Connections kept alive per host, and the most that are ever open to one host.
+POOL_SIZE = int(os.environ.get("STYLETELLER_HTTP_POOL_SIZE", 10))
+# Hosts whose pools are kept; the least recently used one is closed beyond this.
+POOL_HOSTS = int(os.environ.get("STYLETELLER_HTTP_POOL_HOSTS", 20))
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = float(os.environ.get("STYLETELLER_HTTP_TIMEOUT", 15))
+RETRIES = int(os.environ.get("STYLETELLER_HTTP_RETRIES", 3))
+# Waits 0.25s, 0.5s, 1s, ... between attempts, each plus up to BACKOFF_JITTER.
+BACKOFF_FACTOR = 0.25
+BACKOFF_JITTER = 0.25
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+USER_AGENT = "StyleTeller/1.0"
+
+
+class HTTPMetrics:
+    """Thread-safe per-host request counters and latency samples."""
+
+    def __init__(self, samples=1000):
+        self._lock = threading.Lock()
+        self._samples = samples
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = defaultdict(int)
+            self.errors = defaultdict(int)
+            self.retries = defaultdict(int)
+            self.bytes_received = defaultdict(int)
+            self.latency = defaultdict(lambda: deque(maxlen=self._samples))
+
+    def record(self, host, seconds, status=None, retries=0, size=0):
+        """Records one request; ``status`` None means it failed without a response."""
+        with self._lock:
+            self.requests[host] += 1
+            self.retries[host] += retries
+            self.bytes_received[host] += size
+            self.latency[host].append(seconds)
+            if status is None or status >= 500:
+                self.errors[host] += 1
+        instrumentation.observe("styleteller_http_request_seconds", seconds, host=host)
+
+    def snapshot(self):
+        """Returns {host: {"requests", "errors", "retries", "bytes", "latency"}}."""
+        with self._lock:
+            return {
+                host: {
+                    "requests": count,
+                    "errors": self.errors[host],
+                    "retries": self.retries[host],
+                    "bytes": self.bytes_received[host],
+                    "latency": list(self.latency[host]),
+                }
+                for host, count in self.requests.items()
+            }
+
+    def samples(self):
+        """The per-host counters as instrumentation Samples."""
+        with self._lock:
+            counters = (
+                ("styleteller_http_requests_total", self.requests),
+                ("styleteller_http_errors_total", self.errors),
+                ("styleteller_http_retries_total", self.retries),
+                ("styleteller_http_received_bytes_total", self.bytes_received),
+            )
+            return [
+                instrumentation.Sample(name, {"host": host}, value, "counter")
+                for name, values in counters
+                for host, value in values.items()
+            ]
+
+
+METRICS = HTTPMetrics()
+instrumentation.add_collector(METRICS.samples)
+
+
+class PooledSession(requests.Session):
+    """requests.Session with default timeouts, retries and metrics."""
+
+    def __init__(self, pool_size=POOL_SIZE, pool_hosts=POOL_HOSTS, retries=RETRIES, metrics=METRICS):
+        super().__init__()
+        self.metrics = metrics
+        self.headers["User-Agent"] = USER_AGENT
+        retry = Retry(
+            total=retries,
+            backoff_factor=BACKOFF_FACTOR,
+            backoff_jitter=BACKOFF_JITTER,
+            status_forcelist=RETRY_STATUSES,
+            # Hand the last response back instead of raising, like a request without retries.
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, pool_block=True, max_retries=retry)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            self.metrics.record(host, time.perf_counter() - started)
+            raise
+        history = getattr(response.raw, "retries", None)
+        size = 0 if kwargs.get("stream") else len(response.content)
+        self.metrics.record(
+            host,
+            time.perf_counter() - started,
+            response.status_code,
+            retries=len(history.history) if history is not None else 0,
+            size=size,
+        )
+        return response
+
+    def connections_opened(self):
+        """TCP connections opened so far across all hosts (keep-alive reuses them)."""
+        total = 0
+        for adapter in {id(a): a for a in self.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            total += sum(pools[key].num_connections for key in pools.keys())
+        return total
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    """Returns the process-wide PooledSession, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = PooledSession()
+        return _session
+
+
+def get(url, **kwargs):
+    """GET through the shared session."""
+    return session().get(url, **kwargs)
+
+
+def openai_http_client(timeout=READ_TIMEOUT, metrics=METRICS):
+    """Returns an HTTP client for openai.OpenAI(http_client=...) sharing this module's limits and metrics."""
+    # The OpenAI SDK's own HTTP library, installed with it.
+    import httpx2
+    import openai
+
+    def on_request(request):
+        request.extensions["styleteller_started"] = time.perf_counter()
+
+    def on_response(response):
+        started = response.request.extensions.get("styleteller_started", time.perf_counter())
+        # Streamed responses are timed to their headers.
+        metrics.record(response.request.url.netloc.decode("ascii"), time.perf_counter() - started, response.status_code)
+
+    return openai.DefaultHttpxClient(
+        limits=httpx2.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        timeout=httpx2.Timeout(timeout, connect=CONNECT_TIMEOUT),
+        event_hooks={"request": [on_request], "response": [on_response]},
+    )
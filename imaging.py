@@ -0,0 +1,210 @@
+# --- Image Ingestion ---
+# Turns an uploaded photo into a bounded working copy plus thumbnails, stored
+# content-addressed under static/media/<digest[:2]>/<digest>/ so a re-upload of
+# the same bytes is a lookup, not another decode.
+#
+# Phone photos are decoded with Pillow's JPEG draft mode (DCT scaling), so a 12 MP
+# image never materializes at full resolution; the raw upload is not kept.
+#
+# A photo that looks the same as one the same user already stored (phash.py: close
+# hash, aspect ratio and colors) is not decoded into thumbnails again: the earlier
+# image's files (and palette) are linked into the new photo's own directory, so
+# every upload keeps its own digest and nothing points across users.
+
+import hashlib
+import io
+import json
+import os
+import shutil
+from collections import namedtuple
+
+from PIL import Image, ImageOps
+
+import assets
+import phash
+
+# STYLETELLER_MEDIA_DIR stores images elsewhere (e.g. a benchmark's scratch
+# directory); only images under static/media are served. Functions here take
+# media_dir=None to mean MEDIA_DIR as it is when they are called.
+MEDIA_DIR = os.environ.get("STYLETELLER_MEDIA_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "static", "media",
+)
+MEDIA_URL = "app/static/media"
+
+ALLOWED_FORMATS = ("JPEG", "PNG")
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# Checked against the header before decoding; also guards against decompression bombs.
+MAX_PIXELS = 24_000_000
+# Longest edge of the stored working copy.
+WORKING_SIZE = 1600
+THUMBNAIL_SIZES = (640, 320, 96)
+JPEG_QUALITY = 85
+# Largest difference in aspect ratio between a photo and a stored near-duplicate.
+MAX_ASPECT_DIFFERENCE = 0.02
+
+IngestedImage = namedtuple("IngestedImage", "digest width height files")
+
+
+class ImageRejected(ValueError):
+    """Raised for uploads that are not an acceptable image; the message is user-facing."""
+
+
+def image_dir(digest, media_dir=None):
+    return os.path.join(media_dir or MEDIA_DIR, digest[:2], digest)
+
+
+def media_path(digest, filename, media_dir=None):
+    return os.path.join(image_dir(digest, media_dir), filename)
+
+
+def media_url(digest, filename):
+    """URL of a stored file under Streamlit's static serving."""
+    return f"{MEDIA_URL}/{digest[:2]}/{digest}/{filename}"
+
+
+def load_manifest(digest, media_dir=None):
+    """Returns the IngestedImage for an already stored digest, or None.
+
+    Near-duplicates stored before they got their own files are aliases; for
+    those this is the earlier image they point at.
+    """
+    try:
+        with open(os.path.join(image_dir(digest, media_dir), "manifest.json"), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if "alias" in manifest:
+        return load_manifest(manifest["alias"], media_dir)
+    return IngestedImage(digest, manifest["width"], manifest["height"], manifest["files"])
+
+
+def ingest_image(data, media_dir=None, owner=None):
+    """Validates, normalizes and stores an uploaded image; returns its IngestedImage.
+
+    ``owner`` is the uploading user's ID; near-duplicates are only looked for among
+    that user's earlier photos, and not at all without one.
+    """
+    media_dir = media_dir or MEDIA_DIR
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise ImageRejected(f"Images must be smaller than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+    digest = hashlib.sha256(data).hexdigest()
+    existing = load_manifest(digest, media_dir)
+    if existing is not None:
+        return existing
+
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Exception:
+        raise ImageRejected("That file is not an image we can read.") from None
+    with img:
+        if img.format not in ALLOWED_FORMATS:
+            raise ImageRejected("Please upload a JPEG or PNG image.")
+        if img.width * img.height > MAX_PIXELS:
+            raise ImageRejected(f"Images must be at most {MAX_PIXELS // 1_000_000} megapixels.")
+        working = _decode_working_copy(img)
+
+    image_hash = phash.dhash(working)
+    colors = phash.color_signature(working)
+    index = None
+    if owner is not None and phash.is_distinctive(image_hash):
+        index = phash.default_index(media_dir, owner)
+        original = _near_duplicate(index, image_hash, working, colors, media_dir)
+        if original is not None:
+            return _store_copy(digest, original, media_dir)
+
+    files = {"working": "working.jpg"}
+    out_dir = image_dir(digest, media_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    _save_jpeg(working, os.path.join(out_dir, files["working"]))
+    # Each thumbnail is reduced from the next larger one, not from the working copy.
+    thumb = working
+    for size in THUMBNAIL_SIZES:
+        thumb = thumb.copy()
+        thumb.thumbnail((size, size))
+        files[str(size)] = f"thumb_{size}.jpg"
+        _save_jpeg(thumb, os.path.join(out_dir, files[str(size)]))
+
+    # The manifest is written last, so its presence means the entry is complete.
+    _write_manifest(
+        digest, {"width": working.width, "height": working.height, "files": files, "colors": colors.hex()}, media_dir,
+    )
+    if index is not None:
+        index.add(image_hash, digest)
+    return IngestedImage(digest, working.width, working.height, files)
+
+
+def _near_duplicate(index, image_hash, working, colors, media_dir):
+    """The stored image that ``working`` (with color signature ``colors``) is a copy of, or None."""
+    match = index.nearest(image_hash)
+    if match is None:
+        return None
+    original = load_manifest(match[0], media_dir)
+    # dHash ignores the aspect ratio, so a crop of a photo can hash like the photo.
+    if original is None or abs(original.width / original.height - working.width / working.height) > MAX_ASPECT_DIFFERENCE:
+        return None
+    # ...and color, so the same shirt in another color can hash like it too.
+    if phash.color_difference(_color_signature(original, media_dir), colors) > phash.MAX_COLOR_DIFFERENCE:
+        return None
+    return original
+
+
+def _color_signature(image, media_dir):
+    try:
+        with open(os.path.join(image_dir(image.digest, media_dir), "manifest.json"), "r") as f:
+            return bytes.fromhex(json.load(f)["colors"])
+    except (OSError, ValueError, KeyError):
+        pass
+    # Stored before manifests kept a signature: the smallest thumbnail averages the same.
+    with Image.open(media_path(image.digest, image.files[str(min(THUMBNAIL_SIZES))], media_dir)) as img:
+        return phash.color_signature(img)
+
+
+def _store_copy(digest, original, media_dir):
+    """Stores a near-duplicate under its own ``digest`` with the files (and palette) of ``original``."""
+    source_dir, out_dir = image_dir(original.digest, media_dir), image_dir(digest, media_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(source_dir):
+        if name == "manifest.json" or name.endswith(".tmp"):
+            continue
+        target = os.path.join(out_dir, name)
+        if os.path.exists(target):
+            continue
+        try:
+            os.link(os.path.join(source_dir, name), target)
+        except OSError:
+            # No hard links here (e.g. another filesystem); copy instead.
+            shutil.copyfile(os.path.join(source_dir, name), target)
+    manifest = {
+        "width": original.width, "height": original.height, "files": original.files,
+        "colors": _color_signature(original, media_dir).hex(), "copy_of": original.digest,
+    }
+    _write_manifest(digest, manifest, media_dir)
+    return IngestedImage(digest, original.width, original.height, original.files)
+
+
+def _write_manifest(digest, manifest, media_dir):
+    os.makedirs(image_dir(digest, media_dir), exist_ok=True)
+    assets.write_atomic(os.path.join(image_dir(digest, media_dir), "manifest.json"), json.dumps(manifest).encode("utf-8"))
+
+
+def _decode_working_copy(img):
+    """Decodes at reduced scale, applies EXIF orientation and bounds the size."""
+    # For JPEGs, draft() makes the decoder scale by 1/2, 1/4 or 1/8 while decoding.
+    img.draft("RGB", (WORKING_SIZE, WORKING_SIZE))
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    # thumbnail() uses reduce() for the integer part of the downscale before resampling.
+    img.thumbnail((WORKING_SIZE, WORKING_SIZE), reducing_gap=3.0)
+    return img
+
+
+def _save_jpeg(img, path):
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    assets.write_atomic(path, buffer.getvalue())
@@ -0,0 +1,286 @@
+# --- Instrumentation ---
+# Where server time goes: wall and CPU time of every page render, st.rerun()
+# calls, and timers around the user store, background image jobs and outbound
+# HTTP. Timings go into fixed-bucket histograms, which give p50/p95/p99 without
+# keeping samples. Collectors add what other modules already track (HTTP
+# counters, session stats, pending jobs) at export time.
+#
+# Off unless STYLETELLER_METRICS is set (or enable() is called). Every hook checks
+# ENABLED first, so a disabled hook costs one function call and nothing else.
+#
+# Export: server.py serves the Prometheus text format at /metrics, and with
+# STYLETELLER_METRICS_FILE set a thread appends one JSON line per snapshot to
+# that file every STYLETELLER_METRICS_INTERVAL seconds.
+
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+ENABLED = os.environ.get("STYLETELLER_METRICS", "") not in ("", "0")
+METRICS_FILE = os.environ.get("STYLETELLER_METRICS_FILE")
+METRICS_INTERVAL = float(os.environ.get("STYLETELLER_METRICS_INTERVAL", 60))
+# Upper bounds in seconds: 0.1 ms up to about 105 s in steps of sqrt(2), so a
+# quantile estimate is within about 20% of the true value.
+BUCKETS = tuple(0.0001 * 2 ** (i / 2) for i in range(41))
+QUANTILES = (0.5, 0.95, 0.99)
+
+# One value reported by a collector; ``kind`` is "counter" or "gauge".
+Sample = namedtuple("Sample", "name labels value kind")
+
+_NULL = contextlib.nullcontext()
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum; not thread-safe on its own."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # One count per bucket and a last one for values above the largest bound.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate of the ``q`` quantile, interpolated linearly inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by name and labels, plus collectors."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def add_collector(self, collect):
+        """Adds a function returning Samples, called on every export."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+        """{"time", "counters", "gauges", "histograms"}, as written to the JSONL file."""
+        counters, gauges = [], []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.append({"name": name, "labels": dict(labels), "value": value})
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    **{f"p{round(q * 100)}": histogram.quantile(q) for q in QUANTILES},
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+            collectors = list(self._collectors)
+        for sample in self._collect(collectors):
+            entry = {"name": sample.name, "labels": sample.labels, "value": sample.value}
+            (counters if sample.kind == "counter" else gauges).append(entry)
+        return {"time": time.time(), "counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def prometheus(self):
+        """Everything in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = [
+                (name, labels, list(h.counts), h.sum, h.count, [h.quantile(q) for q in QUANTILES])
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            collectors = list(self._collectors)
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for sample in self._collect(collectors):
+            declare(sample.name, sample.kind)
+            lines.append(f"{sample.name}{_labels(sorted(sample.labels.items()))} {sample.value}")
+        for name, labels, counts, total, count, quantiles in histograms:
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        # Prometheus histograms carry no quantiles; these are estimated from the buckets.
+        for name, labels, _, _, _, quantiles in histograms:
+            declare(f"{name}_quantile", "gauge")
+            for q, value in zip(QUANTILES, quantiles):
+                lines.append(f"{name}_quantile{_labels(labels + (('quantile', f'{q:g}'),))} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _collect(self, collectors):
+        for collect in collectors:
+            try:
+                yield from collect()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+REGISTRY = Registry()
+
+
+def enable(enabled=True):
+    """Turns the hooks on or off for this process."""
+    global ENABLED
+    ENABLED = enabled
+
+
+def count(name, amount=1, **labels):
+    """Adds ``amount`` to a counter."""
+    if not ENABLED:
+        return
+    REGISTRY.count(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    """Records ``value`` (seconds) in a histogram."""
+    if not ENABLED:
+        return
+    REGISTRY.observe(name, value, **labels)
+
+
+class _Timer:
+    def __init__(self, name, labels, cpu_name=None):
+        self.name = name
+        self.labels = labels
+        self.cpu_name = cpu_name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        if self.cpu_name is not None:
+            self.cpu_started = time.thread_time()
+        return self
+
+    def __exit__(self, *exc):
+        # Recorded whatever the block raised, st.rerun()'s exception included.
+        REGISTRY.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        if self.cpu_name is not None:
+            REGISTRY.observe(self.cpu_name, time.thread_time() - self.cpu_started, **self.labels)
+
+
+def timer(name, **labels):
+    """Context manager recording the wall time of its block in a histogram."""
+    if not ENABLED:
+        return _NULL
+    return _Timer(name, labels)
+
+
+def page_timer(page):
+    """Context manager recording the wall and CPU time of rendering ``page``."""
+    if not ENABLED:
+        return _NULL
+    return _Timer("styleteller_page_seconds", {"page": page}, "styleteller_page_cpu_seconds")
+
+
+def timed(name, **labels):
+    """Decorator form of timer()."""
+
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Timer(name, labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def add_collector(collect):
+    """Registers a function returning Samples with the process-wide registry."""
+    REGISTRY.add_collector(collect)
+
+
+def prometheus_text():
+    return REGISTRY.prometheus()
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_file_export(path=METRICS_FILE, interval=METRICS_INTERVAL):
+    """Starts appending a snapshot to ``path`` every ``interval`` seconds, once per process.
+
+    A no-op when instrumentation is off or no path is configured.
+    """
+    global _exporter
+    if _exporter is not None or not ENABLED or not path:
+        return
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = threading.Thread(target=_export_forever, args=(path, interval), daemon=True)
+            _exporter.start()
+
+
+def _export_forever(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with open(path, "a") as f:
+                f.write(json.dumps(REGISTRY.snapshot()) + "\n")
+        except Exception as e:
+            print(f"Error writing metrics to {path}: {e}")
@@ -0,0 +1,159 @@
+# --- Intro Media ---
+# The intro video used to be the full-size source MP4, pulled by every first
+# visit before the login form. It is now transcoded offline
+# (`python media.py build`, needs ffmpeg) into a few short, muted H.264
+# renditions plus a poster frame, stored content-addressed under static/assets/
+# next to the other mirrored assets:
+#
+#   intro.json                      poster and renditions, smallest first
+#   intro_<name>_<hash>.mp4         one per RENDITIONS entry, "faststart" so
+#                                   playback starts before the download ends
+#   intro_poster_<hash>.jpg         shown at once, before any video bytes arrive
+#
+# The markup lists the renditions as <source> elements with media queries, so the
+# browser downloads only the one for its viewport; the files are served with
+# Range support and immutable caching (see server.py). Without a build the intro
+# falls back to the mirrored source video.
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+
+import assets
+
+MANIFEST_FILE = "intro.json"
+# Seconds of video kept: the overlay shows for 4 s and fades out over 1 s.
+INTRO_SECONDS = 5
+POSTER_AT = 0.5
+
+# name, frame height, target bitrate, widest viewport (CSS px) it is picked for (None: any)
+Rendition = namedtuple("Rendition", "name height bitrate max_viewport")
+RENDITIONS = (
+    Rendition("360p", 360, "400k", 640),
+    Rendition("540p", 540, "800k", 1280),
+    Rendition("720p", 720, "1400k", None),
+)
+
+IntroMedia = namedtuple("IntroMedia", "poster renditions")
+StoredRendition = namedtuple("StoredRendition", "name width height max_viewport file bytes")
+
+
+class MediaError(RuntimeError):
+    """Raised when the intro cannot be transcoded."""
+
+
+def load_manifest(asset_dir=assets.ASSET_DIR):
+    """Returns the built IntroMedia, or None if it is missing or any of its files is."""
+    try:
+        with open(os.path.join(asset_dir, MANIFEST_FILE), "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    media = IntroMedia(manifest["poster"], [StoredRendition(**r) for r in manifest["renditions"]])
+    files = [media.poster] + [r.file for r in media.renditions]
+    if not all(os.path.exists(assets.asset_path(name, asset_dir)) for name in files):
+        return None
+    return media
+
+
+def video_html(media, fallback_url, base=assets.ASSET_URL, attributes="autoplay muted playsinline"):
+    """A <video> of the intro: the poster plus one <source> per rendition, chosen by viewport width.
+
+    Browsers use the first <source> whose media query matches; one that ignores
+    media queries plays the first, smallest rendition.
+    """
+    if media is None:
+        return f"<video src='{fallback_url}' {attributes}></video>"
+    sources = "".join(
+        f"<source src='{base}/{r.file}' type='video/mp4'"
+        + (f" media='(max-width: {r.max_viewport}px)'" if r.max_viewport else "")
+        + " />"
+        for r in media.renditions
+    )
+    return f"<video poster='{base}/{media.poster}' {attributes} preload='auto'>{sources}</video>"
+
+
+def _stored_name(prefix, path, extension):
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    return f"{prefix}_{digest}{extension}"
+
+
+def _run(command):
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise MediaError(f"{command[0]} failed: {lines[-1] if lines else result.returncode}")
+
+
+def _probe_size(path, ffprobe):
+    result = subprocess.run(
+        [ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height", "-of", "csv=p=0", path],
+        capture_output=True, text=True,
+    )
+    width, height = result.stdout.strip().split(",")[:2]
+    return int(width), int(height)
+
+
+def build(source, asset_dir=assets.ASSET_DIR, ffmpeg="ffmpeg", ffprobe="ffprobe"):
+    """Transcodes ``source`` into RENDITIONS and a poster under ``asset_dir``; returns the IntroMedia."""
+    if shutil.which(ffmpeg) is None or shutil.which(ffprobe) is None:
+        raise MediaError(f"{ffmpeg} and {ffprobe} are needed to build the intro renditions.")
+    os.makedirs(asset_dir, exist_ok=True)
+    stored = []
+    with tempfile.TemporaryDirectory() as tmp:
+        poster_path = os.path.join(tmp, "poster.jpg")
+        _run([ffmpeg, "-y", "-v", "error", "-ss", str(POSTER_AT), "-i", source, "-frames:v", "1",
+              "-vf", f"scale=-2:{RENDITIONS[-1].height}", "-q:v", "4", poster_path])
+        poster = _stored_name("intro_poster", poster_path, ".jpg")
+        shutil.move(poster_path, assets.asset_path(poster, asset_dir))
+
+        for rendition in RENDITIONS:
+            path = os.path.join(tmp, f"{rendition.name}.mp4")
+            # Capped bitrate (and buffer) keeps every session's download predictable.
+            _run([ffmpeg, "-y", "-v", "error", "-i", source, "-t", str(INTRO_SECONDS), "-an",
+                  "-vf", f"scale=-2:{rendition.height}", "-c:v", "libx264", "-preset", "slow", "-profile:v", "main",
+                  "-pix_fmt", "yuv420p", "-b:v", rendition.bitrate, "-maxrate", rendition.bitrate,
+                  "-bufsize", rendition.bitrate, "-movflags", "+faststart", path])
+            width, height = _probe_size(path, ffprobe)
+            name = _stored_name(f"intro_{rendition.name}", path, ".mp4")
+            size = os.path.getsize(path)
+            shutil.move(path, assets.asset_path(name, asset_dir))
+            stored.append(StoredRendition(rendition.name, width, height, rendition.max_viewport, name, size))
+
+    media = IntroMedia(poster, stored)
+    manifest = {"poster": poster, "renditions": [r._asdict() for r in stored]}
+    assets.write_atomic(os.path.join(asset_dir, MANIFEST_FILE), json.dumps(manifest, indent=2).encode("utf-8"))
+    return media
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Transcode the intro video into small renditions and a poster.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--source", help="source video (default: the mirrored intro video, fetched if needed)")
+    parser.add_argument("--asset-dir", default=assets.ASSET_DIR)
+    parser.add_argument("--ffmpeg", default="ffmpeg")
+    parser.add_argument("--ffprobe", default="ffprobe")
+    args = parser.parse_args(argv)
+
+    source = args.source
+    if source is None:
+        filename = assets.load_manifest(args.asset_dir).get("intro_video") or assets.mirror_asset("intro_video", args.asset_dir)
+        source = assets.asset_path(filename, args.asset_dir)
+    try:
+        media = build(source, args.asset_dir, args.ffmpeg, args.ffprobe)
+    except MediaError as e:
+        raise SystemExit(f"Error building intro media: {e}")
+    print(f"poster: {media.poster}")
+    for r in media.renditions:
+        print(f"{r.name}: {r.file} ({r.width}x{r.height}, {r.bytes:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+# --- One-Time Passcodes ---
+# Phone sign-in codes, shared by every session through resources.get_otp_service().
+#
+# - Codes live in a process-wide TokenStore and expire after OTP_TTL seconds. Only
+#   a digest is kept, and a code is dropped after MAX_ATTEMPTS wrong guesses.
+# - Sends are limited per phone, per client IP and in total (a cap on provider
+#   cost), and guesses per client IP, each by a token bucket. Limiters keep at most
+#   MAX_LIMITER_KEYS buckets and forget the least recently used, so a storm from
+#   many addresses cannot grow memory without bound.
+# - Messages go onto a bounded DeliveryQueue that background threads hand to the
+#   provider, so "Send Verification Code" returns without waiting on it.
+# - The provider is named by STYLETELLER_OTP_PROVIDER as "module:Class" (default
+#   the local FakeProvider, which keeps what it would have sent).
+
+import abc
+import hashlib
+import heapq
+import hmac
+import importlib
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+OTP_TTL = int(os.environ.get("STYLETELLER_OTP_TTL", 300))
+CODE_DIGITS = 6
+MAX_ATTEMPTS = 5
+MAX_TOKENS = 100_000
+MAX_LIMITER_KEYS = 100_000
+
+# (tokens per second, burst) for each limit.
+SEND_PER_PHONE = (1 / 60, 3)
+SEND_PER_CLIENT = (1 / 10, 10)
+SEND_TOTAL = (50.0, 200)
+VERIFY_PER_CLIENT = (1 / 2, 10)
+
+PROVIDER = os.environ.get("STYLETELLER_OTP_PROVIDER", "otp:FakeProvider")
+DELIVERY_WORKERS = 2
+DELIVERY_QUEUE_SIZE = 1000
+
+_PHONE = re.compile(r"\+?[0-9]{6,15}")
+
+
+class RateLimited(RuntimeError):
+    """Raised when a send or check is over a limit; ``retry_after`` is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many requests; try again in {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+
+def normalize_phone(phone):
+    """Strips spaces and punctuation; raises ValueError unless it is 6-15 digits, optionally with "+"."""
+    phone = re.sub(r"[\s().-]", "", phone or "")
+    if not _PHONE.fullmatch(phone):
+        raise ValueError("Please enter a valid phone number.")
+    return phone
+
+
+def _digest(phone, code):
+    return hashlib.sha256(f"{phone}:{code}".encode("utf-8")).digest()
+
+
+class RateLimiter:
+    """Token buckets per key: up to ``burst`` tokens, refilled at ``rate`` per second. Not thread-safe."""
+
+    def __init__(self, rate, burst, max_keys=MAX_LIMITER_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated), least recently used first
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def wait(self, key, now):
+        """Seconds until ``key`` has a token; 0.0 if it has one now."""
+        tokens = self._tokens(key, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    def take(self, key, now):
+        self._buckets[key] = (self._tokens(key, now) - 1, now)
+        self._buckets.move_to_end(key)
+        # A forgotten bucket comes back full, which only ever errs towards allowing.
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def _tokens(self, key, now):
+        tokens, updated = self._buckets.get(key, (self.burst, now))
+        return min(self.burst, tokens + (now - updated) * self.rate)
+
+
+class TokenStore:
+    """Phone -> pending code digest, expiring after ``ttl`` seconds. Not thread-safe."""
+
+    def __init__(self, ttl=OTP_TTL, max_tokens=MAX_TOKENS):
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self._tokens = {}  # phone -> [digest, expires_at, attempts]
+        self._expiry = []  # heap of (expires_at, phone); may hold entries of replaced codes
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def put(self, phone, code, now):
+        self.evict(now)
+        if len(self._tokens) >= self.max_tokens:
+            # Full even after evicting: drop the code closest to expiring.
+            self._pop_expiry()
+        expires_at = now + self.ttl
+        self._tokens[phone] = [_digest(phone, code), expires_at, 0]
+        heapq.heappush(self._expiry, (expires_at, phone))
+
+    def check(self, phone, code, now):
+        """Whether ``code`` is the pending one; a match or the last allowed miss uses it up."""
+        self.evict(now)
+        token = self._tokens.get(phone)
+        if token is None:
+            return False
+        token[2] += 1
+        matched = hmac.compare_digest(token[0], _digest(phone, code))
+        if matched or token[2] >= MAX_ATTEMPTS:
+            del self._tokens[phone]
+        return matched
+
+    def evict(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            self._pop_expiry()
+
+    def _pop_expiry(self):
+        expires_at, phone = heapq.heappop(self._expiry)
+        token = self._tokens.get(phone)
+        if token is not None and token[1] == expires_at:
+            del self._tokens[phone]
+
+
+# --- Providers ---
+
+class Provider(abc.ABC):
+    """Sends a text message. send() runs on a delivery thread and may block."""
+
+    @abc.abstractmethod
+    def send(self, phone, message):
+        """Delivers ``message`` to ``phone``; raises on failure."""
+
+
+class FakeProvider(Provider):
+    """Delivers nothing; keeps the last ``keep`` messages so a developer (or a test) can read the code."""
+
+    def __init__(self, latency=0.0, keep=1000):
+        self.latency = latency
+        self.sent = deque(maxlen=keep)
+
+    def send(self, phone, message):
+        if self.latency:
+            time.sleep(self.latency)
+        self.sent.append((phone, message))
+
+    def latest(self, phone):
+        """The last message sent to ``phone``, or None."""
+        for to, message in reversed(self.sent):
+            if to == phone:
+                return message
+        return None
+
+
+def load_provider(spec=PROVIDER):
+    """Instantiates a provider named "module:Class"."""
+    module_name, class_name = spec.split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class DeliveryQueue:
+    """Bounded queue of (phone, message) drained into ``provider`` by background threads."""
+
+    def __init__(self, provider, workers=DELIVERY_WORKERS, maxsize=DELIVERY_QUEUE_SIZE):
+        self.provider = provider
+        self.delivered = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            threading.Thread(target=self._deliver, daemon=True).start()
+
+    def put(self, phone, message):
+        """Queues a message; raises queue.Full instead of waiting."""
+        self._queue.put_nowait((phone, message))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self):
+        self._queue.join()
+
+    def _deliver(self):
+        while True:
+            phone, message = self._queue.get()
+            try:
+                self.provider.send(phone, message)
+                with self._lock:
+                    self.delivered += 1
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                print(f"Error sending verification code: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class OTPService:
+    """Issues and checks phone sign-in codes with rate limits and asynchronous delivery."""
+
+    def __init__(self, provider=None, ttl=OTP_TTL, clock=time.monotonic):
+        self.provider = load_provider() if provider is None else provider
+        self.tokens = TokenStore(ttl)
+        self._clock = clock
+        self.deliveries = DeliveryQueue(self.provider)
+        self._send_per_phone = RateLimiter(*SEND_PER_PHONE)
+        self._send_per_client = RateLimiter(*SEND_PER_CLIENT)
+        self._send_total = RateLimiter(*SEND_TOTAL)
+        self._verify_per_client = RateLimiter(*VERIFY_PER_CLIENT)
+        self._lock = threading.Lock()
+
+    def send(self, phone, client="unknown"):
+        """Issues a code for ``phone`` (normalized) and queues its delivery; raises RateLimited."""
+        code = f"{secrets.randbelow(10 ** CODE_DIGITS):0{CODE_DIGITS}d}"
+        now = self._clock()
+        with self._lock:
+            self._limit(now, (self._send_per_phone, phone), (self._send_per_client, client), (self._send_total, None))
+            message = f"Your Style Teller verification code is {code}. It expires in {self.tokens.ttl // 60} minutes."
+            try:
+                self.deliveries.put(phone, message)
+            except queue.Full:
+                raise RateLimited(5.0) from None
+            self.tokens.put(phone, code, now)
+
+    def verify(self, phone, code, client="unknown"):
+        """Whether ``code`` is the pending code for ``phone``; raises RateLimited."""
+        now = self._clock()
+        with self._lock:
+            self._limit(now, (self._verify_per_client, client))
+            return self.tokens.check(phone, code.strip(), now)
+
+    def _limit(self, now, *checks):
+        # All limits are checked before any token is taken, so a refused request costs nothing.
+        wait = max(limiter.wait(key, now) for limiter, key in checks)
+        if wait > 0:
+            raise RateLimited(wait)
+        for limiter, key in checks:
+            limiter.take(key, now)
@@ -0,0 +1,63 @@
+# --- Style Recommendations Page ---
+# Imported lazily by the page router in styleteller.py the first time a user opens
+# a style page, so sessions that never get there don't pay for it.
+
+import html
+import time
+
+import streamlit as st
+
+from recommender import OUTFIT_COUNT
+from resources import get_asset_mirror, get_recommendation_service, get_user_store
+from session import go_to, view_state
+
+SKELETON_CARD = """
+    <div class='outfit-card skeleton'>
+        <div class='skeleton-block skeleton-image'></div>
+        <div class='skeleton-block skeleton-line'></div>
+    </div>
+"""
+
+
+def outfit_card(outfit, alt):
+    # Proxied, 300x400 copy served by the app once it has been fetched
+    image_url = get_asset_mirror().card_image(outfit.image_url)
+    return f"""
+        <div class='outfit-card'>
+            <img src="{html.escape(image_url)}" alt="{html.escape(alt)}" />
+            <p>{html.escape(outfit.title)}</p>
+            <small>{html.escape(outfit.description)}</small>
+        </div>
+    """
+
+
+def show_avatar_outfits():
+    st.title("Style Recommendations")
+    
+    view = view_state()
+    selected_style = view.selected_style or "Formal"
+    st.header(f"Outfits for the '{selected_style}' Style")
+
+    user_details = get_user_store().get(view.user_id).details
+    service = get_recommendation_service()
+
+    # Every card starts as a skeleton and is filled in as soon as its outfit is parsed.
+    st.markdown("<div class='outfit-container'>", unsafe_allow_html=True)
+    slots = [st.empty() for _ in range(OUTFIT_COUNT)]
+    for slot in slots:
+        slot.markdown(SKELETON_CARD, unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    started = time.perf_counter()
+    shown = 0
+    for outfit in service.stream(user_details, selected_style):
+        if shown == len(slots):
+            break
+        slots[shown].markdown(outfit_card(outfit, f"{selected_style} Outfit {shown + 1}"), unsafe_allow_html=True)
+        if shown == 0:
+            service.record_first_card(time.perf_counter() - started)
+        shown += 1
+    for slot in slots[shown:]:
+        slot.empty()
+    
+    st.button("Back to Home", on_click=go_to, args=("home",))
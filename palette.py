@@ -0,0 +1,194 @@
+# --- Color Palettes ---
+# Dominant colors of a photo, for matching outfits to the user's own photo and to
+# their wardrobe. An image is reduced to at most SAMPLE_SIZE pixels on its longest
+# edge (after cropping to its center, where the person or garment usually is) and
+# its colors are clustered with k-means, vectorized with NumPy.
+#
+# A Palette is PALETTE_SIZE colors with the share of the crop each one covers,
+# most dominant first; encode() turns it into a short hex descriptor. Palettes are
+# cached by image content hash, in memory and next to the stored image
+# (imaging.image_dir), so every image is analyzed once across all processes.
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+from PIL import Image
+
+import assets
+import imaging
+
+PALETTE_SIZE = 5
+# Longest edge of the pixels clustered; more barely changes the palette.
+SAMPLE_SIZE = 64
+# Fraction of each side kept when cropping to the center of the photo.
+CENTER_CROP = 0.6
+# Pixels are counted into bins of HISTOGRAM_BITS per channel and k-means runs over
+# the distinct bins, weighted by their counts, rather than over every pixel.
+HISTOGRAM_BITS = 5
+KMEANS_ITERATIONS = 12
+CACHE_SIZE = 4096
+CACHE_FILE = "palette.txt"
+
+Palette = namedtuple("Palette", "colors shares")
+
+
+def downsample(img, size=SAMPLE_SIZE, crop=CENTER_CROP):
+    """The center ``crop`` of ``img`` reduced to at most ``size`` pixels per side, as an (n, 3) uint8 array."""
+    # For JPEGs, draft() lets the decoder scale down by up to 1/8 while decoding.
+    img.draft("RGB", (round(size / crop), round(size / crop)))
+    width, height = img.size
+    left, top = int(width * (1 - crop) / 2), int(height * (1 - crop) / 2)
+    img = img.convert("RGB").crop((left, top, width - left, height - top))
+    img.thumbnail((size, size), Image.Resampling.BOX, reducing_gap=2.0)
+    return np.asarray(img, dtype=np.uint8).reshape(-1, 3)
+
+
+def histogram(pixels, bits=HISTOGRAM_BITS):
+    """Distinct colors of (n, 3) uint8 pixels at ``bits`` per channel; returns (colors, counts)."""
+    shift = 8 - bits
+    codes = pixels >> shift
+    codes = (codes[:, 0].astype(np.int32) << (2 * bits)) | (codes[:, 1].astype(np.int32) << bits) | codes[:, 2]
+    counts = np.bincount(codes, minlength=1 << (3 * bits))
+    present = np.flatnonzero(counts)
+    mask = (1 << bits) - 1
+    channels = np.stack([present >> (2 * bits), (present >> bits) & mask, present & mask], axis=1)
+    # The middle of each bin.
+    colors = (channels << shift) + (1 << shift) / 2
+    return colors.astype(np.float32), counts[present].astype(np.float32)
+
+
+def kmeans(points, weights, k=PALETTE_SIZE, iterations=KMEANS_ITERATIONS):
+    """Weighted k-means of (n, 3) points; returns (centers, total weights) of the non-empty clusters, heaviest first."""
+    # Deterministic start: points at evenly spaced ranks of weighted brightness.
+    order = np.argsort(points.sum(axis=1), kind="stable")
+    cumulative = np.cumsum(weights[order])
+    starts = np.searchsorted(cumulative, (np.arange(k) + 0.5) * cumulative[-1] / k)
+    centers = points[order[np.minimum(starts, len(points) - 1)]]
+    # argmin |p - c|^2 = argmin (|c|^2 - 2 p.c): with a column of ones on the points,
+    # assigning every point is one (n, 4) x (4, k) product.
+    homogeneous = np.hstack([points, np.ones((len(points), 1), dtype=np.float32)])
+    # Weighted points with the weight as a fourth column: one product sums both per cluster.
+    weighted = homogeneous * weights[:, None]
+    clusters = np.arange(k)
+    labels = None
+    for _ in range(iterations):
+        new_labels = (homogeneous @ np.vstack([-2 * centers.T, (centers * centers).sum(axis=1)])).argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        sums = (labels == clusters[:, None]).astype(np.float32) @ weighted
+        # An empty cluster keeps its center.
+        filled = sums[:, 3] > 0
+        centers[filled] = sums[filled, :3] / sums[filled, 3:]
+    totals = np.bincount(labels, weights=weights, minlength=k)
+    ranked = [i for i in np.argsort(-totals, kind="stable") if totals[i] > 0]
+    return centers[ranked], totals[ranked]
+
+
+def extract(img, k=PALETTE_SIZE):
+    """The Palette of a PIL image."""
+    centers, totals = kmeans(*histogram(downsample(img)), k)
+    colors = tuple(map(tuple, np.clip(np.rint(centers), 0, 255).astype(int).tolist()))
+    shares = tuple((totals / totals.sum()).tolist())
+    return Palette(colors, shares)
+
+
+def encode(palette):
+    """Compact descriptor: "rrggbbss" per color, ``ss`` being its share out of 255."""
+    return "".join(f"{r:02x}{g:02x}{b:02x}{round(share * 255):02x}" for (r, g, b), share in zip(palette.colors, palette.shares))
+
+
+def decode(text):
+    values = [int(text[i:i + 2], 16) for i in range(0, len(text), 2)]
+    return Palette(
+        tuple(tuple(values[i:i + 3]) for i in range(0, len(values), 4)),
+        tuple(share / 255 for share in values[3::4]),
+    )
+
+
+class PaletteCache:
+    """Thread-safe LRU of content digest -> Palette, backed by a file in each stored image's directory."""
+
+    def __init__(self, maxsize=CACHE_SIZE, media_dir=None):
+        self.maxsize = maxsize
+        self.media_dir = media_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        """The cached Palette of ``digest``, or None."""
+        with self._lock:
+            palette = self._entries.get(digest)
+            if palette is not None:
+                self._entries.move_to_end(digest)
+                return palette
+        try:
+            with open(self._path(digest), "r") as f:
+                palette = decode(f.read().strip())
+        except (OSError, ValueError):
+            return None
+        self._remember(digest, palette)
+        return palette
+
+    def put(self, digest, palette):
+        self._remember(digest, palette)
+        # Only images stored by imaging have a directory to keep the descriptor in.
+        if os.path.isdir(imaging.image_dir(digest, self.media_dir)):
+            assets.write_atomic(self._path(digest), encode(palette).encode("ascii"))
+
+    def _remember(self, digest, palette):
+        with self._lock:
+            self._entries[digest] = palette
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _path(self, digest):
+        return imaging.media_path(digest, CACHE_FILE, self.media_dir)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def default_cache(media_dir=None):
+    """The process-wide PaletteCache for ``media_dir`` (None: imaging.MEDIA_DIR)."""
+    with _caches_lock:
+        if media_dir not in _caches:
+            _caches[media_dir] = PaletteCache(media_dir=media_dir)
+        return _caches[media_dir]
+
+
+def palette_of(image, media_dir=None):
+    """The Palette of an imaging.IngestedImage, analyzed from its smallest thumbnail on first use."""
+    cache = default_cache(media_dir)
+    palette = cache.get(image.digest)
+    if palette is None:
+        smallest = str(min(imaging.THUMBNAIL_SIZES))
+        with Image.open(imaging.media_path(image.digest, image.files[smallest], media_dir)) as img:
+            palette = extract(img)
+        cache.put(image.digest, palette)
+    return palette
+
+
+def palette_of_bytes(data, cache=None):
+    """The Palette of an encoded image, cached by the SHA-256 of its bytes."""
+    cache = default_cache() if cache is None else cache
+    digest = hashlib.sha256(data).hexdigest()
+    palette = cache.get(digest)
+    if palette is None:
+        with Image.open(io.BytesIO(data)) as img:
+            palette = extract(img)
+        cache.put(digest, palette)
+    return palette
+
+
+def ingest_image(data, owner=None, media_dir=None):
+    """[worker] imaging.ingest_image() of ``owner``'s upload that also analyzes and caches the image's Palette."""
+    image = imaging.ingest_image(data, media_dir, owner)
+    palette_of(image, media_dir)
+    return image
@@ -0,0 +1,117 @@
+# --- Password Hashing ---
+# Passwords are stored as salted PBKDF2-SHA256 hashes in the form
+# "pbkdf2_sha256$<iterations>$<salt>$<hash>" (salt and hash base64). Records
+# written before hashing hold the plain password; verify_password() still
+# accepts those, comparing in constant time.
+#
+# The cost is set with STYLETELLER_PASSWORD_ITERATIONS. Logins go through a
+# PasswordHasher, which runs the KDF on a small thread pool and hands back a fresh
+# hash whenever the stored one is plain or cheaper than the current cost, so
+# raising the cost upgrades each account on its next login.
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+ALGORITHM = "pbkdf2_sha256"
+ITERATIONS = int(os.environ.get("STYLETELLER_PASSWORD_ITERATIONS", 600_000))
+SALT_BYTES = 16
+# Threads hashing at once; each keeps a core busy for the length of one hash.
+HASH_WORKERS = int(os.environ.get("STYLETELLER_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+# Queued plus running hashes; beyond this the hasher raises HasherBusy.
+MAX_PENDING_HASHES = HASH_WORKERS * 16
+
+Verified = namedtuple("Verified", "ok new_hash")
+
+
+class HasherBusy(RuntimeError):
+    """Raised by PasswordHasher when MAX_PENDING_HASHES hashes are already queued."""
+
+
+def hash_password(password, iterations=ITERATIONS, salt=None):
+    """Returns the stored form of ``password``."""
+    salt = os.urandom(SALT_BYTES) if salt is None else salt
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def is_hashed(stored):
+    return stored is not None and stored.startswith(f"{ALGORITHM}$")
+
+
+def iterations_of(stored):
+    """The PBKDF2 iterations of a stored hash; 0 for a plain password."""
+    try:
+        return int(stored.split("$")[1]) if is_hashed(stored) else 0
+    except (IndexError, ValueError):
+        return 0
+
+
+def needs_rehash(stored, iterations=ITERATIONS):
+    return iterations_of(stored) < iterations
+
+
+def verify_password(password, stored):
+    """Whether ``password`` matches a stored hash (or a legacy plain password)."""
+    if stored is None or password is None:
+        return False
+    if not is_hashed(stored):
+        return hmac.compare_digest(password.encode("utf-8"), stored.encode("utf-8"))
+    try:
+        _, iterations, salt, expected = stored.split("$")
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), base64.b64decode(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(_b64(digest), expected)
+
+
+def check_password(password, stored, iterations=ITERATIONS):
+    """Verifies ``password``; on success also rehashes it if ``stored`` is below ``iterations``."""
+    if stored is None:
+        # Same cost as a real check, so a missing account is not told apart by timing.
+        hash_password(password or "", iterations)
+        return Verified(False, None)
+    if not verify_password(password, stored):
+        return Verified(False, None)
+    return Verified(True, hash_password(password, iterations) if needs_rehash(stored, iterations) else None)
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+class PasswordHasher:
+    """Runs hashing and verification on a bounded thread pool.
+
+    hashlib releases the GIL during PBKDF2, so a hash on a pool thread leaves
+    other script runners free to render while the caller waits. The pool size
+    caps the cores a login burst can take, and past ``max_pending`` waiting
+    hashes callers get HasherBusy instead of an ever-longer wait.
+    """
+
+    def __init__(self, iterations=ITERATIONS, max_workers=HASH_WORKERS, max_pending=MAX_PENDING_HASHES):
+        self.iterations = iterations
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.iterations)
+
+    def verify(self, password, stored):
+        """Returns Verified(ok, new_hash); store ``new_hash`` when it is set."""
+        return self._run(check_password, password, stored, self.iterations)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy("Too many password checks are pending.")
+        try:
+            return self._executor.submit(function, *args).result()
+        finally:
+            self._slots.release()
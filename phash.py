@@ -0,0 +1,216 @@
+# --- Perceptual Hashes ---
+# Finds earlier uploads that look the same as a new one (re-saved, resized or
+# recompressed copies of the same photo), so imaging.ingest_image can reuse their
+# thumbnails and palette instead of processing the photo again. Each user's photos
+# are indexed separately, so one user's upload never matches another's.
+#
+# Images are hashed with a 64-bit dHash. Hashes live in a multi-index hash table:
+# the 64 bits are split into CHUNKS 16-bit chunks and each chunk has a sorted
+# copy of every hash's value for it. Two hashes within Hamming distance r agree on
+# some chunk to within r // CHUNKS bits (pigeonhole), so a lookup probes a few
+# keys per chunk with binary search and checks only the hashes found there, which
+# stays well under a millisecond with millions of hashes.
+#
+# dHash compares brightness only, so a red and a navy shirt of the same cut hash
+# alike; a match also needs a close color_signature() (see imaging._near_duplicate).
+#
+# Every process appends what it hashes to a log of fixed-size records per user
+# next to the media (phash/<owner key>.log); a HashIndex reads whatever other
+# processes have appended before each lookup, so worker processes share one index.
+
+import hashlib
+import itertools
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+# Largest Hamming distance between the hashes of two copies of one photo.
+MAX_DISTANCE = 6
+# Hashes of plain images (almost all bits equal) match unrelated plain images.
+MIN_DETAIL_BITS = 8
+# New hashes are kept unsorted until there are this many, then merged into the tables.
+MERGE_AT = 4096
+LOG_DIR = "phash"
+# Per-user indexes kept open per process; the least recently used is dropped beyond this.
+MAX_INDEXES = 1024
+# Side of the grid of average colors compared between a photo and a match.
+SIGNATURE_GRID = 4
+# Largest mean difference per channel (0-255) between copies of one photo.
+MAX_COLOR_DIFFERENCE = 16
+
+_RECORD = np.dtype([("hash", ">u8"), ("digest", "u1", (32,))])
+
+
+def dhash(img):
+    """64-bit difference hash of a PIL image: whether each pixel of a 9x8 grayscale copy is brighter than its right neighbor."""
+    small = np.asarray(img.convert("L").resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def color_signature(img):
+    """Average colors of a SIGNATURE_GRID x SIGNATURE_GRID grid over a PIL image, as bytes."""
+    small = img.convert("RGB").resize((SIGNATURE_GRID, SIGNATURE_GRID), Image.Resampling.BOX)
+    return np.asarray(small, dtype=np.uint8).tobytes()
+
+
+def color_difference(a, b):
+    """Mean absolute difference per channel between two color_signature()s."""
+    return float(np.abs(np.frombuffer(a, np.uint8).astype(np.int16) - np.frombuffer(b, np.uint8)).mean())
+
+
+def is_distinctive(image_hash):
+    """Whether a hash has enough detail to be told apart from other images'."""
+    ones = image_hash.bit_count()
+    return MIN_DETAIL_BITS <= ones <= HASH_BITS - MIN_DETAIL_BITS
+
+
+def _chunks(hashes):
+    """(CHUNKS, n) chunk values of a uint64 array of hashes."""
+    shifts = np.arange(CHUNKS - 1, -1, -1, dtype=np.uint64) * np.uint64(CHUNK_BITS)
+    return ((hashes[None, :] >> shifts[:, None]) & np.uint64((1 << CHUNK_BITS) - 1)).astype(np.uint16)
+
+
+def _probes(value, radius):
+    """Every chunk value within ``radius`` bits of ``value``."""
+    probes = [value]
+    for r in range(1, radius + 1):
+        for bits in itertools.combinations(range(CHUNK_BITS), r):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            probes.append(flipped)
+    return np.array(probes, dtype=np.uint16)
+
+
+class HashIndex:
+    """Multi-index hash table of image hash -> content digest, optionally backed by an append log."""
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._digests = np.empty((0, 32), dtype=np.uint8)
+        self._sorted_chunks = np.empty((CHUNKS, 0), dtype=np.uint16)
+        self._order = np.empty((CHUNKS, 0), dtype=np.int64)
+        # Hashes not merged into the tables yet; searched by brute force.
+        self._recent_hashes = np.empty(0, dtype=np.uint64)
+        self._recent_digests = np.empty((0, 32), dtype=np.uint8)
+        self._log_offset = 0
+        self._lock = threading.Lock()
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._hashes) + len(self._recent_hashes)
+
+    def add(self, image_hash, digest):
+        """Indexes an image's hash under its hex content digest and appends it to the log."""
+        record = np.array([(image_hash, np.frombuffer(bytes.fromhex(digest), dtype=np.uint8))], dtype=_RECORD)
+        with self._lock:
+            if self.log_path is None:
+                self._add(record["hash"], record["digest"])
+                return
+            # A single write of a whole record to a file opened for appending is not
+            # interleaved with other processes'; reading the log back picks it up.
+            with open(self.log_path, "ab") as f:
+                f.write(record.tobytes())
+            self._refresh()
+
+    def add_many(self, hashes, digests):
+        """Indexes many hashes at once without logging them; ``digests`` is an (n, 32) uint8 array."""
+        with self._lock:
+            self._merge(np.asarray(hashes, dtype=np.uint64), np.asarray(digests, dtype=np.uint8))
+
+    def nearest(self, image_hash, max_distance=MAX_DISTANCE):
+        """(hex digest, distance) of the closest indexed hash within ``max_distance``, or None."""
+        with self._lock:
+            self._refresh()
+            candidates = self._candidates(image_hash, max_distance)
+            hashes = np.concatenate([self._hashes[candidates], self._recent_hashes])
+            if not len(hashes):
+                return None
+            distances = np.bitwise_count(hashes ^ np.uint64(image_hash))
+            best = int(distances.argmin())
+            if distances[best] > max_distance:
+                return None
+            if best < len(candidates):
+                digest = self._digests[candidates[best]]
+            else:
+                digest = self._recent_digests[best - len(candidates)]
+            return digest.tobytes().hex(), int(distances[best])
+
+    def _candidates(self, image_hash, max_distance):
+        """Indices of merged hashes that match ``image_hash`` on some chunk to within max_distance // CHUNKS bits."""
+        if not len(self._hashes):
+            return np.empty(0, dtype=np.int64)
+        query = _chunks(np.array([image_hash], dtype=np.uint64))[:, 0]
+        found = []
+        for chunk in range(CHUNKS):
+            keys = _probes(int(query[chunk]), max_distance // CHUNKS)
+            starts = np.searchsorted(self._sorted_chunks[chunk], keys, side="left")
+            ends = np.searchsorted(self._sorted_chunks[chunk], keys, side="right")
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                if end > start:
+                    found.append(self._order[chunk, start:end])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def _refresh(self):
+        """Reads records other processes have appended to the log since the last read."""
+        if self.log_path is None:
+            return
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A record still being written is picked up on the next read.
+        data = data[:len(data) - len(data) % _RECORD.itemsize]
+        if data:
+            self._log_offset += len(data)
+            records = np.frombuffer(data, dtype=_RECORD)
+            self._add(records["hash"], records["digest"])
+
+    def _add(self, hashes, digests):
+        self._recent_hashes = np.concatenate([self._recent_hashes, hashes.astype(np.uint64)])
+        self._recent_digests = np.concatenate([self._recent_digests, digests])
+        if len(self._recent_hashes) >= MERGE_AT:
+            self._merge(self._recent_hashes, self._recent_digests)
+            self._recent_hashes = np.empty(0, dtype=np.uint64)
+            self._recent_digests = np.empty((0, 32), dtype=np.uint8)
+
+    def _merge(self, hashes, digests):
+        self._hashes = np.concatenate([self._hashes, hashes])
+        self._digests = np.concatenate([self._digests, digests])
+        chunks = _chunks(self._hashes)
+        self._order = np.argsort(chunks, axis=1, kind="stable")
+        self._sorted_chunks = np.take_along_axis(chunks, self._order, axis=1)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def default_index(media_dir, owner):
+    """The process-wide HashIndex of the images ``owner`` (a user ID) has stored under ``media_dir``."""
+    key = (media_dir, owner)
+    with _indexes_lock:
+        if key not in _indexes:
+            log_dir = os.path.join(media_dir, LOG_DIR)
+            os.makedirs(log_dir, exist_ok=True)
+            # User IDs are emails; the file name is a digest of one.
+            name = hashlib.sha256(owner.encode("utf-8")).hexdigest()[:32]
+            _indexes[key] = HashIndex(os.path.join(log_dir, f"{name}.log"))
+            while len(_indexes) > MAX_INDEXES:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(key)
+        return _indexes[key]
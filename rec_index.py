@@ -0,0 +1,263 @@
+# --- Recommendation Index ---
+# Ranked catalog item IDs for every (style, other styles, season, age bracket)
+# segment: 7 styles x 64 sets of other styles x 4 seasons x 7 brackets, the same
+# profile catalog.Catalog.recommend() ranks for, plus the bracket's formality
+# shift. Precomputed so serving a style page is a row read, not a scoring pass. The index
+# is built offline (`python rec_index.py build`) into two .npy files that are
+# memory-mapped at startup:
+#
+#   rec_index.ids.npy     int32 (segments, depth), best first, -1 = empty slot
+#   rec_index.scores.npy  float32 (segments, depth), the matching scores
+#
+# plus rec_index.json with the segment keys, the row depth (DEPTH by default) and
+# the catalog digest they were built from. Each row keeps more than SERVED items,
+# so adding or removing a catalog item only touches the rows it ranks in: an added
+# item is merged into rows it beats, a removed one is cut out, and only a row that
+# drops below SERVED items is re-ranked. The served index listens to the built-in
+# catalog (Catalog.listeners), so its changes are applied and flushed as they happen.
+#
+# Colors taken from the user's photo are not a segment dimension: lookup()
+# re-ranks the row's kept items with them, which is exact while the row's last
+# kept score plus COLOR_WEIGHT stays below the k-th result.
+
+import itertools
+import json
+import os
+import threading
+
+import numpy as np
+
+import catalog
+
+INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rec_index")
+# Items served per page at most, and ranks kept per row to absorb removals.
+SERVED = 20
+DEPTH = 2 * SERVED
+# Segments ranked per pass when building; bounds the (segments, items) score matrix.
+BUILD_BATCH = 256
+
+_STYLE_NAMES = {style.lower(): style for style in catalog.STYLES}
+
+
+def _other_styles(style):
+    others = sorted(name for name in _STYLE_NAMES if name != style)
+    return [",".join(chosen) for r in range(len(others) + 1) for chosen in itertools.combinations(others, r)]
+
+
+SEGMENTS = [
+    (style, others, season, bracket)
+    for style in _STYLE_NAMES
+    for others in _other_styles(style)
+    for season in catalog.SEASONS
+    for bracket in catalog.BRACKETS
+]
+
+
+def segment_key(style, styles, season, bracket):
+    """The segment of a chosen style, the user's preferred styles, a season and an age bracket.
+
+    Other styles are kept as a sorted, comma-joined string; unknown ones and the
+    chosen style itself do not change the ranking, so they are dropped.
+    """
+    selected = style.strip().lower()
+    others = sorted({s.strip().lower() for s in styles} & _STYLE_NAMES.keys() - {selected})
+    return (selected, ",".join(others), season, bracket)
+
+
+def segment_profiles(keys):
+    return np.stack([
+        catalog.segment_profile(_STYLE_NAMES[style], others.split(",") if others else (), season, bracket)
+        for style, others, season, bracket in keys
+    ])
+
+
+class RecIndex:
+    """Segment -> ranked item IDs, backed by arrays that may be memory-mapped.
+
+    Rows are ``depth`` ranks wide. An index loaded writable keeps its ``path`` and
+    flushes add_item() and remove_item() changes there.
+    """
+
+    def __init__(self, keys, ids, scores, catalog_digest=None, path=None):
+        self.keys = [tuple(key) for key in keys]
+        self.ids = ids
+        self.scores = scores
+        self.depth = ids.shape[1]
+        self.catalog_digest = catalog_digest
+        self.path = path
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+        self._profiles = segment_profiles(self.keys)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, items, keys=SEGMENTS, depth=DEPTH):
+        """Ranks ``items`` (a catalog.Catalog) for every segment, BUILD_BATCH segments per batched pass."""
+        if depth < SERVED:
+            raise ValueError(f"Rows must keep at least SERVED ({SERVED}) ranks.")
+        profiles = segment_profiles(keys)
+        ranked = min(depth, len(items))
+        ids = np.full((len(keys), depth), -1, dtype=np.int32)
+        scores = np.full((len(keys), depth), -np.inf, dtype=np.float32)
+        for start in range(0, len(keys), BUILD_BATCH):
+            batch = profiles[start:start + BUILD_BATCH]
+            rows = items.rank_many(batch, ranked)
+            ids[start:start + len(batch), :ranked] = items.ids[rows]
+            scores[start:start + len(batch), :ranked] = np.take_along_axis(items.score_many(batch), rows, axis=1)
+        return cls(keys, ids, scores, items.digest())
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, writable=False):
+        """Memory-maps a saved index; returns None if there is none.
+
+        A ``writable`` index is updated in place and flushed back to ``path``.
+        """
+        try:
+            with open(f"{path}.json", "r") as f:
+                meta = json.load(f)
+            mode = "r+" if writable else "r"
+            ids = np.load(f"{path}.ids.npy", mmap_mode=mode)
+            scores = np.load(f"{path}.scores.npy", mmap_mode=mode)
+        except (OSError, ValueError) as e:
+            print(f"Error loading recommendation index: {e}")
+            return None
+        if ids.shape != scores.shape or ids.shape[1] != meta.get("depth", DEPTH):
+            print(f"Error loading recommendation index: arrays do not match {path}.json")
+            return None
+        return cls(meta["keys"], ids, scores, meta.get("catalog_digest"), path if writable else None)
+
+    def save(self, path=INDEX_PATH, items=None):
+        """Writes the index; pass the catalog it now reflects to record its digest."""
+        if items is not None:
+            self.catalog_digest = items.digest()
+        for suffix, array in (("ids", self.ids), ("scores", self.scores)):
+            tmp_path = f"{path}.{suffix}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, np.asarray(array))
+            os.replace(tmp_path, f"{path}.{suffix}.npy")
+        self._write_meta(path)
+
+    def flush(self, path=INDEX_PATH, items=None):
+        """Writes in-place updates of a writable memory-mapped index back to disk."""
+        if items is not None:
+            self.catalog_digest = items.digest()
+        for array in (self.ids, self.scores):
+            if isinstance(array, np.memmap):
+                array.flush()
+        self._write_meta(path)
+
+    def lookup(self, style, styles, season, bracket, k, colors=(), items=None):
+        """Up to ``k`` ranked item IDs for a segment (see segment_key()), or None if it is not indexed.
+
+        With ``colors`` (catalog.COLORS names) the row is re-ranked with
+        catalog.color_weights(colors), which needs the catalog ``items``; the result
+        is also None when the row's kept ranks cannot guarantee the top ``k``.
+        """
+        row = self._rows.get(segment_key(style, styles, season, bracket))
+        if row is None:
+            return None
+        k = min(k, SERVED)
+        if not colors:
+            ids = self.ids[row, :k]
+            return ids[ids >= 0]
+        ids = np.asarray(self.ids[row])
+        kept = ids >= 0
+        ids, scores = ids[kept], np.asarray(self.scores[row])[kept]
+        rows = np.array([items.row(item_id) for item_id in ids], dtype=np.intp)
+        final = scores + items.features[rows] @ catalog.color_weights(colors)
+        # Ties go to the lower catalog position, as in a full ranking.
+        order = np.lexsort((rows, -final))[:k]
+        # Unless the row holds the whole catalog, items below it scored at most its last
+        # kept score, plus the color term.
+        if len(items) > len(ids) and (len(order) < k or final[order[-1]] <= scores[-1] + catalog.COLOR_WEIGHT):
+            return None
+        return ids[order]
+
+    def add_item(self, items, item_id):
+        """Merges an item just added to ``items`` into every row it ranks in (a Catalog listener)."""
+        scores = self._profiles @ items.vector(item_id)
+        with self._lock:
+            kept = np.count_nonzero(np.asarray(self.ids) >= 0, axis=1)
+            last = np.where(kept > 0, np.asarray(self.scores)[np.arange(len(kept)), np.maximum(kept - 1, 0)], -np.inf)
+            # A row takes the item if it beats the row's last kept score, or if the row
+            # held the whole catalog; a row short after removals ends where its ranking is known.
+            for row in np.nonzero((scores > last) | (kept >= len(items) - 1))[0]:
+                position = int(np.searchsorted(-self.scores[row, :kept[row]], -scores[row], side="right"))
+                if position >= self.depth:
+                    continue
+                self.ids[row, position + 1:] = self.ids[row, position:-1].copy()
+                self.scores[row, position + 1:] = self.scores[row, position:-1].copy()
+                self.ids[row, position] = item_id
+                self.scores[row, position] = scores[row]
+            # Hashing the catalog is O(n); it is recomputed when the index is saved.
+            self.catalog_digest = None
+        if self.path is not None:
+            self.flush(self.path, items)
+
+    def remove_item(self, items, item_id):
+        """Cuts a removed item out of the rows holding it; rows left short are re-ranked.
+
+        ``items`` must no longer contain the item (a Catalog listener).
+        """
+        with self._lock:
+            rows, columns = np.nonzero(np.asarray(self.ids) == item_id)
+            for row, column in zip(rows, columns):
+                self.ids[row, column:-1] = self.ids[row, column + 1:].copy()
+                self.scores[row, column:-1] = self.scores[row, column + 1:].copy()
+                self.ids[row, -1] = -1
+                self.scores[row, -1] = -np.inf
+                if self.ids[row, SERVED - 1] < 0 and len(items) > np.count_nonzero(self.ids[row] >= 0):
+                    self._rerank(items, row)
+            self.catalog_digest = None
+        if self.path is not None:
+            self.flush(self.path, items)
+
+    def _rerank(self, items, row):
+        scores = items.score(self._profiles[row])
+        ranked = catalog.top_k(scores, self.depth)
+        self.ids[row] = -1
+        self.scores[row] = -np.inf
+        self.ids[row, :len(ranked)] = items.ids[ranked]
+        self.scores[row, :len(ranked)] = scores[ranked]
+
+    def _write_meta(self, path):
+        meta = {"keys": self.keys, "depth": self.depth, "catalog_digest": self.catalog_digest}
+        tmp_path = f"{path}.json.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, f"{path}.json")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_index():
+    """The saved index for the built-in catalog, or one built in memory if it is missing or stale.
+
+    It follows changes to the built-in catalog from then on, writing them to the saved index.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            items = catalog.default_catalog()
+            index = RecIndex.load(writable=True) if os.path.exists(f"{INDEX_PATH}.json") else None
+            if index is None or index.catalog_digest != items.digest():
+                index = RecIndex.build(items)
+            items.listeners.append(index)
+            _default = index
+        return _default
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the recommendation index offline.")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--path", default=INDEX_PATH)
+    args = parser.parse_args(argv)
+    index = RecIndex.build(catalog.default_catalog())
+    index.save(args.path)
+    print(f"Indexed {len(index.keys)} segments x {index.depth} ranks into {args.path}.*")
+
+
+if __name__ == "__main__":
+    main()
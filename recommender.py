@@ -0,0 +1,287 @@
+# --- Outfit Recommendations ---
+# Asks an OpenAI chat model for outfits that fit a user's profile and the style
+# they picked. Answers are cached on the normalized request (style, gender, age
+# bracket, preferred styles, season, colors of the profile photo) with TTL + LRU eviction, and identical requests that
+# arrive while a call is in flight wait for that call instead of making their own,
+# so a popular combination costs one model call, not one per user per click.
+#
+# Replies are streamed as JSON Lines, one outfit per line, so the page can render
+# each card as soon as its line is complete; coalesced followers stream along with
+# the call they joined.
+#
+# Without OPENAI_API_KEY / OPENAI_BASE_URL (or when a call fails) the service
+# serves the best matches from the built-in catalog (catalog.py), precomputed per
+# user segment in rec_index.py.
+# Point OPENAI_BASE_URL at `python stubs.py openai` to run against a local stub.
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+import catalog
+import garments
+import instrumentation
+import palette
+import rec_index
+from catalog import age_bracket, current_season, placeholder_image
+
+MODEL = os.environ.get("STYLETELLER_MODEL", "gpt-4o-mini")
+CACHE_TTL = int(os.environ.get("STYLETELLER_RECOMMENDATION_TTL", 6 * 60 * 60))
+CACHE_SIZE = int(os.environ.get("STYLETELLER_RECOMMENDATION_CACHE_SIZE", 2048))
+OUTFIT_COUNT = 3
+REQUEST_TIMEOUT = 30
+
+Outfit = namedtuple("Outfit", "title description image_url")
+
+SYSTEM_PROMPT = (
+    f"You are a fashion stylist. Reply with exactly {OUTFIT_COUNT} lines and nothing else. "
+    'Each line is one JSON object: {"title": str, "description": str, "color": "#RRGGBB"}. '
+    "Keep each description under 30 words."
+)
+
+
+def photo_colors(details):
+    """Dominant catalog.COLORS names of the user's profile photo, from the palette analyzed
+    when it was uploaded; () without a photo or before its palette is ready."""
+    if not details.image_id:
+        return ()
+    photo_palette = palette.default_cache().get(details.image_id)
+    return garments.dominant_colors(photo_palette) if photo_palette is not None else ()
+
+
+def request_key(details, style, season=None, colors=None):
+    """Normalizes a user's records.UserDetails, a chosen style, the season and the photo's colors into a hashable cache key."""
+    styles = tuple(sorted({s.strip().lower() for s in details.styles}))
+    colors = photo_colors(details) if colors is None else colors
+    return (style.strip().lower(), (details.gender or "unknown").lower(), age_bracket(details.age), styles,
+            season or current_season(), tuple(sorted(colors)))
+
+
+def fallback_outfits(details, style, season=None, colors=None):
+    """The best built-in catalog outfits for the user's segment, read from the precomputed index.
+
+    Gender is not part of a segment: the built-in items are unisex.
+    """
+    items = catalog.default_catalog()
+    season = season or current_season()
+    colors = photo_colors(details) if colors is None else colors
+    ids = rec_index.default_index().lookup(
+        style, details.styles, season, age_bracket(details.age), OUTFIT_COUNT, colors, items,
+    )
+    if ids is None:
+        # Not an indexed style, or colors reorder past the kept ranks; rank the catalog directly.
+        ranked = items.recommend(details, style, OUTFIT_COUNT, season, colors)
+    else:
+        ranked = [item for item in map(items.get, ids) if item is not None]
+    return [Outfit(item.title, item.description, item.image_url) for item in ranked]
+
+
+def make_client():
+    """Returns an OpenAI client if one is configured in the environment, else None."""
+    if not (os.environ.get("OPENAI_API_KEY") or os.environ.get("OPENAI_BASE_URL")):
+        return None
+    import openai
+
+    import http_client
+
+    # A local stub does not need a real key.
+    return openai.OpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY", "stub"),
+        http_client=http_client.openai_http_client(REQUEST_TIMEOUT),
+    )
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class _Call:
+    """A model call in flight. The leader appends outfits as they are parsed and
+    followers read them as they arrive."""
+
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.outfits = []
+        self.finished = False
+
+    def add(self, outfit):
+        with self.changed:
+            self.outfits.append(outfit)
+            self.changed.notify_all()
+
+    def finish(self):
+        with self.changed:
+            self.finished = True
+            self.changed.notify_all()
+
+    def follow(self):
+        i = 0
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: len(self.outfits) > i or self.finished)
+                if len(self.outfits) <= i:
+                    return
+                outfit = self.outfits[i]
+            i += 1
+            yield outfit
+
+
+class RecommendationService:
+    """Cached, request-coalescing, streaming outfit recommendations."""
+
+    def __init__(self, client=None, model=MODEL, cache=None):
+        self.client = client
+        self.model = model
+        self.cache = cache if cache is not None else TTLCache()
+        self.model_calls = 0
+        # Seconds from a page asking for outfits to its first card being rendered.
+        self.first_card_seconds = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def recommend(self, details, style):
+        """Returns a list of Outfit for a user's details and the style they picked."""
+        return list(self.stream(details, style))
+
+    def stream(self, details, style):
+        """Yields Outfits for a user's details and style as soon as each is available."""
+        key = request_key(details, style)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield from cached
+            return
+
+        with self._lock:
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+        if not leader:
+            yield from call.follow()
+            return
+
+        try:
+            for outfit in self._fetch(key, details, style):
+                call.add(outfit)
+                yield outfit
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.finish()
+
+    def record_first_card(self, seconds):
+        self.first_card_seconds.append(seconds)
+        instrumentation.observe("styleteller_first_card_seconds", seconds)
+
+    def _fetch(self, key, details, style):
+        if self.client is None:
+            outfits = fallback_outfits(details, style, *key[-2:])
+            self.cache.put(key, outfits)
+            yield from outfits
+            return
+        outfits = []
+        try:
+            with self._lock:
+                self.model_calls += 1
+            chunks = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": self._prompt(key)},
+                ],
+                stream=True,
+            )
+            for outfit in iter_outfits(_content_deltas(chunks)):
+                outfits.append(outfit)
+                yield outfit
+                if len(outfits) == OUTFIT_COUNT:
+                    break
+            if not outfits:
+                raise ValueError("response has no outfits")
+        except Exception as e:
+            # Failures are not cached, so the next request tries the model again.
+            print(f"Error fetching outfit recommendations: {e}")
+            yield from fallback_outfits(details, style, *key[-2:])[len(outfits):]
+            return
+        self.cache.put(key, outfits)
+
+    @staticmethod
+    def _prompt(key):
+        style, gender, bracket, styles, season, colors = key
+        return (
+            f"Suggest {OUTFIT_COUNT} '{style}' outfits for {season} for a {gender} person aged {bracket}"
+            f" who also likes: {', '.join(styles) or 'no other styles'}"
+            f" and mostly wears: {', '.join(colors) or 'any colors'}."
+        )
+
+
+def _content_deltas(chunks):
+    for chunk in chunks:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def parse_outfit(item):
+    title = str(item.get("title") or "Outfit").strip()
+    return Outfit(title, str(item.get("description") or "").strip(), placeholder_image(title, item.get("color")))
+
+
+def iter_outfits(text_chunks):
+    """Parses streamed JSON Lines text into Outfits, yielding each as its line completes.
+
+    Lines that are not JSON objects (blank lines, code fences) are skipped.
+    """
+    buffer = ""
+    for text in text_chunks:
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            outfit = _parse_line(line)
+            if outfit is not None:
+                yield outfit
+    outfit = _parse_line(buffer)
+    if outfit is not None:
+        yield outfit
+
+
+def _parse_line(line):
+    line = line.strip().rstrip(",")
+    if not line.startswith("{"):
+        return None
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return None
+    return parse_outfit(item) if isinstance(item, dict) else None
@@ -0,0 +1,116 @@
+# --- User Records ---
+# The shape of a user database entry, checked against USER_SCHEMA whenever a
+# record crosses the storage boundary: when it is loaded (from SQLite or the
+# legacy user_db.json) and when it is written. Past that boundary the app works
+# with frozen, slotted dataclasses, so pages read attributes instead of probing
+# nested dicts, and a record's `details` is never None.
+#
+# The stored layout is unchanged: {"password": ..., "details": {...} | null, ...}.
+
+from dataclasses import asdict, dataclass, field, replace
+
+from jsonschema import Draft202012Validator
+from jsonschema.exceptions import best_match
+
+DETAILS_SCHEMA = {
+    "type": ["object", "null"],
+    "properties": {
+        "name": {"type": "string"},
+        "age": {"type": ["integer", "null"], "minimum": 1, "maximum": 150},
+        "gender": {"type": "string"},
+        "styles": {"type": "array", "items": {"type": "string"}},
+        "image_uploaded": {"type": "boolean"},
+        "image_id": {"type": ["string", "null"], "pattern": "^[0-9a-f]{64}$"},
+    },
+    "additionalProperties": False,
+}
+
+USER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "password": {"type": ["string", "null"]},
+        "details": DETAILS_SCHEMA,
+        "styles_chosen": {"type": "boolean"},
+    },
+    "required": ["password"],
+    "additionalProperties": False,
+}
+
+# Checked and built once; jsonschema.validate() would re-check the schema and
+# pick a validator class on every call.
+Draft202012Validator.check_schema(USER_SCHEMA)
+_validator = Draft202012Validator(USER_SCHEMA)
+
+
+class RecordInvalid(ValueError):
+    """Raised for a user record that does not match USER_SCHEMA."""
+
+
+def validate(raw):
+    """Raises RecordInvalid unless ``raw`` (a stored record dict) matches USER_SCHEMA."""
+    error = best_match(_validator.iter_errors(raw))
+    if error is not None:
+        location = "/".join(str(part) for part in error.absolute_path) or "record"
+        raise RecordInvalid(f"{location}: {error.message}")
+
+
+@dataclass(frozen=True, slots=True)
+class UserDetails:
+    name: str = ""
+    age: int = None
+    gender: str = ""
+    styles: tuple = ()
+    image_uploaded: bool = False
+    image_id: str = None
+
+    @property
+    def provided(self):
+        """Whether the user has filled in the "Tell Us About Yourself" form."""
+        return self.age is not None
+
+    def to_dict(self):
+        return {**asdict(self), "styles": list(self.styles)}
+
+
+@dataclass(frozen=True, slots=True)
+class UserRecord:
+    password: str = None
+    details: UserDetails = field(default_factory=UserDetails)
+    styles_chosen: bool = False
+
+    @classmethod
+    def from_dict(cls, raw):
+        """Validates a stored record and builds a UserRecord from it."""
+        validate(raw)
+        details = raw.get("details") or {}
+        return cls(
+            password=raw["password"],
+            details=UserDetails(**{**details, "styles": tuple(details.get("styles", ()))}),
+            styles_chosen=raw.get("styles_chosen", False),
+        )
+
+    def to_dict(self):
+        """The stored form of the record, validated."""
+        raw = {
+            "password": self.password,
+            "details": None if self.details == UserDetails() else self.details.to_dict(),
+            "styles_chosen": self.styles_chosen,
+        }
+        validate(raw)
+        return raw
+
+    def with_details(self, **fields):
+        """Returns a copy with ``fields`` merged into its details."""
+        if "styles" in fields:
+            fields["styles"] = tuple(fields["styles"])
+        return replace(self, details=replace(self.details, **fields))
+
+    def next_page(self):
+        """The first unfinished onboarding page after login, or "home"."""
+        if not self.details.provided:
+            return "user_details"
+        if not self.details.styles:
+            return "choose_style"
+        if not self.details.image_uploaded:
+            return "upload_image"
+        return "home"
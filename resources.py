@@ -0,0 +1,87 @@
+# --- Shared Resources ---
+# Process-wide objects shared by every Streamlit session through st.cache_resource.
+# They live in an importable module (not in styleteller.py, which Streamlit
+# re-executes as __main__) so page modules can reach them too.
+
+import streamlit as st
+
+import assets
+import instrumentation
+import otp
+import passwords
+import session
+import theme
+import workers
+from user_store import UserStore
+
+
+@st.cache_resource
+def get_user_store():
+    """Returns the process-wide user store shared by every session."""
+    return UserStore()
+
+
+@st.cache_resource
+def get_password_hasher():
+    """Returns the thread pool that hashes and checks passwords for every session."""
+    return passwords.PasswordHasher()
+
+
+@st.cache_resource
+def get_otp_service():
+    """Returns the phone sign-in code service: shared token store, rate limits and delivery queue."""
+    return otp.OTPService()
+
+
+@st.cache_resource
+def get_session_tracker():
+    """Returns the tracker of every session's last run and memory footprint; it cleans up idle sessions."""
+    tracker = session.SessionTracker().start()
+    instrumentation.add_collector(tracker.samples)
+    return tracker
+
+
+@st.cache_resource
+def get_wardrobe_store():
+    """Returns the wardrobe item store shared by every session."""
+    from wardrobe_store import WardrobeStore
+
+    return WardrobeStore()
+
+
+@st.cache_resource
+def get_worker_pool():
+    """Returns the process pool that runs image processing for every session."""
+    pool = workers.WorkerPool()
+    instrumentation.add_collector(pool.samples)
+    return pool
+
+
+@st.cache_resource
+def get_asset_mirror():
+    """Returns the local asset mirror, starting to mirror any assets it is missing."""
+    return assets.AssetMirror(st.get_option("server.enableStaticServing"), pool=get_worker_pool()).start()
+
+
+@st.cache_resource
+def get_intro_media():
+    """Returns the pre-transcoded intro renditions (see media.py), or None to play the mirrored source video."""
+    import media
+
+    # Without static serving the renditions are not reachable.
+    return media.load_manifest() if st.get_option("server.enableStaticServing") else None
+
+
+@st.cache_resource(max_entries=2)
+def get_theme_bundle(asset_version=0):
+    """Builds the minified, content-hashed theme bundle once per process and asset version."""
+    # The bundle is served from static/, so mirrored assets are referenced relative to it.
+    return theme.build_bundle(asset_urls=get_asset_mirror().urls(base="assets"))
+
+
+@st.cache_resource
+def get_recommendation_service():
+    """Returns the cached, request-coalescing outfit recommendation service."""
+    import recommender
+
+    return recommender.RecommendationService(recommender.make_client())
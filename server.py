@@ -0,0 +1,73 @@
+"""ASGI entry point for Style Teller with long-lived caching of static files.
+
+``streamlit run server.py`` (or ``uvicorn server:app``) runs styleteller.py
+exactly like ``streamlit run styleteller.py`` does, and adds HTTP caching that
+Streamlit's static route leaves out: files whose names are content hashes
+(mirrored assets, intro video renditions, proxied outfit images, uploaded media
+and the theme bundle) are sent with ``Cache-Control: immutable`` and a year-long
+max-age, and a request whose If-None-Match matches the file's ETag gets a
+bodiless 304. Range requests (video seeking and progressive playback) are
+answered by the static route with 206 partial content, cached the same way.
+
+GET /metrics returns the instrumentation registry in the Prometheus text format
+(see instrumentation.py; timings are only recorded with STYLETELLER_METRICS set).
+"""
+
+import os
+
+import streamlit as st
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+import instrumentation
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "styleteller.py")
+
+IMMUTABLE_PREFIXES = ("/app/static/assets/", "/app/static/media/", "/app/static/theme.")
+IMMUTABLE_CACHE_CONTROL = b"public, max-age=31536000, immutable"
+
+
+class StaticCacheMiddleware:
+    """Pure ASGI middleware adding Cache-Control and ETag revalidation to immutable static files."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(IMMUTABLE_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        if_none_match = dict(scope["headers"]).get(b"if-none-match")
+        not_modified = False
+
+        async def send_with_caching(message):
+            nonlocal not_modified
+            if message["type"] == "http.response.start" and message["status"] in (200, 206):
+                headers = [(k, v) for k, v in message["headers"] if k.lower() != b"cache-control"]
+                headers.append((b"cache-control", IMMUTABLE_CACHE_CONTROL))
+                etag = next((v for k, v in headers if k.lower() == b"etag"), None)
+                if message["status"] == 200 and if_none_match is not None and etag is not None and etag in _etags(if_none_match):
+                    not_modified = True
+                    headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"content-type")]
+                    message = {**message, "status": 304, "headers": headers}
+                else:
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not_modified:
+                if message.get("more_body", False):
+                    return
+                message = {"type": "http.response.body", "body": b""}
+            await send(message)
+
+        await self.app(scope, receive, send_with_caching)
+
+
+def _etags(header):
+    return {tag.strip().removeprefix(b"W/") for tag in header.split(b",")}
+
+
+async def metrics(request):
+    return PlainTextResponse(instrumentation.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+app = st.App(APP_PATH, routes=[Route("/metrics", metrics)], middleware=[Middleware(StaticCacheMiddleware)])
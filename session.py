@@ -0,0 +1,249 @@
+# --- Sessions ---
+# What a browser session keeps between reruns, and how long it keeps it.
+#
+# A session's own state is one small ViewState (the signed-in user's ID, the page
+# and a few UI flags) under st.session_state["view"]; user records, wardrobe
+# items and everything else shared lives in the stores, not in the session.
+#
+# SessionTracker records when each session last ran and roughly how many bytes
+# its session_state holds. A session that comes back after IDLE_TIMEOUT keeps its
+# ViewState and has everything else (widget values, uploads) dropped on that run;
+# its sweeper thread forgets sessions idle that long, so the tracker stays bounded.
+# Sessions whose browser has gone are closed by Streamlit itself after
+# server.disconnectedSessionTTL (.streamlit/config.toml); nothing here reaches
+# into the runtime.
+#
+# Once signed in, the active page renders inside one fragment (PAGE_REGION), so
+# navigation and the page's own widgets rerun that region rather than the whole
+# script; the tracker counts full and partial reruns per session.
+
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from dataclasses import dataclass, field, fields
+
+import instrumentation
+
+IDLE_TIMEOUT = int(os.environ.get("STYLETELLER_SESSION_IDLE_TIMEOUT", 30 * 60))
+SWEEP_INTERVAL = 60
+# Fragment key of the region that renders the active page (styleteller.page_region).
+PAGE_REGION = "page"
+
+# Run counts are totals since the server started; the rest covers live sessions.
+SessionStats = namedtuple("SessionStats", "sessions total_bytes largest_bytes evicted full_runs partial_runs")
+
+
+@dataclass(slots=True)
+class ViewState:
+    """Everything a session keeps between reruns besides widget values."""
+
+    page: str = "intro_video"
+    user_id: str = None
+    video_played: bool = False
+    # The two intro overlays, each shown once per session.
+    intro_overlay_shown: bool = False
+    intro_shown: bool = False
+    theme_digest: str = None
+    # Set while a phone sign-in code is pending.
+    otp_phone: str = None
+    show_notification: bool = False
+    selected_style: str = None
+    image_job: str = None
+    wardrobe_jobs: list = field(default_factory=list)
+    wardrobe_filters: tuple = None
+    # Start cursors of the wardrobe pages visited so far.
+    wardrobe_cursors: list = field(default_factory=lambda: [None])
+    # SessionTracker clock time of the session's last run.
+    last_run: float = None
+
+    @property
+    def logged_in(self):
+        return self.user_id is not None
+
+    def log_in(self, user_id, page):
+        self.user_id = user_id
+        self.page = page
+        self.otp_phone = None
+        self.show_notification = page == "home"
+
+
+def view_state():
+    """The current session's ViewState, created on its first run."""
+    import streamlit as st
+
+    if "view" not in st.session_state:
+        st.session_state["view"] = ViewState()
+    return st.session_state["view"]
+
+
+def go_to(page):
+    """on_click callback that switches the current session to ``page``, rerunning only the page region."""
+    view_state().page = page
+    rerun(PAGE_REGION)
+
+
+def partial_run():
+    """Whether only fragments are rerunning, rather than the whole script."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx is not None and bool(ctx.fragment_ids_this_run)
+
+
+def rerun(scope="app"):
+    """st.rerun(), counted by instrumentation per scope ("app", "fragment" or a fragment key)."""
+    import streamlit as st
+
+    instrumentation.count("styleteller_reruns_total", scope=scope)
+    st.rerun(scope)
+
+
+def rerun_region():
+    """rerun() of just the calling fragment in a partial run, of the whole script otherwise."""
+    rerun("fragment" if partial_run() else "app")
+
+
+def track_run(tracker, fragment=False):
+    """Records the current run with a SessionTracker.
+
+    main() reports every full run; a fragment passes ``fragment=True`` so that
+    only its partial reruns are reported.
+    """
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return
+    partial = bool(ctx.fragment_ids_this_run)
+    if partial == fragment:
+        tracker.resume(st.session_state)
+        tracker.touch(ctx.session_id, st.session_state, partial)
+
+
+def footprint(value, _seen=None):
+    """Approximate bytes held by ``value`` and everything it references (containers, objects, slots)."""
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value, 0)
+    if isinstance(value, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(value, dict):
+        return size + sum(footprint(k, seen) + footprint(v, seen) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(footprint(item, seen) for item in value)
+    if hasattr(value, "__dataclass_fields__"):
+        return size + sum(footprint(getattr(value, f.name), seen) for f in fields(value))
+    if hasattr(value, "__dict__"):
+        return size + footprint(vars(value), seen)
+    return size
+
+
+class SessionTracker:
+    """Last activity and memory footprint of every session, plus idle-session cleanup."""
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, clock=time.monotonic):
+        self.idle_timeout = idle_timeout
+        self.evicted = 0
+        self.full_runs = 0
+        self.partial_runs = 0
+        self._clock = clock
+        self._sessions = {}  # session ID -> [last run, bytes, full runs, partial runs]
+        self._lock = threading.Lock()
+
+    def touch(self, session_id, state, partial=False):
+        """Records a run of ``session_id`` and the size of its ``state`` (a session_state mapping).
+
+        Partial (fragment) runs keep the size measured by the last full run.
+        """
+        size = None if partial else footprint({key: state[key] for key in state.keys()})
+        with self._lock:
+            record = self._sessions.setdefault(session_id, [0.0, 0, 0, 0])
+            record[0] = self._clock()
+            if partial:
+                record[3] += 1
+                self.partial_runs += 1
+            else:
+                record[1] = size
+                record[2] += 1
+                self.full_runs += 1
+
+    def resume(self, state):
+        """Drops everything but the ViewState from a session_state idle for ``idle_timeout``.
+
+        The ViewState carries the session's last run time, so this also works for
+        sessions sweep() has forgotten. Returns whether anything was dropped.
+        """
+        view = state["view"]
+        now = self._clock()
+        idle = view.last_run is not None and now - view.last_run >= self.idle_timeout
+        view.last_run = now
+        if not idle:
+            return False
+        for key in [key for key in state.keys() if key != "view"]:
+            del state[key]
+        with self._lock:
+            self.evicted += 1
+        return True
+
+    def runs(self, session_id):
+        """(full runs, partial runs) of a live session."""
+        with self._lock:
+            record = self._sessions.get(session_id, (0.0, 0, 0, 0))
+            return record[2], record[3]
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def idle(self):
+        """IDs of sessions that have not run for ``idle_timeout`` seconds."""
+        cutoff = self._clock() - self.idle_timeout
+        with self._lock:
+            return [session_id for session_id, record in self._sessions.items() if record[0] <= cutoff]
+
+    def stats(self):
+        with self._lock:
+            sizes = [record[1] for record in self._sessions.values()]
+            return SessionStats(
+                len(sizes), sum(sizes), max(sizes, default=0), self.evicted, self.full_runs, self.partial_runs,
+            )
+
+    def samples(self):
+        """The stats as instrumentation Samples."""
+        stats = self.stats()
+        return [
+            instrumentation.Sample("styleteller_sessions", {}, stats.sessions, "gauge"),
+            instrumentation.Sample("styleteller_session_state_bytes", {}, stats.total_bytes, "gauge"),
+            instrumentation.Sample("styleteller_session_state_largest_bytes", {}, stats.largest_bytes, "gauge"),
+            instrumentation.Sample("styleteller_sessions_evicted_total", {}, stats.evicted, "counter"),
+            instrumentation.Sample("styleteller_script_runs_total", {"kind": "full"}, stats.full_runs, "counter"),
+            instrumentation.Sample("styleteller_script_runs_total", {"kind": "partial"}, stats.partial_runs, "counter"),
+        ]
+
+    def sweep(self):
+        """Forgets sessions idle for ``idle_timeout``; their state is handled by resume() if they come back."""
+        idle = self.idle()
+        for session_id in idle:
+            self.forget(session_id)
+        return len(idle)
+
+    def start(self, interval=SWEEP_INTERVAL):
+        """Starts the sweeper thread for the running Streamlit server; a no-op outside one."""
+        from streamlit import runtime
+
+        if runtime.exists():
+            threading.Thread(target=self._sweep_forever, args=(interval,), daemon=True).start()
+        return self
+
+    def _sweep_forever(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping idle sessions: {e}")
@@ -0,0 +1,184 @@
+"""Local stand-ins for Style Teller's external services.
+
+Run one with ``python stubs.py <name> [--port N]`` and point the app at it, e.g.
+``OPENAI_BASE_URL=http://127.0.0.1:8900/v1``. Benchmarks start them in-process
+with ``start_stub()``.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+STUB_COLORS = ("1e3b68", "8B4513", "556B2F", "4B0082", "FF5733")
+
+
+class StubServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that counts requests and can add latency."""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, latency=0.0, chunk_delay=0.0):
+        super().__init__(address, handler)
+        self.latency = latency
+        # Pause between streamed chunks, for watching results arrive one by one.
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        # Requests seen per path, for HTTPStubHandler's ?fail=N.
+        self.path_hits = {}
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class OpenAIStubHandler(BaseHTTPRequestHandler):
+    """Answers POST /v1/chat/completions with deterministic outfits, one JSON line each.
+
+    Requests with ``"stream": true`` get OpenAI-style server-sent events, one chunk
+    per line, spaced by the server's ``chunk_delay``.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY a kept-alive
+    # connection stalls on delayed ACKs.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        self.server.count()
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        lines = [
+            json.dumps({"title": f"Stub Outfit {i + 1}", "description": prompt[:60], "color": f"#{STUB_COLORS[i % len(STUB_COLORS)]}"}) + "\n"
+            for i in range(3)
+        ]
+        completion = {"id": "chatcmpl-stub", "created": int(time.time()), "model": body.get("model", "stub")}
+        if body.get("stream"):
+            self._send_events(completion, lines)
+            return
+        self._send_json({
+            **completion,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(lines)}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        })
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_events(self, completion, lines):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        deltas = [{"role": "assistant", "content": ""}] + [{"content": line} for line in lines]
+        for i, delta in enumerate(deltas):
+            if i > 1 and self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            chunk = {**completion, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self._send_event(json.dumps(chunk))
+        self._send_event(json.dumps({**completion, "object": "chat.completion.chunk",
+                                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        self._send_event("[DONE]")
+
+    def _send_event(self, data):
+        self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HTTPStubHandler(BaseHTTPRequestHandler):
+    """Answers GET with deterministic bytes, over keep-alive connections.
+
+    ``?size=N`` sets the body length (default 1024), ``?image=WxH`` answers with a
+    PNG of that size instead, and ``?fail=N`` makes the first N requests for that
+    path answer 503, for exercising retries.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY a kept-alive
+    # connection stalls on delayed ACKs.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        self.server.count()
+        with self.server._lock:
+            seen = self.server.path_hits.get(self.path, 0)
+            self.server.path_hits[self.path] = seen + 1
+        if seen < int(query.get("fail", ["0"])[0]):
+            self.send_error(503)
+            return
+        content_type, data = "application/octet-stream", b"x" * int(query.get("size", ["1024"])[0])
+        if "image" in query:
+            content_type, data = "image/png", _png(*map(int, query["image"][0].split("x")))
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _png(width, height):
+    import io
+
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (30, 59, 104)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+STUBS = {
+    "http": HTTPStubHandler,
+    "openai": OpenAIStubHandler,
+}
+
+
+def start_stub(name, port=0, latency=0.0, chunk_delay=0.0):
+    """Starts a stub on a background thread and returns its server."""
+    server = StubServer(("127.0.0.1", port), STUBS[name], latency=latency, chunk_delay=chunk_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("name", choices=sorted(STUBS))
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    args = parser.parse_args(argv)
+    server = StubServer(("127.0.0.1", args.port), STUBS[args.name], latency=args.latency, chunk_delay=args.chunk_delay)
+    print(f"{args.name} stub listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
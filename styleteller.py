@@ -1,237 +1,120 @@
-# --- START: StyleTeller UI Enhancements (intro, theme, logo, background, rules) ---
+import importlib
+import os
+
 import streamlit as st
 from streamlit.components.v1 import html as components_html
 
+import instrumentation
+import media
+import otp
+import passwords
+import theme
+import workers
+from records import UserRecord
+from resources import (
+    get_asset_mirror, get_intro_media, get_otp_service, get_password_hasher, get_session_tracker, get_theme_bundle,
+    get_user_store, get_worker_pool,
+)
+from session import PAGE_REGION, go_to, rerun, rerun_region, track_run, view_state
+from user_store import normalize_email
+
+# Must be the first Streamlit call of every run.
+st.set_page_config(page_title="Style Teller", page_icon="👗", layout="wide")
+
+# --- START: StyleTeller UI Enhancements (intro, theme, logo, background, rules) ---
+
+# --- Intro Configuration ---
+# All intro timing runs in the browser; the server never sleeps or reruns for it.
+# STYLETELLER_SKIP_INTRO=1 turns every intro off (e.g. for load tests), and browsers
+# that have already seen it carry a cookie so returning visitors go straight to login.
+INTRO_SEEN_COOKIE = "styleteller_intro_seen"
+INTRO_SEEN_JS = "document.cookie = '" + INTRO_SEEN_COOKIE + "=1; max-age=31536000; path=/; SameSite=Lax';"
+
+def intro_skipped():
+    """Returns True if this session should not be shown any intro."""
+    if os.environ.get("STYLETELLER_SKIP_INTRO", "").lower() in ("1", "true", "yes"):
+        return True
+    try:
+        return INTRO_SEEN_COOKIE in st.context.cookies
+    except Exception:
+        return False
+
 _intro_html = r"""
 <style>
-/* Page fade-in */
-.stApp { opacity: 0; transition: opacity 1s ease; --stapp-opacity: 1; }
-
-/* Custom logo header */
-#custom-logo-header {
-  position: relative;
-  width: 100%;
-  display: flex;
-  justify-content: center;
-  align-items: center;
-  margin-top: 8px;
-  z-index: 1001;
-  pointer-events: none;
-  opacity: 0;
-  transition: opacity 1s ease;
-}
-#custom-logo-header img { max-height: 72px; width: auto; object-fit: contain; }
-
-/* Intro overlay full-screen */
-#intro-overlay {
+/* Scoped to the overlay: this is added to the app's own page, not an iframe.
+   It sits just below the intro video (#intro-video-overlay), which plays over it. */
+#styleteller-intro-overlay {
   position: fixed; inset: 0; display: flex; align-items: center; justify-content: center;
-  z-index: 10000; background: rgba(255,255,255,1);
-}
-#intro-overlay img { max-width: 80vw; max-height: 80vh; width: auto; height: auto; border-radius: 6px; box-shadow: 0 10px 30px rgba(0,0,0,0.08); opacity: 0; transition: opacity 1.5s ease; }
-
-/* Background image & white overlay */
-html, body { height: 100%; }
-body {
-  background-image: url('https://ibb.co/gMDjN4Mt');
-  background-size: cover; background-position: center; background-repeat: no-repeat !important;
-  background-color: #ffffff;
-}
-
-/* white overlay on background - placed behind app content */
-#background-white-overlay {
-  position: fixed; inset: 0; z-index: -9998; pointer-events: none;
-  background-color: rgba(255,255,255,0.12);
-  width: 100%; height: 100%;
+  z-index: 9998; background: #ffffff;
+  animation: styletellerIntroOut 1s ease 4s forwards;
 }
-
-/* Force white boxes & black text for common containers */
-.stApp .block-container,
-.stApp .element-container,
-.stApp .stButton,
-.stApp .main,
-.stApp .stMarkdown,
-.stApp .stTextInput,
-.stApp .stFileUploader,
-.stApp .stSidebar {
-  background-color: #FFFFFF !important;
-  color: #000000 !important;
+#styleteller-intro-overlay img {
+  max-width: 80vw; max-height: 80vh; width: auto; height: auto; border-radius: 6px;
+  box-shadow: 0 10px 30px rgba(0,0,0,0.08); opacity: 0;
+  animation: styletellerIntroIn 1.5s ease 0.06s forwards;
 }
-
-/* Also override inline black backgrounds if present */
-*[style*="background-color: rgb(0, 0, 0)"]{ background-color: #FFFFFF !important; color: #000000 !important; }
-*[style*="background:#000"], *[style*="background: #000"], *[style*="background-color:#000"]{ background-color: #FFFFFF !important; color: #000000 !important; }
-
-/* Rules block */
-.custom-rules { font-family: -apple-system,BlinkMacSystemFont,"Segoe UI",Roboto,"Helvetica Neue",Arial; color: #000000; font-weight: 500; line-height: 1.5; margin-top: 12px; }
-.custom-rules .title { font-size: 16px; margin-bottom: 8px; }
-.custom-rules ul { margin-top: 8px; padding-left: 18px; }
-.custom-rules li { margin-bottom: 10px; }
-
-/* Ensure inputs and textareas keep black text on white backgrounds */
-input, textarea, select { color: #000000 !important; background-color: #FFFFFF !important; }
-
+@keyframes styletellerIntroIn { to { opacity: 1; } }
+@keyframes styletellerIntroOut { to { opacity: 0; visibility: hidden; } }
 </style>
 
-<div id="intro-overlay" aria-hidden="true">
-  <img id="intro-image" src="https://ibb.co/B5qxJWW8" alt="Intro" />
-  <audio id="intro-audio" src="" preload="auto"></audio>
+<div id="styleteller-intro-overlay" aria-hidden="true">
+  <img src="asset:intro" alt="Intro" />
 </div>
 
-<div id="background-white-overlay"></div>
-
 <script>
 (function(){
-  const AUDIO_ENABLED = true; // attempt to play; browsers may block autoplay
-
-  const audio = document.getElementById('intro-audio');
-  // NOTE: Using an external audio URL may be blocked; left empty so browser fallback is graceful.
-  // If you prefer a bundled audio clip, replace audio.src with a valid URL or base64 data URI.
-  audio.loop = false;
-  audio.volume = 0.0;
-
-  const overlay = document.getElementById('intro-overlay');
-  const img = document.getElementById('intro-image');
-
-  // Small delay to let component mount, then fade in image and attempt audio
-  setTimeout(()=>{ 
-    try{ img.style.opacity = 1; }catch(e){}
-    if(AUDIO_ENABLED){
-      try{ 
-        const playPromise = audio.play();
-        if(playPromise !== undefined){
-          playPromise.then(()=>{ fadeAudioIn(audio,1500); }).catch(()=>{/* autoplay blocked */});
-        }
-      } catch(e){}
-    }
-  }, 60);
-
-  // After 4 seconds total, fade out overlay over 1s, fade audio out, then remove overlay and show app
-  setTimeout(()=> {
-    overlay.style.transition = 'opacity 1s ease';
-    overlay.style.opacity = 0;
-    fadeAudioOut(audio,1000);
-    setTimeout(()=>{ overlay.remove(); showMainApp(); }, 1000);
-  }, 4000);
-
-  function showMainApp(){
-    const app = document.querySelector('.stApp');
-    if(app){ app.style.opacity = 1; }
-    // insert custom logo header if not exists
-    if(!document.getElementById('custom-logo-header')){
-      const header = document.createElement('div');
-      header.id = 'custom-logo-header';
-      header.innerHTML = '<img src="https://i.ibb.co/3YMDZQVn"alt="Logo" id="custom-logo-img" />';
-      document.body.insertBefore(header, document.body.firstChild);
-      setTimeout(()=>{ header.style.opacity = 1; }, 50);
-    } else {
-      document.getElementById('custom-logo-header').style.opacity = 1;
-    }
-
-    // Inject rules block under the first file input (upload)
-    setTimeout(()=> {
-      try {
-        const fileInput = document.querySelector('input[type=file]');
-        if(fileInput){
-          let container = fileInput.closest('div');
-          if(!container){ container = fileInput.parentElement; }
-          const rules = document.createElement('div');
-          rules.className = 'custom-rules';
-          rules.innerHTML = `
-            <div class="title"><strong>Your avatar starts with the right photo</strong><br><small>Here are some quick tips to nail it ✨</small></div>
-            <ul>
-              <li><strong>Full Body Shot</strong><div>Show your complete outfit from head to toe for accurate style analysis.</div></li>
-              <li><strong>Plain Background</strong><div>Use a simple, uncluttered background to help our AI focus on your style.</div></li>
-              <li><strong>Good Lighting</strong><div>Natural light works best – avoid shadows and dark areas for clearer photos.</div></li>
-            </ul>
-          `;
-          if(container.nextSibling){ container.parentNode.insertBefore(rules, container.nextSibling); } else { container.parentNode.appendChild(rules); }
-        }
-      } catch(e){}
-    }, 200);
-  }
-
-  function fadeAudioIn(audio, duration){
-    if(!audio) return;
-    let step = 50;
-    let steps = Math.max(1, Math.floor(duration/step));
-    let inc = 1.0/steps;
-    audio.volume = 0;
-    let i=0;
-    let t = setInterval(()=>{ i++; audio.volume = Math.min(1, audio.volume + inc); if(i>=steps){ clearInterval(t); } }, step);
-  }
-  function fadeAudioOut(audio, duration){
-    if(!audio) return;
-    let step = 50;
-    let steps = Math.max(1, Math.floor(duration/step));
-    let dec = (audio.volume||1)/steps;
-    let i=0;
-    let t = setInterval(()=>{ i++; audio.volume = Math.max(0, audio.volume - dec); if(i>=steps){ audio.pause(); clearInterval(t); } }, step);
-  }
-
+  __INTRO_SEEN_JS__
+  // The overlay fades in and out in CSS; this only takes it out of the page afterwards.
+  setTimeout(function(){
+    const overlay = document.getElementById('styleteller-intro-overlay');
+    if(overlay){ overlay.remove(); }
+  }, 5000);
 })();
 </script>
 """
 
-# Render the intro HTML once on first run so it overlays the app during load.
-if not st.session_state.get('_st_intro_shown', False):
+_intro_html = _intro_html.replace("__INTRO_SEEN_JS__", INTRO_SEEN_JS)
+
+def show_intro_overlay():
+    """Renders the intro HTML once per session so it overlays the app during load."""
+    view = view_state()
+    if view.intro_overlay_shown or intro_skipped():
+        return
     try:
-        components_html(_intro_html, height=160)
+        # Added to the parent page, so the login form below it is not pushed down.
+        components_html(theme.overlay_html(get_asset_mirror().resolve(_intro_html), "styleteller-intro-overlay-root"), height=0)
     except Exception:
         # Fallback to markdown if components fails
-        st.markdown(_intro_html, unsafe_allow_html=True)
-    st.session_state['_st_intro_shown'] = True
-else:
-    # Ensure the main app still receives the new styling when intro already shown
-    try:
-        # Extract CSS part to inject only the styles quickly
-        css_part = _intro_html.split("<style>",1)[1].split("</style>",1)[0]
-        components_html(f"<style>{css_part}</style>", height=1)
-    except Exception:
-        pass
+        st.markdown(get_asset_mirror().resolve(_intro_html), unsafe_allow_html=True)
+    view.intro_overlay_shown = True
 
 # --- END: StyleTeller UI Enhancements ---
 
 
 # --- ORIGINAL APP CODE (unchanged) ---
 
-import streamlit as st
-from PIL import Image
-import requests
-from io import BytesIO
-import json
-import os
-import time
-import base64
-import random
-
 # --- INTRO & UI THEME INJECTION START ---
-import time
-try:
-    import streamlit as st  # should already be imported but safe guard
-    from streamlit.components.v1 import html as components_html
-except Exception:
-    pass
 
 # Intro sequence: show a 4-second still image with fade in/out and background audio.
-_intro_key = "_style_teller_intro_shown"
 def show_intro_once():
-    if st.session_state.get(_intro_key, False):
+    view = view_state()
+    if view.intro_shown or intro_skipped():
         return
-    placeholder = st.empty()
     intro_html = """
-    <div id="styleteller-intro" style="position:fixed;inset:0;z-index:9999;display:flex;align-items:center;justify-content:center;
+    <div id="styleteller-intro" style="position:fixed;inset:0;z-index:9998;display:flex;align-items:center;justify-content:center;
         background: rgba(255,255,255,0.0);backdrop-filter: blur(0px);">
       <div style="text-align:center;max-width:100%;width:100%;height:100%;display:flex;align-items:center;justify-content:center;">
         <div style="position:relative; display:flex; align-items:center; justify-content:center; width:100%; height:100%;">
-          <img id="intro-img" src="https://i.ibb.co/B5qxJWW8/intro.png" style="max-width:70%; max-height:70%; opacity:0; transition: opacity 1.2s ease;" />
-          <audio id="intro-audio" src="https://cdn.pixabay.com/download/audio/2021/08/04/audio_7e5b3f7c0c.mp3?filename=relaxing-piano-11248.mp3" preload="auto"></audio>
+          <img id="intro-img" src="asset:intro" style="max-width:70%; max-height:70%; opacity:0; transition: opacity 1.2s ease;" />
+          <audio id="intro-once-audio" src="asset:intro_audio" preload="auto"></audio>
         </div>
       </div>
     </div>
     <script>
       (function() {
+        __INTRO_SEEN_JS__
         const img = document.getElementById('intro-img');
-        const audio = document.getElementById('intro-audio');
+        const audio = document.getElementById('intro-once-audio');
         // fade in image and audio
         setTimeout(()=>{ img.style.opacity = 1; try{ audio.volume=0.0; audio.play(); 
             // fade audio in
@@ -246,134 +129,18 @@ def show_intro_once():
       })();
     </script>
     """
-    components_html(intro_html, height=600)
-    # keep intro visible server-side for 4.2s to allow client animations to run
-    time.sleep(4.2)
-    placeholder.empty()
-    st.session_state[_intro_key] = True
-
-# run intro early (before main UI)
-try:
-    show_intro_once()
-except Exception:
-    pass
-
-# Global CSS adjustments: background, page fade-in, logo, color boxes
-global_css = """
-<style>
-/* Page fade-in */
-html, body, .main, .block-container {
-  animation: pageFadeIn 1s ease forwards;
-  opacity: 0;
-}
-@keyframes pageFadeIn { from { opacity: 0; } to { opacity: 1; } }
-
-/* Background image */
-.stApp {
-  background-image: url('https://i.ibb.co/gMDjN4Mt/background.jpg');
-  background-size: cover !important;
-  background-position: center !important;
-  background-repeat: no-repeat !important;
-  position: relative;
-}
-/* white soft overlay */
-.stApp::before {
-  content: "";
-  position: absolute;
-  inset: 0;
-  background: rgba(255,255,255,0.12);
-  pointer-events: none;
-  z-index: 0;
-}
-
-/* Force any black boxes to white with black text for contrast */
-*[style*="background:#000"], *[style*="background:#000000"], *[style*="background: #000"], *[style*="background: #000000"] {
-  background: #FFFFFF !important;
-  color: #000000 !important;
-}
+    # The script above fades in, fades out and removes the overlay on its own timers,
+    # so the server returns immediately instead of holding the run open for 4.2s.
+    # Both intro overlays share the parent page, hence the distinct element IDs.
+    intro_html = get_asset_mirror().resolve(intro_html.replace("__INTRO_SEEN_JS__", INTRO_SEEN_JS))
+    components_html(theme.overlay_html(intro_html, "styleteller-intro-once"), height=0)
+    view.intro_shown = True
 
-/* Generic card overrides (Streamlit cards) */
-.css-1d391kg, .css-18e3th9, .stButton, .stTextInput, .stSelectbox, .stTextArea {
-  background: #FFFFFF !important;
-  color: #000000 !important;
-}
-
-/* Logo placement at top center */
-#styleteller-logo-wrap {
-  text-align:center;
-  width:100%;
-  display:block;
-  margin-top:10px;
-  margin-bottom:8px;
-  z-index: 2;
-  position: relative;
-}
-#styleteller-logo-wrap img {
-  max-height:88px;
-  width:auto;
-  opacity:0;
-  transition: opacity 1s ease;
-}
-/* show logo after page fade */
-html.loaded #styleteller-logo-wrap img { opacity: 1; }
-
-/* Tiny tech dots decoration */
-.tech-dot {
-  position: absolute;
-  width: 4px;
-  height: 4px;
-  border-radius: 50%;
-  background: rgba(0,150,255,0.95);
-  box-shadow: 0 0 8px rgba(0,150,255,0.8);
-  z-index: 1;
-  opacity: 0.9;
-}
-</style>
-<script>
-// add 'loaded' class after content load to trigger logo appearance
-window.addEventListener('load', function(){ document.documentElement.classList.add('loaded'); });
-
-// randomly scatter some tech dots
-function placeDots(count){
-  for(let i=0;i<count;i++){
-    const d = document.createElement('div');
-    d.className='tech-dot';
-    d.style.left = (Math.random()*90+2) + '%';
-    d.style.top = (Math.random()*85+3) + '%';
-    d.style.opacity = (0.4 + Math.random()*0.9);
-    d.style.transform = 'scale(' + (0.6 + Math.random()*1.4) + ')';
-    document.body.appendChild(d);
-  }
-}
-setTimeout(()=>placeDots(28), 800);
-</script>
-"""
-
-# Inject CSS/JS
-try:
-    st.markdown(global_css, unsafe_allow_html=True)
-except Exception:
-    try:
-        components_html(global_css, height=0)
-    except Exception:
-        pass
-
-# Insert top-center logo (will fade in with page)
-try:
-    st.markdown('<div class="logo-container"><img src="https://i.ibb.co/3YMDZQVn/logo.png" alt="Style Teller Logo"></div>', unsafe_allow_html=True)
-except Exception:
-    pass
+def show_logo():
+    """Inserts the top-center logo (will fade in with page)."""
+    st.markdown(f'<div class="logo-container"><img src="{get_asset_mirror().url("logo")}" alt="Style Teller Logo"></div>', unsafe_allow_html=True)
 
 # --- INTRO & UI THEME INJECTION END ---
-# ---- Page Load & Logo Styling ----
-# All fade-in CSS and logo placement code removed here
-page_fadein_css = """
-<style>
-/* Keeping original global styles for consistency */
-</style>
-"""
-st.markdown(page_fadein_css, unsafe_allow_html=True)
-
 # ---- Display logo ----
 # Removed logo display markdown to revert logo placement
 # st.markdown(
@@ -392,327 +159,114 @@ LOGO_BASE64 = "iVBORw0KGgoAAAANSUhEUgAAAGQAAABkCAYAAABw4MoaAAAAAXNSR0IArs4c6QAAA
 
 # Note: In a real-world scenario, these files would be stored in a cloud environment (like S3 or Google Cloud Storage)
 # for persistence across Streamlit app restarts. For this environment, we rely on local file persistence.
-
-def save_user_db():
-    """Saves the user database to a JSON file."""
-    try:
-        with open("user_db.json", "w") as f:
-            json.dump(st.session_state.USER_DB, f)
-    except Exception as e:
-        # Catch exception in case of file system limitations
-        print(f"Error saving user DB: {e}")
-
-def load_user_db():
-    """Loads the user database from a JSON file, or creates a default one."""
-    if os.path.exists("user_db.json"):
-        try:
-            with open("user_db.json", "r") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading user DB, using default: {e}")
-            pass
-    return {
-        "demo@example.com": {"password": "password123", "details": {"name": "Demo User", "age": 30, "gender": "Male", "styles": ["Formal"], "image_uploaded": True}},
-        "alice@example.com": {"password": "stylequeen", "details": {"name": "Alice", "age": 25, "gender": "Female", "styles": ["Old money", "Casual"], "image_uploaded": True}},
-        "bob@example.com": {"password": "fashionking", "details": {"name": "Bob", "age": 35, "gender": "Male", "styles": ["Streetwear", "Sporty"], "image_uploaded": True}}
-    }
+# The shared store, worker pool and other process-wide objects live in resources.py.
 
 # --- Custom Styling (Includes UI Fixes and Fullscreen Video CSS) ---
 
 def set_styles():
-    """Sets the custom CSS for the app, ensuring light background, black text, and fullscreen video."""
-    st.markdown("""
-        <style>
-        /* Global Background Fix: Ensure app background is white */
-        .stApp {
-            background-color: #ffffff; /* White background */
-        }
-        
-        /* 1. Ensure ALL text is BLACK for readability on white background */
-        div, span, p, a, label, h1, h2, h3, h4, .stApp, 
-        .st-emotion-cache-12fmw6v, 
-        .st-emotion-cache-1fsy711 > div, 
-        div[data-testid="stAppViewContainer"] * {
-            color: #000000 !important;
-        }
-        
-        /* --- EXCEPTION FOR DARK BACKGROUND UI ELEMENTS (Streamlit Sidebar/Top Menu) --- */
-        /* This overrides the global black text for elements that remain on a dark background */
-        div[data-testid="stSidebar"] *, /* All text in the dark sidebar */
-        .st-emotion-cache-zq5aqc, /* Class for Streamlit's header/top-right menu container */
-        .st-emotion-cache-9y213l, /* Class for 'Fork' link text */
-        .st-emotion-cache-1g6h684, /* Class for the 3-dot menu icon/text */
-        div[data-testid="stSidebarContent"] button, /* Button text inside the dark sidebar */
-        .st-emotion-cache-5rimss /* Another common button text/icon class in sidebar */
-        {
-            color: #ffffff !important; /* Force text to white on dark background */
-        }
-        
-        /* 1a. Ensure sidebar button backgrounds are transparent/dark so text is visible */
-        div[data-testid="stSidebarContent"] button {
-            background-color: transparent !important;
-            border: 1px solid #ffffff33 !important; /* Light border for visibility */
-        }
-        /* End of sidebar/dark element exceptions */
-
-
-        /* --- CRITICAL INPUT FIELD OVERRIDE (FIX for Black Boxes) --- */
-
-        /* Target the actual input element for text, number, and password fields */
-        div[data-baseweb="input"] input,
-        div[data-baseweb="input"] textarea,
-        div[data-baseweb="base-input"] input, 
-        input[type="text"], 
-        input[type="password"],
-        input[type="number"],
-        textarea {
-            background-color: #ffffff !important; /* Force the field itself to white */
-            color: #000000 !important; /* Force text to black */
-            border: 1px solid #e0e0e0 !important; 
-            -webkit-appearance: none; 
-            appearance: none;
-        }
-        
-        /* Ensure the input container also respects the white theme */
-        div[data-testid="stTextInput"] > div > div, 
-        div[data-testid="stNumberInput"] > div > div,
-        div[data-testid="stSelectbox"] > div,
-        div[data-baseweb="input"] {
-            background-color: #ffffff !important;
-        }
-        
-        /* Selectbox/Dropdown Display Text: Ensure selected option text is BLACK */
-        div[data-testid="stSelectbox"] div[data-baseweb="select"] input {
-             color: #000000 !important;
-        }
-
-        /* --- BUTTON STYLING OVERRIDE (FIX for Black Buttons/Boxes) --- */
-
-        /* Target all common button containers, including primary and secondary */
-        /* .st-emotion-cache-1v0bb6x is the class for the PRIMARY button (The "Start Now" button) */
-        /* Force Primary Button (Start Now) to white background / black text */
-        div[data-testid="stVerticalBlock"] .st-emotion-cache-1v0bb6x, 
-        .st-emotion-cache-1v0bb6x, /* Primary buttons (Start Now) */
-        .st-emotion-cache-7ym5gk, /* Standard/Secondary buttons (Style buttons, Login/Signup) */
-        div[data-testid*="stButton"] > button
-        {
-            background-color: #ffffff !important; /* White background */
-            color: #000000 !important; /* Black text */
-            border: 1px solid #000000 !important; /* Black border for distinction */
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1) !important;
-        }
-        
-        /* Ensure button text remains black on hover/active states if needed */
-        .st-emotion-cache-1v0bb6x:hover, 
-        .st-emotion-cache-7ym5gk:hover,
-        div[data-testid*="stButton"] > button:hover {
-            color: #000000 !important; 
-            border: 1px solid #000000 !important; 
-            background-color: #f0f0f0 !important; 
-        }
-        
-        /* --- General Dark Container Fixes (Forms, Alerts, etc.) --- */
-        div.st-emotion-cache-6o6vcr, 
-        div[data-testid="stForm"], 
-        div[data-testid="stAlert"],
-        div[data-baseweb="popover"], /* The dropdown menu/popover container */
-        div[role="listbox"], /* The list of options inside a selectbox */
-        .st-emotion-cache-1fcpj1c, /* Generic Streamlit input wrapper */
-        .st-emotion-cache-16j94j4 /* Another common input wrapper class */
-        {
-            background-color: #ffffff !important; 
-            border: 1px solid #e0e0e0; /* Add a slight border for distinction */
-            box-shadow: 0 4px 8px rgba(0,0,0,0.05);
-        }
-        
-        /* --- END CRITICAL UI OVERRIDES --- */
-
-
-        /* Sidebar Title Block fix for extra space (Req 5) */
-        div[data-testid="stSidebarContent"] > div:nth-child(1) {
-            padding-bottom: 0px !important; 
-            margin-bottom: -10px !important;
-        }
-
-
-        /* --- Intro Video Fullscreen (Req 1) --- */
-        /* Video fullscreen and visibility fixes removed */
-        .video-active div[data-testid="stAppViewContainer"] {
-            position: fixed;
-            top: 0;
-            left: 0;
-            width: 100vw;
-            height: 100vh;
-            z-index: 9999;
-            background-color: #000000 !important; /* Black background for video mode */
-            padding: 0 !important;
-            margin: 0 !important;
-        }
-        
-        /* Hide sidebar while video is active */
-        .video-active div[data-testid="stSidebar"] {
-            display: none !important;
-        }
-
-        /* Center the video element */
-        .video-active div[data-testid="stVerticalBlock"] {
-            width: 100%;
-            height: 100%;
-            display: flex;
-            flex-direction: column;
-            justify-content: center;
-            align-items: center;
-        }
-        
-        /* Make the video itself cover the screen */
-        .video-active video {
-             width: 100vw !important;
-             height: 100vh !important;
-             object-fit: cover !important; /* Ensure video covers the entire screen */
-             margin: 0 !important;
-             padding: 0 !important;
-        }
-        
-        /* Hide the progress bar/text area when video is running, except for the progress bar itself */
-        .video-active div[data-testid="stProgress"] * {
-            color: white !important; /* Ensure progress text is visible on black background */
-        }
-
-
-        /* --- Standard Layout CSS retained below --- */
-
-        .st-emotion-cache-j93igk {
-            border-bottom: 2px solid #ccc;
-        }
-        
-        /* Default container styling (Now white via global fix) */
-        div.st-emotion-cache-6o6vcr {
-            border-radius: 10px;
-            padding: 20px;
-        }
-
-        .st-emotion-cache-11r9w7n, .st-emotion-cache-11r9w7n .st-bm {
-            width: 100%;
-        }
-
-        .st-emotion-cache-13srm2a .st-emotion-cache-7ym5gk {
-            margin: 10px 0;
-        }
-
-        .outfit-container {
-            display: flex;
-            flex-wrap: wrap;
-            justify-content: center;
-            gap: 20px;
-            margin-top: 20px;
-        }
-
-        .outfit-card {
-            background: #fff;
-            border-radius: 10px;
-            padding: 10px;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            text-align: center;
-        }
-
-        .outfit-card img {
-            max-width: 100%;
-            border-radius: 8px;
-        }
-        
-        </style>
-        <script>
-        // Use Javascript to toggle a class on the body to control video fullscreen
-        function setVideoMode(isActive) {
-            if (isActive) {
-                document.body.classList.add('video-active');
-            } else {
-                document.body.classList.remove('video-active');
-            }
-        }
-        </script>
-    """, unsafe_allow_html=True)
+    """Injects the theme bundle (light background, black text, layout fixes) once per session."""
+    # A new bundle is built once mirrored assets (e.g. the background) are available.
+    bundle = get_theme_bundle(get_asset_mirror().version)
+    view = view_state()
+    if view.theme_digest == bundle.digest:
+        # Already in this browser page's <head>; reruns send no theme bytes.
+        return
+    static_serving = st.get_option("server.enableStaticServing")
+    components_html(theme.injector_html(bundle, static_serving), height=0)
+    view.theme_digest = bundle.digest
 
 
 # --- Page Functions ---
 
 def intro_video():
-    """Displays the intro video screen and automatically proceeds to login."""
-    # Run JS to activate fullscreen mode CSS (Req 1)
-    st.components.v1.html("<script>setVideoMode(true);</script>", height=0)
-    
-    # FIX: Replaced unreliable Google Drive link with a known, publicly hosted MP4 file
-    VIDEO_URL = "https://static.videezy.com/system/resources/previews/000/054/104/original/10_Second_Countdown.mp4"
-    st.video(VIDEO_URL, start_time=0)
-    
-    # Logic to auto-transition after a set time (simulates video completion)
-    # Minimum 4 seconds watch time before auto-redirect (Req 1)
+    """Overlays the intro video on the login screen and lets the browser time it out."""
+    # Small local renditions picked by viewport, with a poster (see media.py); before
+    # they are built, the source video from the local asset mirror (see assets.py).
+    video = media.video_html(get_intro_media(), get_asset_mirror().url("intro_video"))
+    # Minimum 4 seconds watch time before the login form is revealed (Req 1).
+    # A CSS animation fades the overlay out after MIN_DISPLAY_TIME, so the login form
+    # is rendered underneath in this same run: no server-side sleep, no rerun loop.
     MIN_DISPLAY_TIME = 4.0
-    if "video_start_time" not in st.session_state:
-        st.session_state["video_start_time"] = time.time()
+    st.markdown(f"""
+        <style>
+        #intro-video-overlay {{
+            position: fixed; inset: 0; z-index: 9999;
+            display: flex; align-items: center; justify-content: center;
+            background-color: #000000;
+            animation: introVideoOut 1s ease {MIN_DISPLAY_TIME}s forwards;
+        }}
+        #intro-video-overlay video {{ width: 100vw; height: 100vh; object-fit: cover; }}
+        #intro-video-overlay .intro-progress {{
+            position: absolute; bottom: 32px; left: 10vw; width: 80vw; height: 4px;
+            background: rgba(255,255,255,0.25);
+        }}
+        #intro-video-overlay .intro-progress span {{
+            display: block; width: 0; height: 100%; background: #ffffff;
+            animation: introProgress {MIN_DISPLAY_TIME}s linear forwards;
+        }}
+        @keyframes introVideoOut {{ to {{ opacity: 0; visibility: hidden; }} }}
+        @keyframes introProgress {{ to {{ width: 100%; }} }}
+        </style>
+        <div id="intro-video-overlay">
+            {video}
+            <div class="intro-progress"><span></span></div>
+        </div>
+    """, unsafe_allow_html=True)
 
-    elapsed_time = time.time() - st.session_state["video_start_time"]
-    
-    if elapsed_time < MIN_DISPLAY_TIME:
-        # Show progress bar and countdown text
-        progress_text = f"Starting app... {int(MIN_DISPLAY_TIME - elapsed_time) + 1}s"
-        st.progress(elapsed_time / MIN_DISPLAY_TIME, text=progress_text)
-        time.sleep(1) 
-        st.rerun() 
-    else:
-        # Auto-transition to login
-        st.session_state["video_played"] = True
-        st.session_state["page"] = "login"
-        st.rerun()
+    view = view_state()
+    view.video_played = True
+    view.page = "login"
+
+def client_address():
+    """The browser's IP address, for per-client rate limits; "unknown" if Streamlit cannot tell."""
+    try:
+        return st.context.ip_address or "unknown"
+    except Exception:
+        return "unknown"
 
 def login_signup():
     """Login and Signup screen, now with Phone/OTP option (Req 3)."""
-    # Run JS to deactivate fullscreen mode CSS
-    st.components.v1.html("<script>setVideoMode(false);</script>", height=0)
-    
     st.markdown("<h1 style='text-align: center;'>Style Teller</h1>", unsafe_allow_html=True)
     
     st.markdown("<div class='st-emotion-cache-6o6vcr'>", unsafe_allow_html=True)
     st.markdown("<h2 style='text-align: center;'>Login or Sign Up</h2>", unsafe_allow_html=True)
 
     # Use a radio button/tabs for authentication method (Req 3)
+    view = view_state()
     auth_method = st.radio("Choose Login Method", ["Email / Password", "Phone / OTP"], index=0, horizontal=True)
 
     if auth_method == "Email / Password":
         
-        if st.session_state["page"] == "login":
+        if view.page == "login":
             email = st.text_input("Email", key="login_email")
             password = st.text_input("Password", type="password", key="login_password")
             
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Login", use_container_width=True, key="email_login_btn"):
-                    if email in st.session_state.USER_DB and st.session_state.USER_DB[email]["password"] == password:
-                        st.session_state["logged_in"] = True
-                        st.session_state["current_user"] = email
-                        st.success("Logged in successfully!")
-                        
-                        # Check onboarding status
-                        user_data = st.session_state.USER_DB.get(email, {})
-                        user_details = user_data.get("details")
-                        if not user_details:
-                            st.session_state["page"] = "user_details"
-                        elif "styles" not in user_details or not user_details["styles"]:
-                            st.session_state["page"] = "choose_style"
-                        elif not user_details.get("image_uploaded", False):
-                            st.session_state["page"] = "upload_image"
-                        else:
-                            st.session_state["page"] = "home"
-                            st.session_state["show_notification"] = True 
-                        st.rerun()
+                    store = get_user_store()
+                    user_data = store.get(email)
+                    try:
+                        verified = get_password_hasher().verify(password, user_data.password if user_data else None)
+                    except passwords.HasherBusy:
+                        st.error("Too many sign-ins right now. Please try again in a moment.")
                     else:
-                        st.error("Invalid email or password.")
+                        if verified.ok:
+                            # Stored hash was plain or below the configured cost.
+                            if verified.new_hash is not None:
+                                store.set_password(email, verified.new_hash)
+                            st.success("Logged in successfully!")
+                            # Resume onboarding where the user left off
+                            view.log_in(normalize_email(email), user_data.next_page())
+                            rerun()
+                        else:
+                            st.error("Invalid email or password.")
             with col2:
                 if st.button("Sign Up", use_container_width=True, key="email_signup_btn"):
-                    st.session_state["page"] = "signup"
-                    st.rerun()
+                    view.page = "signup"
+                    rerun()
         
-        elif st.session_state["page"] == "signup":
+        elif view.page == "signup":
             with st.form("signup_form"):
                 email = st.text_input("Email", key="signup_email")
                 password = st.text_input("Password", type="password", key="signup_password")
@@ -720,66 +274,84 @@ def login_signup():
                 submitted = st.form_submit_button("Create Account")
 
                 if submitted:
-                    if email in st.session_state.USER_DB:
-                        st.error("Account with this email already exists.")
-                    elif password != confirm_password:
+                    if password != confirm_password:
                         st.error("Passwords do not match.")
+                    # Checked before hashing so a taken email costs no hash.
+                    elif email in get_user_store():
+                        st.error("Account with this email already exists.")
                     else:
-                        st.session_state.USER_DB[email] = {"password": password, "details": None, "styles_chosen": False}
-                        save_user_db()
-                        st.success("Account created successfully! Please log in.")
-                        st.session_state["page"] = "login"
-                        st.rerun()
+                        try:
+                            record = UserRecord(password=get_password_hasher().hash(password))
+                        except passwords.HasherBusy:
+                            st.error("Too many sign-ups right now. Please try again in a moment.")
+                        else:
+                            if not get_user_store().create(email, record):
+                                st.error("Account with this email already exists.")
+                            else:
+                                st.success("Account created successfully! Please log in.")
+                                view.page = "login"
+                                rerun()
         
     elif auth_method == "Phone / OTP":
-        # Mock Phone/OTP Logic (Req 3)
-        MOCK_OTP = "123456" # Hardcoded mock OTP
-
+        otp_service = get_otp_service()
         phone_number = st.text_input("Enter Phone Number (e.g., +1234567890)", key="phone_number_input")
-        
-        if not st.session_state["otp_sent"]:
+
+        if view.otp_phone is None:
             if st.button("Send Verification Code", use_container_width=True, key="send_otp_btn"):
-                if phone_number and len(phone_number) > 5:
-                    st.session_state["mock_phone"] = phone_number
-                    st.session_state["otp_sent"] = True
-                    # IMPORTANT: In a real app, this would be sent via a service (e.g., Twilio)
-                    st.info(f"Mock: Verification code is **{MOCK_OTP}**. Sent to {phone_number}!")
-                    st.rerun()
+                try:
+                    phone = otp.normalize_phone(phone_number)
+                    # Queued for delivery; returns without waiting on the provider.
+                    otp_service.send(phone, client_address())
+                except ValueError as e:
+                    st.error(str(e))
+                except otp.RateLimited as e:
+                    st.error(f"Too many codes requested. Please try again in {e.retry_after:.0f} seconds.")
                 else:
-                    st.error("Please enter a valid phone number.")
-        
-        if st.session_state["otp_sent"]:
+                    view.otp_phone = phone
+                    rerun()
+
+        if view.otp_phone is not None:
+            phone = view.otp_phone
+            if isinstance(otp_service.provider, otp.FakeProvider):
+                # Nothing is really sent without a provider; show what would have been.
+                message = otp_service.provider.latest(phone)
+                if message:
+                    st.info(f"Mock SMS to {phone}: {message}")
             otp_input = st.text_input("Enter 6-digit Code", max_chars=6, key="otp_input")
-            
-            if st.button("Verify & Login", use_container_width=True, key="verify_otp_btn"):
-                if otp_input == MOCK_OTP:
-                    # Treat the phone number as a unique ID for mock persistence
-                    mock_email = f"phone_{st.session_state['mock_phone']}"
-                    
-                    if mock_email not in st.session_state.USER_DB:
-                        # Auto-create mock account for phone user
-                        st.session_state.USER_DB[mock_email] = {"password": None, "details": None, "styles_chosen": False}
-                        save_user_db()
-
-                    st.session_state["logged_in"] = True
-                    st.session_state["current_user"] = mock_email
-                    
-                    # Reset OTP state for next login
-                    st.session_state["otp_sent"] = False
-                    st.session_state["mock_phone"] = None
-                    
-                    st.success("Verification successful! Logging in...")
-                    # Proceed with onboarding/home logic
-                    user_data = st.session_state.USER_DB.get(mock_email, {})
-                    user_details = user_data.get("details")
-                    if not user_details:
-                        st.session_state["page"] = "user_details"
+
+            col1, col2 = st.columns(2)
+            with col1:
+                verify_clicked = st.button("Verify & Login", use_container_width=True, key="verify_otp_btn")
+            with col2:
+                resend_clicked = st.button("Resend Code", use_container_width=True, key="resend_otp_btn")
+
+            if verify_clicked:
+                try:
+                    verified = otp_service.verify(phone, otp_input, client_address())
+                except otp.RateLimited as e:
+                    st.error(f"Too many attempts. Please try again in {e.retry_after:.0f} seconds.")
+                else:
+                    if verified:
+                        # Treat the phone number as a unique ID for persistence
+                        phone_email = f"phone_{phone}"
+
+                        # Auto-create an account for the phone user (no-op if it already exists)
+                        get_user_store().create(phone_email, UserRecord())
+
+                        st.success("Verification successful! Logging in...")
+                        # Proceed with onboarding/home logic; clears the pending code
+                        view.log_in(phone_email, get_user_store().get(phone_email).next_page())
+                        rerun()
                     else:
-                        st.session_state["page"] = "home"
-                    st.rerun()
+                        st.error("Invalid or expired verification code. Please try again.")
 
+            if resend_clicked:
+                try:
+                    otp_service.send(phone, client_address())
+                except otp.RateLimited as e:
+                    st.error(f"Too many codes requested. Please try again in {e.retry_after:.0f} seconds.")
                 else:
-                    st.error("Invalid verification code. Please try again.")
+                    rerun()
 
 
     st.markdown("</div>", unsafe_allow_html=True)
@@ -792,16 +364,15 @@ def user_details_screen():
         gender = st.selectbox("Gender", ["Male", "Female", "Non-binary", "Prefer not to say"])
         submitted = st.form_submit_button("Continue")
         if submitted:
-            st.session_state.USER_DB[st.session_state["current_user"]]["details"] = {
-                "name": name,
-                "age": age,
-                "gender": gender,
-                "styles": []
-            }
-            save_user_db()
-            st.session_state["details_provided"] = True
-            st.session_state["page"] = "choose_style"
-            st.rerun()
+            get_user_store().update_details(
+                view_state().user_id,
+                name=name,
+                age=age,
+                gender=gender,
+                styles=[]
+            )
+            view_state().page = "choose_style"
+            rerun_region()
 
 def choose_style_screen():
     st.title("Choose Your Style")
@@ -817,17 +388,9 @@ def choose_style_screen():
     
     if st.button("Save & Continue"):
         if len(selected_styles) >= 3:
-            # Handle cases where "details" might be None (e.g., if a user skips steps, though unlikely with current flow)
-            user_data = st.session_state.USER_DB[st.session_state["current_user"]]
-            if user_data["details"] is None:
-                 user_data["details"] = {"styles": selected_styles}
-            else:
-                 user_data["details"]["styles"] = selected_styles
-                 
-            save_user_db()
-            st.session_state["styles_chosen"] = True
-            st.session_state["page"] = "upload_image"
-            st.rerun()
+            get_user_store().update_details(view_state().user_id, styles=selected_styles)
+            view_state().page = "upload_image"
+            rerun_region()
         else:
             st.error("Please select at least 3 styles.")
             
@@ -837,28 +400,49 @@ def upload_image_screen():
     uploaded_file = st.file_uploader("Upload an image of yourself", type=["jpg", "jpeg", "png"])
     
     if uploaded_file:
-        st.image(uploaded_file, caption="Uploaded Image", use_column_width=True)
-        # Update user details
-        user_data = st.session_state.USER_DB[st.session_state["current_user"]]
-        if user_data["details"] is None:
-             user_data["details"] = {"image_uploaded": True}
-        else:
-             user_data["details"]["image_uploaded"] = True
+        view = view_state()
+        user_id = view.user_id
+        store = get_user_store()
+
+        def on_processed(image):
+            # Update user details once the photo has been decoded and stored
+            store.update_details(user_id, image_uploaded=True, image_id=image.digest)
+
+        # Decoding, thumbnails and the color palette run in the worker pool; this run only queues the job.
+        try:
+            job_id = get_worker_pool().submit("palette:ingest_image", uploaded_file.getvalue(), user_id, on_done=on_processed)
+        except workers.QueueFull:
+            st.warning("We're processing a lot of photos right now. Please try again in a moment.")
+            return
 
-        st.session_state["image_uploaded"] = True
-        save_user_db()
+        view.image_job = job_id
         st.success("Image uploaded successfully!")
-        st.session_state["page"] = "all_set"
-        st.rerun()
+        view.page = "all_set"
+        rerun_region()
 
 def all_set_screen():
     st.title("You Are All Set!")
     st.markdown("<p style='text-align: center;'>Your profile is complete. You can now explore your personalized style journey.</p>", unsafe_allow_html=True)
+
+    # Report on the photo job without waiting for it; the next rerun shows fresh status.
+    view = view_state()
+    job_id = view.image_job
+    status = get_worker_pool().status(job_id) if job_id else None
+    if status is not None and status.state in (workers.QUEUED, workers.RUNNING):
+        st.info("We're still processing your photo in the background. You can start exploring meanwhile.")
+    elif status is not None and status.state in (workers.FAILED, workers.CANCELLED):
+        # ImageRejected messages are written for users; anything else is not.
+        import imaging
+        message = str(status.error) if isinstance(status.error, imaging.ImageRejected) else "Something went wrong while processing your photo."
+        st.error(message)
+        if st.button("Upload another photo"):
+            view.page = "upload_image"
+            rerun_region()
+
     if st.button("Start Exploring"):
-        st.session_state["onboarding_complete"] = True
-        st.session_state["page"] = "home"
-        st.session_state["show_notification"] = True 
-        st.rerun()
+        view.page = "home"
+        view.show_notification = True
+        rerun_region()
 
 def header():
     """Generates the header with navigation options and user info."""
@@ -871,37 +455,35 @@ def header():
         unsafe_allow_html=True
     )
     
-    st.sidebar.button("Home", on_click=lambda: st.session_state.update(page="home"))
-    st.sidebar.button("Own Wardrobe", on_click=lambda: st.session_state.update(page="wardrobe"))
-    st.sidebar.button("Account", on_click=lambda: st.session_state.update(page="profile"))
-    st.sidebar.button("Help", on_click=lambda: st.session_state.update(page="help"))
+    st.sidebar.button("Home", on_click=go_to, args=("home",))
+    st.sidebar.button("Own Wardrobe", on_click=go_to, args=("wardrobe",))
+    st.sidebar.button("Account", on_click=go_to, args=("profile",))
+    st.sidebar.button("Help", on_click=go_to, args=("help",))
     st.sidebar.button("Sign Out", on_click=sign_out)
 
 def home_screen():
     st.title("Home")
     
-    if st.session_state.get("show_notification", False):
+    view = view_state()
+    if view.show_notification:
         st.info("Style Teller notification: Your new style recommendations are ready!")
-        st.session_state["show_notification"] = False
+        view.show_notification = False
 
-    user_id = st.session_state["current_user"]
-    user_details = st.session_state.USER_DB[user_id].get("details", {})
+    user_id = view.user_id
+    user_details = get_user_store().get(user_id).details
     
-    st.markdown(f"Welcome, **{user_details.get('name', 'Style Enthusiast')}**!")
+    st.markdown(f"Welcome, **{user_details.name or 'Style Enthusiast'}**!")
 
     st.header("Featured Styles")
     
-    if "styles" in user_details and user_details["styles"]:
+    if user_details.styles:
         # Only show a maximum of 4 styles in the header for clean layout
-        styles_to_show = user_details["styles"][:4] 
+        styles_to_show = user_details.styles[:4] 
         style_buttons_container = st.container()
         cols = style_buttons_container.columns(len(styles_to_show))
         for i, style in enumerate(styles_to_show):
             with cols[i]:
-                if st.button(style, key=f"style_btn_{i}"):
-                    st.session_state["selected_style"] = style
-                    st.session_state["page"] = "style_outfits"
-                    st.rerun()
+                st.button(style, key=f"style_btn_{i}", on_click=show_style, args=(style,))
     else:
         st.info("You haven't chosen any styles yet. Go to your profile to select some!")
 
@@ -909,79 +491,34 @@ def home_screen():
     st.button("Start Now", help="Click to create a custom outfit")
 
 
-def wardrobe_app():
-    st.title("Own Wardrobe")
-    st.info("Manage your own wardrobe here. This feature is coming soon!")
-
-def show_avatar_outfits():
-    st.title("Style Recommendations")
-    
-    selected_style = st.session_state.get("selected_style", "Formal")
-    st.header(f"Outfits for the '{selected_style}' Style")
-
-    # Placeholder outfit generation
-    outfit_images = {
-        "Formal": [
-            "https://placehold.co/300x400/007bff/ffffff?text=Formal+Outfit+1",
-            "https://placehold.co/300x400/1e3b68/ffffff?text=Formal+Outfit+2",
-            "https://placehold.co/300x400/36454F/ffffff?text=Formal+Outfit+3"
-        ],
-        "Old money": [
-            "https://placehold.co/300x400/8B4513/ffffff?text=Old+Money+Outfit+1",
-            "https://placehold.co/300x400/c0c0c0/000000?text=Old+Money+Outfit+2",
-            "https://placehold.co/300x400/556B2F/ffffff?text=Old+Money+Outfit+3"
-        ],
-        "Casual": [
-            "https://placehold.co/300x400/FF5733/ffffff?text=Casual+Outfit+1",
-            "https://placehold.co/300x400/87CEEB/ffffff?text=Casual+Outfit+2",
-            "https://placehold.co/300x400/32CD32/ffffff?text=Casual+Outfit+3"
-        ],
-        "Streetwear": [
-            "https://placehold.co/300x400/1e1e1e/ffffff?text=Streetwear+1",
-            "https://placehold.co/300x400/4B0082/ffffff?text=Streetwear+2",
-            "https://placehold.co/300x400/FFD700/000000?text=Streetwear+3"
-        ]
-    }
-    
-    st.markdown("<div class='outfit-container'>", unsafe_allow_html=True)
-    # Use selected style or fallback to Formal
-    style_images = outfit_images.get(selected_style) or outfit_images["Formal"]
-    
-    for i in range(min(3, len(style_images))): # Ensure we don't exceed the image count
-        image_url = style_images[i]
-        st.markdown(f"""
-            <div class='outfit-card'>
-                <img src="{image_url}" alt="{selected_style} Outfit {i+1}" />
-                <p>Outfit {i+1}</p>
-            </div>
-        """, unsafe_allow_html=True)
-    st.markdown("</div>", unsafe_allow_html=True)
-    
-    st.button("Back to Home", on_click=lambda: st.session_state.update(page="home"))
+def show_style(style):
+    """on_click callback of the Featured Styles buttons."""
+    view_state().selected_style = style
+    go_to("style_outfits")
 
 
 def profile_screen():
     st.title("My Account")
-    user_id = st.session_state["current_user"]
-    user_details = st.session_state.USER_DB[user_id].get("details", {})
+    user_id = view_state().user_id
+    user_details = get_user_store().get(user_id).details
     
-    if user_details:
+    if user_details.provided:
         st.header("Profile Details")
-        st.write(f"**Name:** {user_details.get('name', 'N/A')}")
-        st.write(f"**Age:** {user_details.get('age', 'N/A')}")
-        st.write(f"**Gender:** {user_details.get('gender', 'N/A')}")
-        st.write(f"**Selected Styles:** {', '.join(user_details.get('styles', []))}")
+        st.write(f"**Name:** {user_details.name or 'N/A'}")
+        st.write(f"**Age:** {user_details.age}")
+        st.write(f"**Gender:** {user_details.gender or 'N/A'}")
+        st.write(f"**Selected Styles:** {', '.join(user_details.styles)}")
 
         if st.button("Edit Profile"):
-            st.session_state["page"] = "edit_profile"
-            st.rerun()
+            view_state().page = "edit_profile"
+            rerun_region()
     else:
         st.info("No profile details found. Please complete the onboarding process.")
 
 def edit_profile_screen():
     st.title("Edit Profile")
-    user_id = st.session_state["current_user"]
-    user_details = st.session_state.USER_DB[user_id].get("details", {})
+    user_id = view_state().user_id
+    user_details = get_user_store().get(user_id).details
     
     # Updated styles list (Req 4: Removed Boho, Vintage, Preppy, Gothic, Punk)
     available_styles = [
@@ -990,38 +527,51 @@ def edit_profile_screen():
     ]
     
     with st.form("edit_profile_form"):
-        new_name = st.text_input("Name", value=user_details.get("name", ""))
-        new_age = st.number_input("Age", min_value=1, max_value=150, value=user_details.get("age", 30))
+        new_name = st.text_input("Name", value=user_details.name)
+        new_age = st.number_input("Age", min_value=1, max_value=150, value=user_details.age or 30)
         gender_options = ["Male", "Female", "Non-binary", "Prefer not to say"]
-        current_gender_index = gender_options.index(user_details.get("gender", "Prefer not to say")) if user_details.get("gender") in gender_options else 3
+        current_gender_index = gender_options.index(user_details.gender) if user_details.gender in gender_options else 3
         new_gender = st.selectbox("Gender", gender_options, index=current_gender_index)
         
-        new_styles = st.multiselect("Select your styles", available_styles, default=user_details.get("styles", []))
+        new_styles = st.multiselect("Select your styles", available_styles, default=list(user_details.styles))
         submitted = st.form_submit_button("Save Changes")
         
         if submitted:
-            # Ensure "details" dictionary exists if it was implicitly created (e.g., phone login)
-            if st.session_state.USER_DB[user_id]["details"] is None:
-                st.session_state.USER_DB[user_id]["details"] = {}
-                
-            st.session_state.USER_DB[user_id]["details"].update({
-                "name": new_name,
-                "age": new_age,
-                "gender": new_gender,
-                "styles": new_styles
-            })
-            save_user_db()
+            get_user_store().update_details(
+                user_id,
+                name=new_name,
+                age=new_age,
+                gender=new_gender,
+                styles=new_styles
+            )
             st.success("Profile updated successfully!")
-            st.session_state["page"] = "profile"
-            st.rerun()
+            view_state().page = "profile"
+            rerun_region()
 
 def help_screen():
     st.title("Help")
     st.info("For any assistance, please contact support@styleteller.com.")
 
+def welcome_banner():
+    """Landing content shown under the login form."""
+    st.markdown("### Welcome to **Style Teller**")
+    st.markdown("""
+        <div style='text-align:center; padding: 30px; color:white;'>
+            <h2>Discover Your Style with AI</h2>
+            <p>Upload your image and let Style Teller suggest fashion recommendations tailored to you.</p>
+        </div>
+    """, unsafe_allow_html=True)
+
+def credits():
+    st.markdown("""
+        <div style='text-align:center; color: gray; margin-top: 50px;'>
+            Created by sujal8454
+        </div>
+    """, unsafe_allow_html=True)
+
 def sign_out():
     st.session_state.clear()
-    st.rerun()
+    rerun()
 
 def footer():
     st.sidebar.markdown(
@@ -1034,112 +584,98 @@ def footer():
 
 # --- Main App Logic ---
 
+# --- Page Routing ---
+# Page name -> handler for every page behind the login. Only the active page's handler
+# runs on a rerun. Handlers given as "module:function" live in their own module and
+# are imported the first time someone opens that page.
+PAGES = {
+    "user_details": user_details_screen,
+    "choose_style": choose_style_screen,
+    "upload_image": upload_image_screen,
+    "all_set": all_set_screen,
+    "home": home_screen,
+    "wardrobe": "wardrobe:wardrobe_app",
+    "style_outfits": "outfits:show_avatar_outfits",
+    "profile": profile_screen,
+    "edit_profile": edit_profile_screen,
+    "help": help_screen,
+}
+
+def page_handler(page):
+    """Returns the handler for a page name, importing it on first use, or None."""
+    handler = PAGES.get(page)
+    if isinstance(handler, str):
+        module_name, function_name = handler.split(":")
+        handler = getattr(importlib.import_module(module_name), function_name)
+    return handler
+
+@st.fragment(key=PAGE_REGION)
+def page_region():
+    """The active page. Clicks on its widgets, and session.go_to(), rerun only this region."""
+    track_run(get_session_tracker(), fragment=True)
+    page = view_state().page
+    handler = page_handler(page)
+    if handler is not None:
+        with instrumentation.page_timer(page):
+            handler()
+
 def main():
-    if "logged_in" not in st.session_state:
-        st.session_state["logged_in"] = False
-    if "page" not in st.session_state:
-        st.session_state["page"] = "intro_video"
-    if "video_played" not in st.session_state:
-        st.session_state["video_played"] = False
-    if "USER_DB" not in st.session_state:
-        st.session_state.USER_DB = load_user_db()
-        
-    # NEW state variables for OTP logic (Req 3)
-    if "otp_sent" not in st.session_state:
-        st.session_state["otp_sent"] = False
-    if "mock_phone" not in st.session_state:
-        st.session_state["mock_phone"] = None
+    # The session's only state besides widget values (see session.py).
+    view = view_state()
+    track_run(get_session_tracker())
+    instrumentation.start_file_export()
 
     set_styles()
 
-    if not st.session_state.get("video_played"):
-        # Req 1: Auto-play fullscreen video and auto-transition
-        intro_video()
-        return
+    # Intro overlays render once per session and time themselves out in the browser.
+    try:
+        show_intro_overlay()
+        show_intro_once()
+    except Exception:
+        pass
+    show_logo()
 
-    if not st.session_state["logged_in"]:
-        login_signup()
+    if not view.video_played:
+        if intro_skipped():
+            view.video_played = True
+            view.page = "login"
+        else:
+            # Req 1: Auto-play fullscreen video; it times out on the client over the login form
+            with instrumentation.page_timer("intro_video"):
+                intro_video()
+
+    if not view.logged_in:
+        with instrumentation.page_timer("login"):
+            login_signup()
+        welcome_banner()
+        credits()
         return
 
     # User is logged in, display the rest of the app with sidebar
     header()
 
     # Onboarding flow and page routing
-    if st.session_state["page"] == "user_details":
-        user_details_screen()
-    elif st.session_state["page"] == "choose_style":
-        choose_style_screen()
-    elif st.session_state["page"] == "upload_image":
-        upload_image_screen()
-    elif st.session_state["page"] == "all_set":
-        all_set_screen()
-    elif st.session_state["page"] == "home":
-        home_screen()
-    elif st.session_state["page"] == "wardrobe":
-        wardrobe_app()
-    elif st.session_state["page"] == "style_outfits":
-        show_avatar_outfits()
-    elif st.session_state["page"] == "profile":
-        profile_screen()
-    elif st.session_state["page"] == "edit_profile":
-        edit_profile_screen()
-    elif st.session_state["page"] == "help":
-        help_screen()
-        
-    footer()
+    page_region()
 
-if __name__ == "__main__":
-    main()
-
-
-# --- MERGED STYLE TELLER UI UPDATE ---
-import streamlit as st
-from streamlit.components.v1 import html
-
-# --- Page config ---
-st.set_page_config(page_title="Style Teller", page_icon="👗", layout="wide")
-
-# --- Inject custom CSS for centering logo and fixing layout ---
-st.markdown("""
-    <style>
-    /* ... existing styles like body, stAppViewContainer, etc. ... */
-    
-    /* --- CRITICAL FIX: Force-hide the persistent intro overlay across all pages --- */
-    #intro-overlay {
-        display: none !important; 
-    }
-    
-    /* ... existing styles like .logo-container, etc. ... */
-    </style>
-""", unsafe_allow_html=True)
-
-# --- Logo Display (Top Center, visible on all screens) ---
-st.markdown(
-   '<div class="logo-container"><img src="https://i.ibb.co/3YMDZQVn/logo.png" alt="Style Teller Logo"></div>',
-    unsafe_allow_html=True
-)
+    footer()
+    credits()
 
-# --- MAIN CONTENT ---
-st.markdown("### Welcome to **Style Teller**")
+def cli(argv=None):
+    """Administration commands: `python styleteller.py <command> ...` outside Streamlit."""
+    import argparse
 
-try:
-    # --- Example video section ---
-    st.video("intro.mp4")
+    import user_import
 
-    # --- Example content or app logic ---
-    st.markdown("""
-        <div style='text-align:center; padding: 30px; color:white;'>
-            <h2>Discover Your Style with AI</h2>
-            <p>Upload your image and let Style Teller suggest fashion recommendations tailored to you.</p>
-        </div>
-    """, unsafe_allow_html=True)
+    parser = argparse.ArgumentParser(prog="styleteller.py", description="Style Teller administration.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    user_import.add_arguments(commands.add_parser("import-users", help="import users from a CSV or JSON Lines file"))
+    args = parser.parse_args(argv)
+    args.run(args)
 
-except Exception as e:
-    st.error(f"An error occurred while loading content: {e}")
+if __name__ == "__main__":
+    from streamlit import runtime
 
-# --- Footer ---
-st.markdown("""
-    <div style='text-align:center; color: gray; margin-top: 50px;'>
-        Created by sujal8454
-    </div>
-""", unsafe_allow_html=True)
+    if runtime.exists():
+        main()
+    else:
+        cli()
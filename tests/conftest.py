@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules sit at the repository root rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stubs  # noqa: E402
+
+
+class FakeClock:
+    """A clock the test moves by hand; call it for the current time."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def openai_stub(monkeypatch):
+    """The OpenAI stub on a background thread, with OPENAI_BASE_URL pointing at it."""
+    server = stubs.start_stub("openai", latency=0.3)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{server.url}/v1")
+    yield server
+    server.shutdown()
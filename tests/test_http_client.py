@@ -0,0 +1,44 @@
+import pytest
+
+import http_client
+import stubs
+
+
+@pytest.fixture
+def http_stub():
+    server = stubs.start_stub("http")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def metrics():
+    return http_client.HTTPMetrics()
+
+
+def test_retries_until_the_server_recovers(http_stub, metrics):
+    session = http_client.PooledSession(retries=3, metrics=metrics)
+    response = session.get(f"{http_stub.url}/flaky?fail=2&size=10")
+    assert response.status_code == 200
+    assert response.content == b"x" * 10
+    assert http_stub.path_hits["/flaky?fail=2&size=10"] == 3
+    host = http_stub.url.split("//")[1]
+    assert metrics.snapshot()[host]["retries"] == 2
+    assert metrics.snapshot()[host]["errors"] == 0
+
+
+def test_gives_up_after_retries_and_returns_the_last_response(http_stub, metrics):
+    session = http_client.PooledSession(retries=1, metrics=metrics)
+    response = session.get(f"{http_stub.url}/down?fail=5")
+    assert response.status_code == 503
+    assert http_stub.path_hits["/down?fail=5"] == 2
+    host = http_stub.url.split("//")[1]
+    assert metrics.snapshot()[host]["errors"] == 1
+
+
+def test_reuses_one_connection_for_sequential_requests(http_stub, metrics):
+    session = http_client.PooledSession(metrics=metrics)
+    for i in range(5):
+        assert session.get(f"{http_stub.url}/item/{i}").status_code == 200
+    assert http_stub.requests == 5
+    assert session.connections_opened() == 1
@@ -0,0 +1,49 @@
+import io
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+import imaging
+
+
+def shirt(color, quality=90):
+    """A 600x800 "photo" of a fixed pattern of shades of ``color``."""
+    shade = np.random.default_rng(7).uniform(0.3, 1.0, (8, 6, 1)).repeat(100, axis=0).repeat(100, axis=1)
+    buf = io.BytesIO()
+    Image.fromarray((shade * np.array(color)).astype(np.uint8)).save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def copy_of(image, media_dir):
+    with open(imaging.media_path(image.digest, "manifest.json", media_dir)) as f:
+        return json.load(f).get("copy_of")
+
+
+def test_recompressed_copy_is_stored_under_its_own_digest(tmp_path):
+    media_dir = str(tmp_path)
+    original = imaging.ingest_image(shirt((200, 40, 40)), media_dir, "a@example.com")
+    copy = imaging.ingest_image(shirt((200, 40, 40), quality=70), media_dir, "a@example.com")
+    assert copy.digest != original.digest
+    assert copy.files == original.files
+    assert imaging.load_manifest(copy.digest, media_dir) == copy
+    assert copy_of(copy, media_dir) == original.digest
+    assert all(os.path.exists(imaging.media_path(copy.digest, name, media_dir)) for name in copy.files.values())
+
+
+def test_same_shape_in_another_color_is_not_a_copy(tmp_path):
+    media_dir = str(tmp_path)
+    red = imaging.ingest_image(shirt((200, 40, 40)), media_dir, "a@example.com")
+    blue = imaging.ingest_image(shirt((40, 40, 200)), media_dir, "a@example.com")
+    assert copy_of(red, media_dir) is None
+    assert copy_of(blue, media_dir) is None
+
+
+def test_copies_are_only_matched_within_one_users_photos(tmp_path):
+    media_dir = str(tmp_path)
+    original = imaging.ingest_image(shirt((200, 40, 40)), media_dir, "a@example.com")
+    other = imaging.ingest_image(shirt((200, 40, 40), quality=70), media_dir, "b@example.com")
+    mine = imaging.ingest_image(shirt((200, 40, 40), quality=60), media_dir, "a@example.com")
+    assert copy_of(other, media_dir) is None
+    assert copy_of(mine, media_dir) == original.digest
@@ -0,0 +1,133 @@
+import re
+
+import pytest
+
+import otp
+
+
+@pytest.fixture
+def service(clock):
+    return otp.OTPService(otp.FakeProvider(), ttl=300, clock=clock)
+
+
+def sent_code(service, phone):
+    service.deliveries.join()
+    return re.search(r"code is (\d+)", service.provider.latest(phone)).group(1)
+
+
+def test_rate_limiter_refills_at_its_rate(clock):
+    limiter = otp.RateLimiter(rate=1 / 10, burst=2)
+    for _ in range(2):
+        assert limiter.wait("key", clock()) == 0.0
+        limiter.take("key", clock())
+    assert limiter.wait("key", clock()) == pytest.approx(10.0)
+    clock.advance(4)
+    assert limiter.wait("key", clock()) == pytest.approx(6.0)
+    clock.advance(6)
+    assert limiter.wait("key", clock()) == 0.0
+
+
+def test_rate_limiter_forgets_least_recently_used_keys(clock):
+    limiter = otp.RateLimiter(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.take(key, clock())
+    assert len(limiter) == 2
+    # "a" was forgotten, so it is back to a full bucket.
+    assert limiter.wait("a", clock()) == 0.0
+    assert limiter.wait("c", clock()) > 0
+
+
+def test_sends_are_limited_per_phone(service, clock):
+    rate, burst = otp.SEND_PER_PHONE
+    for i in range(burst):
+        service.send("+15550100", client=f"10.0.0.{i}")
+    with pytest.raises(otp.RateLimited) as refused:
+        service.send("+15550100", client="10.0.0.99")
+    assert refused.value.retry_after == pytest.approx(1 / rate)
+    service.send("+15550101", client="10.0.0.99")
+    clock.advance(1 / rate)
+    service.send("+15550100", client="10.0.0.99")
+
+
+def test_sends_are_limited_per_client_address(service):
+    _, burst = otp.SEND_PER_CLIENT
+    for i in range(burst):
+        service.send(f"+1555010{i:02d}", client="10.0.0.1")
+    with pytest.raises(otp.RateLimited):
+        service.send("+15559999", client="10.0.0.1")
+    service.send("+15559999", client="10.0.0.2")
+
+
+def test_refused_send_takes_no_tokens(service):
+    _, burst = otp.SEND_PER_PHONE
+    for _ in range(burst):
+        service.send("+15550100", client="10.0.0.1")
+    for _ in range(5):
+        with pytest.raises(otp.RateLimited):
+            service.send("+15550100", client="10.0.0.1")
+    # Refusals did not use the client's tokens: it can still send to other phones.
+    _, client_burst = otp.SEND_PER_CLIENT
+    for i in range(client_burst - burst):
+        service.send(f"+1555020{i:02d}", client="10.0.0.1")
+
+
+def test_verifications_are_limited_per_client_address(service):
+    _, burst = otp.VERIFY_PER_CLIENT
+    service.send("+15550100", client="10.0.0.1")
+    for _ in range(burst):
+        service.verify("+15550199", "000000", client="10.0.0.1")
+    with pytest.raises(otp.RateLimited):
+        service.verify("+15550100", sent_code(service, "+15550100"), client="10.0.0.1")
+    assert service.verify("+15550100", sent_code(service, "+15550100"), client="10.0.0.2")
+
+
+def test_code_works_once(service):
+    service.send("+15550100")
+    code = sent_code(service, "+15550100")
+    assert service.verify("+15550100", code)
+    assert not service.verify("+15550100", code)
+
+
+def test_code_expires_after_ttl(service, clock):
+    service.send("+15550100")
+    code = sent_code(service, "+15550100")
+    clock.advance(300)
+    assert not service.verify("+15550100", code)
+    assert len(service.tokens) == 0
+
+
+def test_wrong_guesses_use_up_the_code(service):
+    service.send("+15550100")
+    code = sent_code(service, "+15550100")
+    wrong = f"{(int(code) + 1) % 10 ** otp.CODE_DIGITS:0{otp.CODE_DIGITS}d}"
+    for i in range(otp.MAX_ATTEMPTS):
+        assert not service.verify("+15550100", wrong, client=f"10.0.0.{i}")
+    assert not service.verify("+15550100", code)
+
+
+def test_token_store_keeps_a_resent_code_past_the_old_expiry(clock):
+    tokens = otp.TokenStore(ttl=300)
+    tokens.put("+15550100", "111111", clock())
+    clock.advance(100)
+    tokens.put("+15550100", "222222", clock())
+    # The first code's heap entry comes due here; the second code must survive it.
+    clock.advance(200)
+    tokens.evict(clock())
+    assert len(tokens) == 1
+    assert not tokens.check("+15550100", "111111", clock())
+    assert tokens.check("+15550100", "222222", clock())
+
+
+def test_token_store_drops_the_code_closest_to_expiring_when_full(clock):
+    tokens = otp.TokenStore(ttl=300, max_tokens=2)
+    for phone in ("+15550100", "+15550101", "+15550102"):
+        tokens.put(phone, "123456", clock())
+        clock.advance(1)
+    assert len(tokens) == 2
+    assert not tokens.check("+15550100", "123456", clock())
+    assert tokens.check("+15550102", "123456", clock())
+
+
+def test_provider_must_implement_send():
+    with pytest.raises(TypeError):
+        otp.Provider()
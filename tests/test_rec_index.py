@@ -0,0 +1,99 @@
+import numpy as np
+
+import catalog
+import rec_index
+
+COLORS = ("navy", "red")
+
+
+def test_color_reranked_lookup_matches_a_full_ranking():
+    items = catalog.random_catalog(5000)
+    keys = rec_index.SEGMENTS[:200]
+    index = rec_index.RecIndex.build(items, keys)
+    exact = 0
+    for style, others, season, bracket in keys:
+        styles = others.split(",") if others else ()
+        ids = index.lookup(style, styles, season, bracket, 10, COLORS, items)
+        if ids is None:
+            # The kept ranks could not guarantee the top 10; the caller ranks live.
+            continue
+        profile = catalog.segment_profile(style, styles, season, bracket) + catalog.color_weights(COLORS)
+        assert list(ids) == list(items.ids[catalog.top_k(items.score(profile), 10)])
+        exact += 1
+    assert exact > 0
+
+
+def test_lookup_without_colors_reads_the_row():
+    items = catalog.default_catalog()
+    index = rec_index.RecIndex.build(items)
+    profile = catalog.segment_profile("Casual", ("Formal",), "winter", "25-34")
+    ids = index.lookup("casual", ("formal", "casual"), "winter", "25-34", 3)
+    assert list(ids) == list(items.ids[catalog.top_k(items.score(profile), 3)])
+    assert index.lookup("Ballet", (), "winter", "25-34", 3) is None
+
+
+def random_items(n, start=1, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        catalog.CatalogItem(
+            item_id, f"Item {item_id}", "", "",
+            tuple(rng.choice(catalog.STYLES, rng.integers(1, 3), replace=False)),
+            tuple(rng.choice(catalog.COLORS, rng.integers(1, 4), replace=False)),
+            round(float(rng.random()), 2),
+            tuple(rng.choice(catalog.SEASONS, rng.integers(1, 5), replace=False)),
+        )
+        for item_id in range(start, start + n)
+    ]
+
+
+def change_catalog(items, added, removed):
+    for item in added:
+        items.add(item)
+    for item_id in removed:
+        items.remove(item_id)
+
+
+def assert_served_rows_match_a_build(index, items, keys):
+    """Served ranks match a fresh build, up to the order of scores tied within float32 rounding."""
+    built = rec_index.RecIndex.build(items, keys)
+    served = slice(0, rec_index.SERVED)
+    ids, scores = np.asarray(index.ids)[:, served], np.asarray(index.scores)[:, served]
+    assert np.allclose(scores, built.scores[:, served], atol=1e-5)
+    for row, built_ids in enumerate(built.ids[:, served]):
+        # Anything clearly above the row's last served score must be served.
+        clear = built_ids[built.scores[row, served] > built.scores[row, rec_index.SERVED - 1] + 1e-5]
+        assert set(clear) <= set(ids[row])
+
+
+def test_incremental_updates_match_a_build():
+    keys = rec_index.SEGMENTS[::97]
+    items = catalog.Catalog(random_items(300))
+    index = rec_index.RecIndex.build(items, keys)
+    items.listeners.append(index)
+    rng = np.random.default_rng(1)
+    removed = rng.choice(items.ids, 200, replace=False)
+    change_catalog(items, random_items(60, start=1000, seed=2), removed)
+    assert_served_rows_match_a_build(index, items, keys)
+
+
+def test_rows_holding_the_whole_catalog_take_new_items():
+    keys = rec_index.SEGMENTS[:50]
+    items = catalog.Catalog(random_items(10))
+    index = rec_index.RecIndex.build(items, keys)
+    items.listeners.append(index)
+    change_catalog(items, random_items(15, start=100, seed=3), [3, 5])
+    assert_served_rows_match_a_build(index, items, keys)
+
+
+def test_updates_are_flushed_to_a_writable_index(tmp_path):
+    path = str(tmp_path / "rec_index")
+    keys = rec_index.SEGMENTS[::211]
+    items = catalog.Catalog(random_items(200))
+    rec_index.RecIndex.build(items, keys, depth=30).save(path, items)
+    index = rec_index.RecIndex.load(path, writable=True)
+    items.listeners.append(index)
+    change_catalog(items, random_items(20, start=500, seed=4), [7, 8, 9])
+    saved = rec_index.RecIndex.load(path)
+    assert saved.depth == 30
+    assert saved.catalog_digest == items.digest()
+    assert_served_rows_match_a_build(saved, items, keys)
@@ -0,0 +1,116 @@
+import threading
+import time
+
+import recommender
+import stubs
+from records import UserDetails
+
+DETAILS = UserDetails(name="Ada", age=30, gender="Female", styles=("Casual", "Formal"))
+
+
+def test_cache_entries_expire_after_ttl(clock):
+    cache = recommender.TTLCache(maxsize=10, ttl=60, clock=clock)
+    cache.put("key", ["outfit"])
+    clock.advance(59)
+    assert cache.get("key") == ["outfit"]
+    clock.advance(1)
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used(clock):
+    cache = recommender.TTLCache(maxsize=2, ttl=60, clock=clock)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_request_key_ignores_case_and_style_order():
+    same = UserDetails(name="Bea", age=31, gender="female", styles=("formal ", "casual"))
+    assert recommender.request_key(DETAILS, "Sporty") == recommender.request_key(same, " sporty")
+
+
+def test_concurrent_identical_requests_share_one_model_call(openai_stub):
+    service = recommender.RecommendationService(recommender.make_client(), cache=recommender.TTLCache())
+    callers = 8
+    start = threading.Barrier(callers)
+    results = [None] * callers
+
+    def ask(i):
+        start.wait()
+        results[i] = service.recommend(DETAILS, "Sporty")
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    assert openai_stub.requests == 1
+    assert service.model_calls == 1
+    assert len(results[0]) == recommender.OUTFIT_COUNT
+    assert all(result == results[0] for result in results)
+    # Answered from the cache from now on.
+    assert service.recommend(DETAILS, "Sporty") == results[0]
+    assert openai_stub.requests == 1
+
+
+def test_different_requests_are_not_coalesced(openai_stub):
+    service = recommender.RecommendationService(recommender.make_client(), cache=recommender.TTLCache())
+    service.recommend(DETAILS, "Sporty")
+    service.recommend(DETAILS, "Formal")
+    assert openai_stub.requests == 2
+
+
+def test_expired_answer_calls_the_model_again(openai_stub, clock):
+    cache = recommender.TTLCache(ttl=60, clock=clock)
+    service = recommender.RecommendationService(recommender.make_client(), cache=cache)
+    service.recommend(DETAILS, "Sporty")
+    clock.advance(61)
+    service.recommend(DETAILS, "Sporty")
+    assert openai_stub.requests == 2
+
+
+def test_streamed_outfits_arrive_one_at_a_time(monkeypatch):
+    server = stubs.start_stub("openai", chunk_delay=0.3)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{server.url}/v1")
+    try:
+        service = recommender.RecommendationService(recommender.make_client(), cache=recommender.TTLCache())
+        started = time.perf_counter()
+        arrivals = [(time.perf_counter() - started, outfit) for outfit in service.stream(DETAILS, "Sporty")]
+    finally:
+        server.shutdown()
+
+    assert [outfit.title for _, outfit in arrivals] == ["Stub Outfit 1", "Stub Outfit 2", "Stub Outfit 3"]
+    times = [seconds for seconds, _ in arrivals]
+    # The stub waits chunk_delay before each line after the first.
+    assert times[1] - times[0] >= 0.25
+    assert times[2] - times[1] >= 0.25
+    assert times[0] < times[2] - 0.5
+
+
+def test_iter_outfits_skips_malformed_and_truncated_lines():
+    chunks = [
+        "```json\n",
+        '{"title": "Linen Set", "color": "#112233"}\n{"title": ',
+        '"Split Across Chunks", "description": "two parts"}\n',
+        "{not json}\n",
+        "[1, 2]\n",
+        "\n",
+        '{"title": "Cut Off", "descr',
+    ]
+    outfits = list(recommender.iter_outfits(iter(chunks)))
+    assert [outfit.title for outfit in outfits] == ["Linen Set", "Split Across Chunks"]
+    assert outfits[1].description == "two parts"
+
+
+def test_iter_outfits_yields_each_line_before_the_stream_ends():
+    chunks = iter(['{"title": "First"}\n', '{"title": "Second"}\n'])
+    outfits = recommender.iter_outfits(chunks)
+    assert next(outfits).title == "First"
+    # Only the first chunk has been read so far.
+    assert next(chunks) == '{"title": "Second"}\n'
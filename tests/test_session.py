@@ -0,0 +1,35 @@
+import session
+
+
+def run(tracker, session_id, state):
+    tracker.resume(state)
+    tracker.touch(session_id, state)
+
+
+def test_idle_session_keeps_only_its_view_state(clock):
+    tracker = session.SessionTracker(idle_timeout=60, clock=clock)
+    state = {"view": session.ViewState(user_id="a@example.com"), "login_email": "a@example.com"}
+    run(tracker, "s1", state)
+    clock.advance(59)
+    run(tracker, "s1", state)
+    assert set(state) == {"view", "login_email"}
+    clock.advance(60)
+    run(tracker, "s1", state)
+    assert set(state) == {"view"}
+    assert state["view"].user_id == "a@example.com"
+    assert tracker.stats().evicted == 1
+
+
+def test_sweep_forgets_idle_sessions_until_they_come_back(clock):
+    tracker = session.SessionTracker(idle_timeout=60, clock=clock)
+    idle = {"view": session.ViewState(), "upload": b"x" * 1000}
+    run(tracker, "idle", idle)
+    clock.advance(30)
+    run(tracker, "active", {"view": session.ViewState()})
+    clock.advance(30)
+    assert tracker.sweep() == 1
+    assert tracker.stats().sessions == 1
+    # The ViewState remembers the last run, so a forgotten session is still cleaned up.
+    run(tracker, "idle", idle)
+    assert set(idle) == {"view"}
+    assert tracker.stats().sessions == 2
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+import user_store
+from records import UserRecord
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = user_store.UserStore(str(tmp_path / "users.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_items_reads_every_user_in_pages(store, monkeypatch):
+    monkeypatch.setattr(user_store, "ITEMS_PAGE", 3)
+    store.put_many((f"user{i:02d}@example.com", UserRecord()) for i in range(10))
+    emails = [email for email, _ in store.items()]
+    assert emails == sorted(emails)
+    assert {f"user{i:02d}@example.com" for i in range(10)} <= set(emails)
+
+
+def test_writers_are_not_blocked_by_a_paused_iteration(store):
+    iteration = store.items()
+    next(iteration)
+    writer = threading.Thread(target=store.create, args=("new@example.com", UserRecord()))
+    writer.start()
+    writer.join(timeout=5)
+    assert not writer.is_alive()
+    assert "new@example.com" in store
+
+
+def test_updating_a_missing_user_raises_key_error(store):
+    with pytest.raises(KeyError):
+        store.update_details("nobody@example.com", name="Nobody")
+    with pytest.raises(KeyError):
+        store.set_password("nobody@example.com", "hash")
+    # The transaction was rolled back, so the store still takes writes.
+    assert store.create("somebody@example.com", UserRecord())
@@ -0,0 +1,38 @@
+from concurrent.futures import Future
+
+import pytest
+
+import workers
+
+
+@pytest.fixture
+def pool():
+    pool = workers.WorkerPool(max_workers=1, max_pending=4)
+    yield pool
+    pool.shutdown()
+
+
+def add_job(pool, future):
+    pool._jobs["job"] = [future, None]
+    return "job"
+
+
+def test_status_of_a_cancelled_job(pool):
+    future = Future()
+    future.cancel()
+    assert pool.status(add_job(pool, future)) == workers.JobStatus(workers.CANCELLED, None, None)
+
+
+def test_status_of_finished_jobs(pool):
+    done, failed = Future(), Future()
+    done.set_result((0.1, "result"))
+    failed.set_exception(ValueError("bad image"))
+    assert pool.status(add_job(pool, done)) == workers.JobStatus(workers.DONE, "result", None)
+    status = pool.status(add_job(pool, failed))
+    assert status.state == workers.FAILED
+    assert str(status.error) == "bad image"
+
+
+def test_status_of_a_queued_job(pool):
+    assert pool.status(add_job(pool, Future())).state == workers.QUEUED
+    assert pool.status("unknown") is None
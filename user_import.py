@@ -0,0 +1,166 @@
+# --- Bulk User Import ---
+# Creates accounts in bulk from a CSV or JSON Lines file, for migrations, instead
+# of one signup and onboarding run per user:
+#
+#   python styleteller.py import-users users.csv
+#
+# CSV files have a header row naming any of the columns email, password, name,
+# age, gender, styles (separated by ";") and image_uploaded; only email is
+# required. JSON Lines files hold one stored record per line plus its email:
+# {"email": ..., "password": ..., "details": {...}, "styles_chosen": ...}.
+# Passwords that are already hashed (passwords.is_hashed) are kept as they are.
+#
+# The file is read lazily in batches of BATCH_SIZE rows. Worker processes validate
+# each batch against the user schema and hash its passwords. At most
+# IN_FLIGHT_PER_WORKER batches per worker are queued, so memory stays flat however
+# large the file is. Each prepared batch is then written in file order in its own
+# short SQLite transaction, so the database write lock is never held while
+# passwords are hashed and signups in the running app are not blocked. An import
+# that stops part way keeps the batches written so far; running it again skips
+# those users (unless --replace). Invalid rows are reported and skipped.
+
+import csv
+import json
+import multiprocessing
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import passwords
+from records import UserRecord
+from user_store import DB_PATH, UserStore
+
+BATCH_SIZE = 1000
+IN_FLIGHT_PER_WORKER = 2
+# Rejected rows printed one by one; past this they are only counted.
+MAX_REPORTED_ERRORS = 20
+
+CSV_TRUE = {"1", "true", "yes", "y"}
+
+ImportResult = namedtuple("ImportResult", "read imported skipped rejected")
+
+
+def file_format(path):
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_rows(path, fmt):
+    """Yields (line number, row) pairs: dicts for CSV, raw lines for JSON Lines."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield number, line
+
+
+def _csv_record(row):
+    age = (row.get("age") or "").strip()
+    if age and not age.isdigit():
+        raise ValueError(f"age: {age!r} is not a whole number")
+    styles = [style.strip() for style in (row.get("styles") or "").split(";") if style.strip()]
+    raw = {
+        "password": row.get("password") or None,
+        "details": {
+            "name": (row.get("name") or "").strip(),
+            "age": int(age) if age else None,
+            "gender": (row.get("gender") or "").strip(),
+            "styles": styles,
+            "image_uploaded": (row.get("image_uploaded") or "").strip().lower() in CSV_TRUE,
+        },
+        "styles_chosen": bool(styles),
+    }
+    return row.get("email"), raw
+
+
+def _jsonl_record(line):
+    raw = json.loads(line)
+    if not isinstance(raw, dict):
+        raise ValueError("record: not a JSON object")
+    return raw.pop("email", None), raw
+
+
+def prepare_batch(fmt, rows, iterations):
+    """[worker] Validates and hashes a batch; returns ([(email, stored JSON)], [(line, error)])."""
+    accepted, rejected = [], []
+    for number, row in rows:
+        try:
+            email, raw = _csv_record(row) if fmt == "csv" else _jsonl_record(row)
+            if not isinstance(email, str) or not email.strip():
+                raise ValueError("email: missing")
+            # Validated once here; swapping in the hash keeps it valid, so to_dict() is skipped.
+            record = UserRecord.from_dict(raw)
+            if record.password is not None and not passwords.is_hashed(record.password):
+                raw["password"] = passwords.hash_password(record.password, iterations)
+            accepted.append((email.strip(), json.dumps(raw)))
+        except ValueError as e:
+            rejected.append((number, str(e)))
+    return accepted, rejected
+
+
+def _batches(rows, size=BATCH_SIZE):
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _prepared(fmt, batches, iterations, workers):
+    """Yields prepare_batch() results in file order with a bounded number of batches queued."""
+    if workers <= 1:
+        for batch in batches:
+            yield prepare_batch(fmt, batch, iterations)
+        return
+    # Spawned like workers.WorkerPool's processes, so nothing is inherited by fork.
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(prepare_batch, fmt, batch, iterations))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_users(path, db_path=DB_PATH, fmt=None, iterations=passwords.ITERATIONS, workers=None, replace=False):
+    """Imports every valid user in ``path``, one transaction per batch; returns an ImportResult."""
+    fmt = fmt or file_format(path)
+    workers = workers or os.cpu_count() or 1
+    read = rejected = imported = 0
+
+    store = UserStore(db_path)
+    try:
+        batches = _batches(read_rows(path, fmt))
+        for accepted, errors in _prepared(fmt, batches, iterations, workers):
+            read += len(accepted) + len(errors)
+            for number, message in errors:
+                rejected += 1
+                if rejected <= MAX_REPORTED_ERRORS:
+                    print(f"Error on line {number}, skipping: {message}")
+            # Already validated and hashed, so the transaction only inserts.
+            imported += store.import_records(accepted, overwrite=replace)
+    finally:
+        store.close()
+    return ImportResult(read, imported, read - rejected - imported, rejected)
+
+
+def add_arguments(parser):
+    parser.add_argument("path", help="CSV or JSON Lines file of users")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="file format (default: from the extension)")
+    parser.add_argument("--db", default=DB_PATH, help="user database to import into")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes validating and hashing")
+    parser.add_argument("--iterations", type=int, default=passwords.ITERATIONS, help="PBKDF2 iterations for plain passwords")
+    parser.add_argument("--replace", action="store_true", help="overwrite users that already exist")
+    parser.set_defaults(run=run)
+
+
+def run(args):
+    started = time.perf_counter()
+    result = import_users(args.path, args.db, args.format, args.iterations, args.workers, args.replace)
+    print(
+        f"Imported {result.imported} of {result.read} users in {time.perf_counter() - started:.1f}s "
+        f"({result.skipped} already existed, {result.rejected} rejected)."
+    )
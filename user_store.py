@@ -0,0 +1,247 @@
+# --- Shared User Store ---
+# A single process-wide owner of the user database. Streamlit sessions no longer
+# keep their own copy of USER_DB; they read and write single records through the
+# store, which serializes writers with its own lock.
+#
+# Records live in a local SQLite file in WAL mode, one row per user, so a write
+# touches only the changed record and commits atomically. The record layout is
+# the one the old user_db.json used: {"password": ..., "details": {...}, ...};
+# records are validated as they go in and out and handed to callers as
+# records.UserRecord.
+#
+# Users are keyed by their normalized email (normalize_email), so "Alice@Example.com "
+# and "alice@example.com" reach the same row through the primary-key index.
+# Databases written before that are rekeyed once when they are opened
+# (PRAGMA user_version tracks it). Seeded and legacy passwords are stored hashed.
+
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import replace
+
+import instrumentation
+import passwords
+from records import RecordInvalid, UserRecord
+
+DB_PATH = "user_db.sqlite3"
+# Pre-SQLite database; imported once the first time the SQLite file is created.
+LEGACY_JSON_PATH = "user_db.json"
+# Bumped with each one-time migration connect() runs.
+SCHEMA_VERSION = 1
+# Rows items() reads per lock hold.
+ITEMS_PAGE = 500
+
+DEFAULT_USERS = {
+    "demo@example.com": {"password": "password123", "details": {"name": "Demo User", "age": 30, "gender": "Male", "styles": ["Formal"], "image_uploaded": True}},
+    "alice@example.com": {"password": "stylequeen", "details": {"name": "Alice", "age": 25, "gender": "Female", "styles": ["Old money", "Casual"], "image_uploaded": True}},
+    "bob@example.com": {"password": "fashionking", "details": {"name": "Bob", "age": 35, "gender": "Male", "styles": ["Streetwear", "Sporty"], "image_uploaded": True}}
+}
+
+
+def connect(path=DB_PATH):
+    """Opens the database in WAL mode and creates the users table if needed."""
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # In WAL mode NORMAL is still atomic and crash-safe for the application.
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("CREATE TABLE IF NOT EXISTS users (email TEXT PRIMARY KEY, record TEXT NOT NULL)")
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        _normalize_emails(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return conn
+
+
+def normalize_email(email):
+    """The key a user is stored under: the email trimmed and lower-cased."""
+    return email.strip().lower()
+
+
+def _normalize_emails(conn):
+    emails = [email for (email,) in conn.execute("SELECT email FROM users")]
+    with Transaction(conn):
+        for email in emails:
+            key = normalize_email(email)
+            if key == email:
+                continue
+            try:
+                conn.execute("UPDATE users SET email = ? WHERE email = ?", (key, email))
+            except sqlite3.IntegrityError:
+                print(f"Error normalizing user {email!r}: {key} already exists, leaving it as is")
+
+
+def _legacy_users():
+    """Yields the valid (email, UserRecord) pairs of an old user_db.json, or the defaults."""
+    users = DEFAULT_USERS
+    if os.path.exists(LEGACY_JSON_PATH):
+        try:
+            with open(LEGACY_JSON_PATH, "r") as f:
+                users = json.load(f)
+        except Exception as e:
+            print(f"Error loading legacy user DB, using default: {e}")
+    for email, raw in users.items():
+        try:
+            record = UserRecord.from_dict(raw)
+        except RecordInvalid as e:
+            print(f"Error importing user {email}, skipping: {e}")
+            continue
+        if record.password is not None and not passwords.is_hashed(record.password):
+            record = replace(record, password=passwords.hash_password(record.password))
+        yield email, record
+
+
+@instrumentation.timed("styleteller_user_store_seconds", op="load_all")
+def load_user_db(path=DB_PATH):
+    """Loads the whole user database as a dict of email -> UserRecord."""
+    store = UserStore(path)
+    try:
+        return dict(store.items())
+    finally:
+        store.close()
+
+
+def save_user_db(users, path=DB_PATH):
+    """Upserts every UserRecord in ``users`` in a single transaction."""
+    store = UserStore(path)
+    try:
+        store.put_many(users.items())
+    finally:
+        store.close()
+
+
+class UserStore:
+    """Thread-safe, process-wide user database shared by every session."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = connect(path)
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is None:
+                self.put_many(_legacy_users())
+
+    def __contains__(self, email):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM users WHERE email = ?", (normalize_email(email),)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def items(self):
+        """Iterates over (email, UserRecord) pairs without loading them all at once.
+
+        Pages of ITEMS_PAGE rows are read under the lock and yielded outside it, so a
+        slow or abandoned iteration does not hold up writers.
+        """
+        after = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT email, record FROM users WHERE email > ? ORDER BY email LIMIT ?", (after, ITEMS_PAGE),
+                ).fetchall()
+            for email, record in rows:
+                yield email, _load(record)
+            if len(rows) < ITEMS_PAGE:
+                return
+            after = rows[-1][0]
+
+    @instrumentation.timed("styleteller_user_store_seconds", op="load")
+    def get(self, email):
+        """Returns one UserRecord, or None."""
+        with self._lock:
+            return self._get(email)
+
+    @instrumentation.timed("styleteller_user_store_seconds", op="save")
+    def create(self, email, record):
+        """Inserts a new UserRecord; returns False if the email is already taken."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO users (email, record) VALUES (?, ?)",
+                (normalize_email(email), _dump(record)),
+            )
+            return cursor.rowcount == 1
+
+    @instrumentation.timed("styleteller_user_store_seconds", op="save_many")
+    def put_many(self, records):
+        """Upserts (email, UserRecord) pairs in a single transaction."""
+        with self._lock, self._transaction():
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO users (email, record) VALUES (?, ?)",
+                ((normalize_email(email), _dump(record)) for email, record in records),
+            )
+
+    def import_records(self, rows, overwrite=False):
+        """Inserts a batch of (email, stored JSON) rows in one transaction; returns how many were written.
+
+        Callers import large files one batch per call, so other writers get in
+        between batches. The rows must already be validated (UserRecord.to_dict()
+        output) and hashed: the write lock is held while they are consumed, so slow
+        work there blocks every other writer. Existing users are kept unless
+        ``overwrite`` is set.
+        """
+        verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+        with self._lock, self._transaction():
+            before = self._conn.total_changes
+            self._conn.executemany(
+                f"{verb} INTO users (email, record) VALUES (?, ?)",
+                ((normalize_email(email), record) for email, record in rows),
+            )
+            return self._conn.total_changes - before
+
+    @instrumentation.timed("styleteller_user_store_seconds", op="save")
+    def update_details(self, email, **fields):
+        """Merges fields (name, age, styles, ...) into an existing record's details; KeyError if there is none."""
+        with self._lock, self._transaction():
+            self._put(email, self._existing(email).with_details(**fields))
+
+    @instrumentation.timed("styleteller_user_store_seconds", op="save")
+    def set_password(self, email, password):
+        """Replaces a user's stored password hash; KeyError if there is no such user."""
+        with self._lock, self._transaction():
+            self._put(email, replace(self._existing(email), password=password))
+
+    def _get(self, email):
+        row = self._conn.execute("SELECT record FROM users WHERE email = ?", (normalize_email(email),)).fetchone()
+        return _load(row[0]) if row is not None else None
+
+    def _existing(self, email):
+        record = self._get(email)
+        if record is None:
+            raise KeyError(email)
+        return record
+
+    def _put(self, email, record):
+        self._conn.execute("UPDATE users SET record = ? WHERE email = ?", (_dump(record), normalize_email(email)))
+
+    def _transaction(self):
+        return Transaction(self._conn)
+
+
+def _load(text):
+    return UserRecord.from_dict(json.loads(text))
+
+
+def _dump(record):
+    # to_dict() validates, so a bad field never reaches the database.
+    text = json.dumps(record.to_dict())
+    # Only writes serialize records, so this counts the record bytes written.
+    instrumentation.count("styleteller_user_store_bytes_written_total", len(text))
+    return text
+
+
+class Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
@@ -0,0 +1,131 @@
+# --- Own Wardrobe Page ---
+# Imported lazily by the page router in styleteller.py the first time a user opens
+# their wardrobe. Uploaded photos are analyzed in the worker pool (garments.py) in
+# batches and stored per user (wardrobe_store.py); the page shows one indexed page
+# of items at a time as a single grid of lazily loaded thumbnails, so a wardrobe
+# of thousands of items renders as fast as one of ten.
+
+import html
+
+import streamlit as st
+
+import catalog
+import garments
+import workers
+from resources import get_wardrobe_store, get_worker_pool
+from session import view_state
+from wardrobe_store import THUMBNAIL_SIZE, thumbnail_url
+
+# Photos per background job; a job takes one slot of the worker pool's queue.
+UPLOAD_BATCH = 8
+ALL = "All"
+
+
+def item_card(item):
+    # Intrinsic size of the 320px thumbnail, so the grid does not shift as images load.
+    scale = min(1.0, THUMBNAIL_SIZE / max(item.width, item.height))
+    tags = " · ".join(item.colors + item.styles)
+    # No blank lines: Markdown would end the grid's HTML block at the first one.
+    return (
+        "<div class='wardrobe-item'>"
+        f"<img src='{html.escape(thumbnail_url(item))}' alt='{html.escape(item.category)}' loading='lazy' decoding='async'"
+        f" width='{round(item.width * scale)}' height='{round(item.height * scale)}' />"
+        f"<p>{html.escape(item.category)}</p>"
+        f"<small>{html.escape(tags)}</small>"
+        "</div>"
+    )
+
+
+def _store_results(store, user, category, results):
+    # Runs in the server process when a batch finishes; rejected photos are reported by the page.
+    for _, result in results:
+        if isinstance(result, garments.Garment):
+            store.add(user, category, result)
+
+
+def add_photos(user, store):
+    with st.form("wardrobe_upload", clear_on_submit=True):
+        photos = st.file_uploader("Add garment photos", type=["jpg", "jpeg", "png"], accept_multiple_files=True)
+        category = st.selectbox("Category", garments.CATEGORIES)
+        submitted = st.form_submit_button("Add to Wardrobe")
+    if not submitted or not photos:
+        return
+
+    jobs = view_state().wardrobe_jobs
+    queued = 0
+    for start in range(0, len(photos), UPLOAD_BATCH):
+        batch = [(photo.name, photo.getvalue()) for photo in photos[start:start + UPLOAD_BATCH]]
+        try:
+            jobs.append(get_worker_pool().submit(
+                "garments:analyze_garments", batch, category, user,
+                on_done=lambda results: _store_results(store, user, category, results),
+            ))
+        except workers.QueueFull:
+            break
+        queued += len(batch)
+    if queued < len(photos):
+        st.warning(f"We're processing a lot of photos right now, so {len(photos) - queued} were not added. Please add them again in a moment.")
+    else:
+        st.success(f"Added {queued} photo(s); they appear below once processed.")
+
+
+def show_job_status():
+    """Reports finished and pending upload batches without waiting for them."""
+    pool = get_worker_pool()
+    view = view_state()
+    pending = []
+    for job_id in view.wardrobe_jobs:
+        status = pool.status(job_id)
+        if status is None:
+            continue
+        if status.state in (workers.QUEUED, workers.RUNNING):
+            pending.append(job_id)
+        elif status.state in (workers.FAILED, workers.CANCELLED):
+            st.error("Something went wrong while processing some of your photos.")
+        else:
+            for name, result in status.result:
+                if not isinstance(result, garments.Garment):
+                    st.warning(f"{name}: {result}")
+    view.wardrobe_jobs = pending
+    if pending:
+        st.info("We're still processing some of your photos in the background. Refresh to see them.")
+
+
+def wardrobe_app():
+    st.title("Own Wardrobe")
+    view = view_state()
+    user = view.user_id
+    store = get_wardrobe_store()
+
+    add_photos(user, store)
+    show_job_status()
+
+    col1, col2, col3 = st.columns(3)
+    category = col1.selectbox("Category", (ALL,) + garments.CATEGORIES, key="wardrobe_category")
+    color = col2.selectbox("Color", (ALL,) + catalog.COLORS, key="wardrobe_color")
+    style = col3.selectbox("Style", (ALL,) + catalog.STYLES, key="wardrobe_style")
+    tags = tuple(f"{kind}:{value}" for kind, value in (("color", color), ("style", style)) if value != ALL)
+
+    # Start cursors of the pages visited so far; a new filter starts over.
+    filters = (category, color, style)
+    if view.wardrobe_filters != filters:
+        view.wardrobe_filters = filters
+        view.wardrobe_cursors = [None]
+    cursors = view.wardrobe_cursors
+
+    page = store.page(user, cursors[-1], category=None if category == ALL else category, tags=tags)
+    st.caption(f"{store.count(user)} items in your wardrobe · page {len(cursors)}")
+    if not page.items:
+        st.info("No items here yet. Add photos of your clothes above to build your wardrobe.")
+    else:
+        cards = "".join(item_card(item) for item in page.items)
+        st.markdown(f"<div class='wardrobe-grid'>{cards}</div>", unsafe_allow_html=True)
+
+    col1, col2 = st.columns(2)
+    col1.button("Previous", disabled=len(cursors) == 1, on_click=cursors.pop, use_container_width=True)
+    col2.button(
+        "Next",
+        disabled=page.next_cursor is None,
+        on_click=lambda: cursors.append(page.next_cursor),
+        use_container_width=True,
+    )
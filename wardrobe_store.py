@@ -0,0 +1,146 @@
+# --- Wardrobe Store ---
+# Every user's wardrobe items in one SQLite file (WAL mode, like the user store),
+# indexed so that a page of any wardrobe, filtered or not, is an index range scan
+# no matter how many items the user has:
+#
+#   wardrobe_items  (user, item_id) and (user, category, item_id) indexes
+#   wardrobe_tags   (user, tag, item_id) primary key; one row per color and style,
+#                   tags are "color:<name>" and "style:<name>"
+#
+# Pages are fetched with keyset pagination: newest first, and the next page starts
+# below the last item_id of the previous one, so page 50 costs the same as page 1.
+
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import imaging
+from user_store import Transaction, normalize_email
+
+DB_PATH = "wardrobe.sqlite3"
+PAGE_SIZE = 24
+THUMBNAIL_SIZE = 320
+
+WardrobeItem = namedtuple("WardrobeItem", "item_id image_id category colors styles width height added_at")
+WardrobePage = namedtuple("WardrobePage", "items next_cursor")
+
+_COLUMNS = "i.item_id, i.image_id, i.category, i.colors, i.styles, i.width, i.height, i.added_at"
+
+
+def connect(path=DB_PATH):
+    """Opens the database in WAL mode and creates the wardrobe tables if needed."""
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS wardrobe_items (
+            item_id INTEGER PRIMARY KEY,
+            user TEXT NOT NULL,
+            image_id TEXT NOT NULL,
+            category TEXT NOT NULL,
+            colors TEXT NOT NULL,
+            styles TEXT NOT NULL,
+            width INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            added_at REAL NOT NULL,
+            UNIQUE (user, image_id)
+        );
+        CREATE INDEX IF NOT EXISTS wardrobe_items_by_user ON wardrobe_items (user, item_id);
+        CREATE INDEX IF NOT EXISTS wardrobe_items_by_category ON wardrobe_items (user, category, item_id);
+        CREATE TABLE IF NOT EXISTS wardrobe_tags (
+            user TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            PRIMARY KEY (user, tag, item_id)
+        ) WITHOUT ROWID;
+    """)
+    return conn
+
+
+def thumbnail_url(item, size=THUMBNAIL_SIZE):
+    return imaging.media_url(item.image_id, f"thumb_{size}.jpg")
+
+
+def _item(row):
+    item_id, image_id, category, colors, styles, width, height, added_at = row
+    return WardrobeItem(item_id, image_id, category, tuple(json.loads(colors)), tuple(json.loads(styles)), width, height, added_at)
+
+
+class WardrobeStore:
+    """Thread-safe store of wardrobe items shared by every session."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = connect(path)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add(self, user, category, garment):
+        """Adds a garments.Garment to a user's wardrobe; returns its item_id (the existing one for a repeat photo)."""
+        user = normalize_email(user)
+        with self._lock, Transaction(self._conn):
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO wardrobe_items (user, image_id, category, colors, styles, width, height, added_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user, garment.image_id, category, json.dumps(garment.colors), json.dumps(garment.styles),
+                 garment.width, garment.height, time.time()),
+            )
+            if cursor.rowcount == 0:
+                return self._conn.execute(
+                    "SELECT item_id FROM wardrobe_items WHERE user = ? AND image_id = ?", (user, garment.image_id)
+                ).fetchone()[0]
+            item_id = cursor.lastrowid
+            tags = [f"color:{color}" for color in garment.colors] + [f"style:{style}" for style in garment.styles]
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO wardrobe_tags (user, tag, item_id) VALUES (?, ?, ?)",
+                [(user, tag, item_id) for tag in tags],
+            )
+            return item_id
+
+    def remove(self, user, item_id):
+        user = normalize_email(user)
+        with self._lock, Transaction(self._conn):
+            self._conn.execute("DELETE FROM wardrobe_tags WHERE user = ? AND item_id = ?", (user, item_id))
+            self._conn.execute("DELETE FROM wardrobe_items WHERE user = ? AND item_id = ?", (user, item_id))
+
+    def count(self, user):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM wardrobe_items WHERE user = ?", (normalize_email(user),)).fetchone()[0]
+
+    def page(self, user, cursor=None, limit=PAGE_SIZE, category=None, tags=()):
+        """One page of a user's items, newest first, optionally filtered by category and tags.
+
+        Pass the returned ``next_cursor`` to get the following page; it is None on
+        the last one.
+        """
+        user = normalize_email(user)
+        params = [user]
+        if tags:
+            # The first tag drives the scan through its index; the rest are key lookups.
+            query = f"SELECT {_COLUMNS} FROM wardrobe_tags t JOIN wardrobe_items i ON i.item_id = t.item_id WHERE t.user = ? AND t.tag = ?"
+            params.append(tags[0])
+            order = "t.item_id"
+            for tag in tags[1:]:
+                query += " AND EXISTS (SELECT 1 FROM wardrobe_tags x WHERE x.user = t.user AND x.tag = ? AND x.item_id = t.item_id)"
+                params.append(tag)
+        else:
+            query = f"SELECT {_COLUMNS} FROM wardrobe_items i WHERE i.user = ?"
+            order = "i.item_id"
+        if category is not None:
+            query += " AND i.category = ?"
+            params.append(category)
+        if cursor is not None:
+            query += f" AND {order} < ?"
+            params.append(cursor)
+        # One extra row tells whether there is a next page.
+        query += f" ORDER BY {order} DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        items = [_item(row) for row in rows[:limit]]
+        return WardrobePage(items, items[-1].item_id if len(rows) > limit else None)
@@ -0,0 +1,139 @@
+# --- Background Workers ---
+# A bounded process pool shared by every session for CPU-bound work (image
+# decoding, resizing, thumbnails). Callers get a job ID back as soon as the job is
+# queued and poll its status on later reruns; when too many jobs are pending,
+# submit() refuses new work instead of letting the queue grow without bound.
+
+import concurrent.futures
+import importlib
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures.process import BrokenProcessPool
+
+import instrumentation
+
+MAX_WORKERS = int(os.environ.get("STYLETELLER_WORKERS", min(4, os.cpu_count() or 1)))
+# Queued plus running jobs; beyond this submit() raises QueueFull.
+MAX_PENDING = int(os.environ.get("STYLETELLER_MAX_PENDING_JOBS", MAX_WORKERS * 4))
+# How long a finished job's status stays available for polling.
+JOB_TTL = 600
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+
+JobStatus = namedtuple("JobStatus", "state result error")
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit() when the pool already has MAX_PENDING jobs."""
+
+
+def _run(target, args):
+    """Worker-side entry point: resolves "module:function" and calls it; returns (seconds, result)."""
+    module_name, function_name = target.split(":")
+    func = getattr(importlib.import_module(module_name), function_name)
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+class WorkerPool:
+    """Process pool with job IDs, status polling and backpressure."""
+
+    def __init__(self, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        self._max_workers = max_workers
+        self._executor = self._new_executor()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, target, *args, on_done=None):
+        """Queues ``target`` ("module:function") in a worker process and returns a job ID.
+
+        Targets are named rather than passed as functions so the server process
+        never has to import the worker's heavy dependencies. ``on_done(result)``
+        runs in the server process once the job succeeds.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull("Too many background jobs are pending.")
+        try:
+            executor = self._executor
+            try:
+                future = executor.submit(_run, target, args)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool once.
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = self._new_executor()
+                future = self._executor.submit(_run, target, args)
+        except Exception:
+            self._slots.release()
+            raise
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._jobs[job_id] = [future, None]
+        submitted = time.perf_counter()
+        future.add_done_callback(lambda f: self._finished(job_id, f, on_done, target, submitted))
+        return job_id
+
+    def status(self, job_id):
+        """Returns the JobStatus of a job, or None if it is unknown or expired."""
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return None
+        future = entry[0]
+        if not future.done():
+            return JobStatus(RUNNING if future.running() else QUEUED, None, None)
+        # exception() raises CancelledError for a cancelled job (e.g. at shutdown).
+        if future.cancelled():
+            return JobStatus(CANCELLED, None, None)
+        if future.exception() is not None:
+            return JobStatus(FAILED, None, future.exception())
+        return JobStatus(DONE, future.result()[1], None)
+
+    def pending(self):
+        """Number of queued and running jobs."""
+        with self._lock:
+            return sum(1 for future, _ in self._jobs.values() if not future.done())
+
+    def samples(self):
+        """Pending jobs as an instrumentation Sample."""
+        return [instrumentation.Sample("styleteller_worker_jobs_pending", {}, self.pending(), "gauge")]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _new_executor(self):
+        # The server is multi-threaded, so workers are spawned rather than forked.
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=self._max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def _finished(self, job_id, future, on_done, target, submitted):
+        self._slots.release()
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id][1] = time.monotonic()
+        cancelled = future.cancelled()
+        succeeded = not cancelled and future.exception() is None
+        if succeeded:
+            # Time spent running in the worker, and from submit() to done including the queue.
+            instrumentation.observe("styleteller_worker_job_seconds", future.result()[0], target=target)
+        instrumentation.observe("styleteller_worker_job_latency_seconds", time.perf_counter() - submitted, target=target)
+        instrumentation.count("styleteller_worker_jobs_total", target=target, outcome=DONE if succeeded else CANCELLED if cancelled else FAILED)
+        if on_done is not None and succeeded:
+            try:
+                on_done(future.result()[1])
+            except Exception as e:
+                print(f"Error in background job callback: {e}")
+
+    def _prune(self):
+        cutoff = time.monotonic() - JOB_TTL
+        expired = [job_id for job_id, (_, finished_at) in self._jobs.items() if finished_at is not None and finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]